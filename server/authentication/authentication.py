@@ -0,0 +1,139 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from health_check.metrics import timed
+from readily_reads.routers import pin_recent_writer
+
+from .revocation import revocation_list
+
+
+class UserCache:
+    """
+    Bounded, thread-safe LRU cache of users keyed by their token user id.
+
+    Only field values are stored, and every hit builds a new user instance
+    from them, so requests never share or mutate the same object. Entries
+    expire after ``timeout`` seconds. authentication.signals invalidates a
+    user when it is saved or deleted: the entry is dropped here and the
+    user's version is replaced in the ``versions`` cache, which every worker
+    shares and checks on each hit, so other workers reload the user on its
+    next request. The timeout bounds how stale a user can be after a change
+    that sends no signal, such as a QuerySet.update(), or when ``versions``
+    is None.
+    """
+
+    def __init__(self, maxsize, timeout, versions=None):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.versions = versions
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def version_key(self, user_id):
+        return f'auth:user-version:{user_id}'
+
+    def version(self, user_id):
+        """
+        The user's current version, read before the user is looked up or
+        loaded so that an invalidation in between is never missed
+        """
+        if self.versions is None:
+            return None
+        return caches[self.versions].get(self.version_key(user_id))
+
+    def get(self, model, user_id, version=None):
+        key = str(user_id)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, entry_version, db, values = entry
+            if expires <= time.monotonic() or entry_version != version:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        return model.from_db(db, [field.attname for field in model._meta.concrete_fields], values)
+
+    def add(self, user_id, user, version=None):
+        if self.maxsize <= 0:
+            return
+        values = [getattr(user, field.attname) for field in user._meta.concrete_fields]
+        entry = (time.monotonic() + self.timeout, version, user._state.db, values)
+        key = str(user_id)
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(str(user_id), None)
+        if self.versions is not None:
+            # The new version outlives every entry cached before the change,
+            # which are the only ones it has to invalidate
+            caches[self.versions].set(self.version_key(user_id), uuid.uuid4().hex, self.timeout)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache(
+    maxsize=getattr(settings, 'AUTH_USER_CACHE_SIZE', 10000),
+    timeout=getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300),
+    versions=getattr(settings, 'AUTH_USER_CACHE_VERSIONS', None),
+)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that rejects revoked tokens and resolves the token's
+    user through user_cache, so neither check reads the database on the
+    common path. Users who wrote recently have their request pinned to the
+    primary database.
+    """
+
+    def authenticate(self, request):
+        with timed('auth'):
+            result = super().authenticate(request)
+        if result is not None:
+            pin_recent_writer(result[0].pk)
+        return result
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if revocation_list.is_revoked(validated_token):
+            raise InvalidToken(_('Token has been revoked'))
+        return validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        version = user_cache.version(user_id)
+        user = user_cache.get(self.user_model, user_id, version)
+        if user is None:
+            # The parent class loads the user and runs every check
+            user = super().get_user(validated_token)
+            user_cache.add(user_id, user, version)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
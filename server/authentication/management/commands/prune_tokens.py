@@ -0,0 +1,16 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from authentication.revocation import prune_revocations
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired token revocations and logout watermarks, then flush "
+        "expired tokens from the token blacklist. Run it periodically."
+    )
+
+    def handle(self, *args, **options):
+        deleted = prune_revocations()
+        call_command('flushexpiredtokens', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired revocations'))
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('authentication', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(max_length=255, unique=True, verbose_name='JWT ID')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Expires At')),
+                ('revoked_at', models.DateTimeField(auto_now_add=True, verbose_name='Revoked At')),
+            ],
+            options={
+                'verbose_name': 'Revoked Token',
+                'verbose_name_plural': 'Revoked Tokens',
+            },
+        ),
+        migrations.CreateModel(
+            name='TokenWatermark',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='token_watermark', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('not_before', models.DateTimeField(verbose_name='Not Before')),
+            ],
+            options={
+                'verbose_name': 'Token Watermark',
+                'verbose_name_plural': 'Token Watermarks',
+            },
+        ),
+    ]
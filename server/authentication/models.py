@@ -15,4 +15,37 @@ class UserProfile(models.Model):
         verbose_name_plural = _('User Profiles')
         
     def __str__(self):
-        return f"{self.user.username}'s profile"
\ No newline at end of file
+        return f"{self.user.username}'s profile"
+
+class RevokedToken(models.Model):
+    """
+    Access token revoked before its expiry, by its jti. Refresh tokens are
+    revoked through the simplejwt token blacklist instead. Rows are only
+    needed until the token expires.
+    """
+    jti = models.CharField(_('JWT ID'), max_length=255, unique=True)
+    expires_at = models.DateTimeField(_('Expires At'), db_index=True)
+    revoked_at = models.DateTimeField(_('Revoked At'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('Revoked Token')
+        verbose_name_plural = _('Revoked Tokens')
+        
+    def __str__(self):
+        return f"Token {self.jti} revoked at {self.revoked_at}"
+
+
+class TokenWatermark(models.Model):
+    """
+    Every access token of the user issued at or before ``not_before`` is
+    revoked. Set when a user logs out everywhere.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='token_watermark')
+    not_before = models.DateTimeField(_('Not Before'))
+    
+    class Meta:
+        verbose_name = _('Token Watermark')
+        verbose_name_plural = _('Token Watermarks')
+        
+    def __str__(self):
+        return f"Tokens of {self.user_id} issued before {self.not_before}"
@@ -0,0 +1,112 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RevokedToken, TokenWatermark
+
+
+class RevocationList:
+    """
+    In-memory view of revoked access tokens, checked on every authenticated
+    request without touching the database.
+
+    Revoked jtis are held in a set, and logout-everywhere watermarks per
+    user. Everything is reloaded from the database at most every
+    ``refresh_interval`` seconds, so a revocation made by another process
+    applies within that time; one made in this process applies at once.
+    """
+
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget the loaded state, forcing a reload on the next check"""
+        self.loaded_at = None
+        self.jtis = set()
+        self.watermarks = {}
+
+    def load(self):
+        now = timezone.now()
+        jtis = set(RevokedToken.objects.filter(expires_at__gt=now).values_list('jti', flat=True))
+        watermarks = {
+            str(user_id): int(not_before.timestamp())
+            for user_id, not_before in TokenWatermark.objects.filter(
+                not_before__gt=now - api_settings.ACCESS_TOKEN_LIFETIME,
+            ).values_list('user_id', 'not_before')
+        }
+        self.jtis, self.watermarks = jtis, watermarks
+        self.loaded_at = time.monotonic()
+
+    def refresh_if_stale(self):
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.refresh_interval:
+            return
+        with self.lock:
+            if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.refresh_interval:
+                self.load()
+
+    def is_revoked(self, token):
+        self.refresh_if_stale()
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti is not None and jti in self.jtis:
+            return True
+        not_before = self.watermarks.get(str(token.get(api_settings.USER_ID_CLAIM)))
+        issued_at = token.get('iat')
+        # Claims have second precision, so tokens issued within the second
+        # of the watermark count as issued before it
+        return not_before is not None and issued_at is not None and issued_at <= not_before
+
+    def add(self, jti):
+        with self.lock:
+            self.jtis.add(jti)
+
+    def add_watermark(self, user_id, not_before):
+        with self.lock:
+            self.watermarks[str(user_id)] = int(not_before.timestamp())
+
+
+revocation_list = RevocationList(getattr(settings, 'AUTH_REVOCATION_REFRESH_SECONDS', 30))
+
+
+def revoke_access_token(token):
+    """Revoke a validated access token until it expires"""
+    jti = token[api_settings.JTI_CLAIM]
+    RevokedToken.objects.get_or_create(jti=jti, defaults={'expires_at': datetime_from_epoch(token['exp'])})
+    transaction.on_commit(lambda: revocation_list.add(jti))
+
+
+def revoke_user_tokens(user):
+    """
+    Revoke every token of a user: all outstanding refresh tokens are
+    blacklisted and all access tokens issued until now stop working
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        outstanding = OutstandingToken.objects.filter(
+            user=user, expires_at__gt=now, blacklistedtoken__isnull=True,
+        ).only('id')
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token=token) for token in outstanding], ignore_conflicts=True,
+        )
+        TokenWatermark.objects.update_or_create(user=user, defaults={'not_before': now})
+        transaction.on_commit(lambda: revocation_list.add_watermark(user.pk, now))
+
+
+def prune_revocations():
+    """
+    Delete revocation records that can no longer match a live token and
+    return how many were deleted
+    """
+    now = timezone.now()
+    revoked, _ = RevokedToken.objects.filter(expires_at__lte=now).delete()
+    watermarks, _ = TokenWatermark.objects.filter(
+        not_before__lte=now - api_settings.ACCESS_TOKEN_LIFETIME,
+    ).delete()
+    return revoked + watermarks
@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
+from .authentication import user_cache
 from .models import UserProfile
 
 @receiver(post_save, sender=User)
@@ -9,4 +10,13 @@ def create_user_profile(sender, instance, created, **kwargs):
     Signal to create a user profile when a new user is created
     """
     if created:
-        UserProfile.objects.create(user=instance)
\ No newline at end of file
+        UserProfile.objects.create(user=instance)
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drop a saved or deleted user from the authentication cache, so changes
+    such as deactivation apply to the next request
+    """
+    user_cache.invalidate(instance.pk)
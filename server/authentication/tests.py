@@ -1,9 +1,18 @@
+from unittest import mock
 from django.test import TestCase
 from django.contrib.auth.models import User
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import UserProfile
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import AccessToken
+from django.core.management import call_command
+from django.utils import timezone
+from io import StringIO
+import datetime
+from .authentication import UserCache, user_cache
+from .models import RevokedToken, TokenWatermark, UserProfile
+from .revocation import revocation_list
 import json
 
 class AuthenticationTests(TestCase):
@@ -140,4 +149,135 @@ class AuthenticationTests(TestCase):
         )
         
         self.assertEqual(refresh_response.status_code, status.HTTP_200_OK)
-        self.assertTrue('access' in refresh_response.data)
\ No newline at end of file
+        self.assertTrue('access' in refresh_response.data)
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(username='reader', password='password123')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.url = reverse('user_profile')
+    
+    def test_user_read_once(self):
+        """Test that the User row is only read by the first request"""
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['username'], 'reader')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['username'], 'reader')
+    
+    def test_updates_invalidate(self):
+        """Test that renaming, deactivating and deleting a user apply immediately"""
+        self.client.get(self.url)
+        self.client.patch(self.url, {'first_name': 'Ada'}, format='json')
+        self.assertEqual(self.client.get(self.url).data['first_name'], 'Ada')
+        
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        self.user.is_active = True
+        self.user.save()
+        self.client.get(self.url)
+        self.user.delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_cache_is_bounded(self):
+        """Test that the least recently used users are evicted first"""
+        users = [User.objects.create_user(username=f'user{index}') for index in range(3)]
+        with mock.patch.object(user_cache, 'maxsize', 2):
+            user_cache.add(users[0].pk, users[0])
+            user_cache.add(users[1].pk, users[1])
+            user_cache.get(User, users[0].pk)
+            user_cache.add(users[2].pk, users[2])
+            self.assertIsNotNone(user_cache.get(User, users[0].pk))
+            self.assertIsNone(user_cache.get(User, users[1].pk))
+            self.assertIsNotNone(user_cache.get(User, users[2].pk))
+        with mock.patch.object(user_cache, 'timeout', 0):
+            user_cache.add(self.user.pk, self.user)
+            self.assertIsNone(user_cache.get(User, self.user.pk))
+
+    def test_invalidation_reaches_other_workers(self):
+        """Test that a save in one worker invalidates the user cached by another"""
+        other_worker = UserCache(maxsize=10, timeout=300, versions=user_cache.versions)
+        version = other_worker.version(self.user.pk)
+        other_worker.add(self.user.pk, self.user, version)
+        self.assertIsNotNone(other_worker.get(User, self.user.pk, other_worker.version(self.user.pk)))
+
+        self.user.first_name = 'Ada'
+        self.user.save()
+        self.assertIsNone(other_worker.get(User, self.user.pk, other_worker.version(self.user.pk)))
+
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        revocation_list.reset()
+        self.user = User.objects.create_user(username='reader', password='password123')
+        self.client = APIClient()
+        self.profile_url = reverse('user_profile')
+    
+    def login(self):
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'reader', 'password': 'password123'})
+        return response.data['access'], response.data['refresh']
+    
+    def get_profile(self, access):
+        return self.client.get(self.profile_url, HTTP_AUTHORIZATION=f'Bearer {access}')
+    
+    def test_refresh_rotation(self):
+        """Test that refreshing rotates the refresh token and blacklists the old one"""
+        _, refresh = self.login()
+        response = self.client.post(reverse('token_refresh'), {'refresh': refresh})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data['refresh'], refresh)
+        response = self.client.post(reverse('token_refresh'), {'refresh': refresh})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_logout(self):
+        """Test that logging out revokes the access and refresh tokens"""
+        access, refresh = self.login()
+        other_access, _ = self.login()
+        self.assertEqual(self.get_profile(access).status_code, status.HTTP_200_OK)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('token_logout'), {'refresh': refresh},
+                                        HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_profile(access).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get_profile(other_access).status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('token_refresh'), {'refresh': refresh})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        # Other processes see the revocation after reloading from the database
+        revocation_list.reset()
+        self.assertEqual(self.get_profile(access).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_logout_everywhere(self):
+        """Test that logging out everywhere revokes every token issued so far"""
+        access, refresh = self.login()
+        other_access, other_refresh = self.login()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('token_logout_all'), HTTP_AUTHORIZATION=f'Bearer {access}')
+        for token in (access, other_access):
+            self.assertEqual(self.get_profile(token).status_code, status.HTTP_401_UNAUTHORIZED)
+        for token in (refresh, other_refresh):
+            response = self.client.post(reverse('token_refresh'), {'refresh': token})
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(BlacklistedToken.objects.filter(token__user=self.user).count(), 2)
+    
+    def test_checks_do_not_query(self):
+        """Test that revocation checks are answered from memory between reloads"""
+        access, _ = self.login()
+        self.get_profile(access)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_profile(access).status_code, status.HTTP_200_OK)
+    
+    def test_prune_command(self):
+        """Test that expired revocations are pruned"""
+        now = timezone.now()
+        RevokedToken.objects.create(jti='expired', expires_at=now - datetime.timedelta(minutes=1))
+        RevokedToken.objects.create(jti='live', expires_at=now + datetime.timedelta(minutes=1))
+        TokenWatermark.objects.create(user=self.user, not_before=now - datetime.timedelta(days=30))
+        call_command('prune_tokens', stdout=StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+        self.assertFalse(TokenWatermark.objects.exists())
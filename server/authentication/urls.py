@@ -3,12 +3,14 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
-from .views import RegisterView, UserProfileView
+from .views import LogoutAllView, LogoutView, RegisterView, UserProfileView
 
 urlpatterns = [
     # JWT token endpoints
     path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('logout/', LogoutView.as_view(), name='token_logout'),
+    path('logout/all/', LogoutAllView.as_view(), name='token_logout_all'),
     
     # Registration endpoint
     path('register/', RegisterView.as_view(), name='auth_register'),
@@ -2,8 +2,11 @@ from rest_framework import status, generics
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
+from .revocation import revoke_access_token, revoke_user_tokens
 from .serializers import RegisterSerializer, UserSerializer
 
 class RegisterView(generics.CreateAPIView):
@@ -37,4 +40,36 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = (IsAuthenticated,)
     
     def get_object(self):
-        return self.request.user
\ No newline at end of file
+        return self.request.user
+
+class LogoutView(generics.GenericAPIView):
+    """
+    API endpoint for logging out: revokes the access token of the request
+    and, when given, the refresh token it was obtained with
+    """
+    permission_classes = (IsAuthenticated,)
+    
+    def post(self, request):
+        raw_refresh = request.data.get('refresh')
+        if raw_refresh:
+            try:
+                refresh = RefreshToken(raw_refresh)
+            except TokenError as error:
+                return Response({'refresh': [str(error)]}, status=status.HTTP_400_BAD_REQUEST)
+            if str(refresh.get(api_settings.USER_ID_CLAIM)) != str(request.user.pk):
+                return Response({'refresh': ['Token belongs to another user']}, status=status.HTTP_400_BAD_REQUEST)
+            refresh.blacklist()
+        if request.auth is not None:
+            revoke_access_token(request.auth)
+        return Response({'message': 'Logged out successfully'})
+
+class LogoutAllView(generics.GenericAPIView):
+    """
+    API endpoint for logging out everywhere: revokes every refresh and
+    access token issued to the user so far
+    """
+    permission_classes = (IsAuthenticated,)
+    
+    def post(self, request):
+        revoke_user_tokens(request.user)
+        return Response({'message': 'Logged out of all sessions'})
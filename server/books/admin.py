@@ -1,15 +1,204 @@
-from django.contrib import admin
-from .models import Book, ReadingProgress
+import base64
+import binascii
+import json
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from django.http import QueryDict, StreamingHttpResponse
+from django.utils import timezone
+from .batch import update_in_chunks
+from .exporters import CONTENT_TYPES, export_books
+from .models import Book, GenreCount, ReadingProgress, percentage_complete_expression
+from .pagination import BookKeysetPagination, EstimatedCountPaginator, read_field, seek_filter
+from .sharding import shard_aliases, shard_for_user, sharding_enabled, use_shard
+
+class KeysetChangeList(ChangeList):
+    """
+    Changelist that pages by seeking past the last row of the previous page
+    instead of using OFFSET, whenever it is sorted on a single non-null
+    column; ties are then broken by the primary key in the same direction.
+    The position travels as an opaque cursor in the page parameter, which
+    every filter and sort link already drops; plain page numbers keep
+    working for old links.
+    """
+    keyset = False
+    cursor = None
+    next_page_url = None
+    
+    def get_results(self, request):
+        super().get_results(request)
+        cursor = request.GET.get(PAGE_VAR)
+        ordering = self.get_seek_ordering()
+        if (ordering is None or self.list_editable or not self.multi_page
+                or (self.show_all and self.can_show_all) or (cursor or '').isdigit()):
+            return
+        field = ordering.lstrip('-')
+        # Ties are broken by the primary key in the direction of the column
+        queryset = self.queryset.order_by(ordering, '-pk' if ordering.startswith('-') else 'pk')
+        if cursor:
+            value, pk = self.decode_cursor(cursor, ordering)
+            queryset = queryset.filter(*seek_filter(field, ordering.startswith('-'), value, pk, 'pk'))
+        rows = list(queryset[:self.list_per_page + 1])
+        self.keyset = True
+        self.cursor = cursor
+        self.result_list = rows[:self.list_per_page]
+        if len(rows) > self.list_per_page:
+            last = self.result_list[-1]
+            self.next_page_url = self.get_query_string({PAGE_VAR: BookKeysetPagination.encode_cursor({
+                'o': ordering,
+                'v': BookKeysetPagination.to_json(read_field(last, field)),
+                'i': last.pk,
+            })})
+    
+    def get_seek_ordering(self):
+        """Return the ordering term to seek on, or None when there is none"""
+        # The changelist may repeat the primary key it appends for stability
+        ordering = list(dict.fromkeys(
+            '-pk' if term == f'-{self.opts.pk.name}' else 'pk' if term == self.opts.pk.name else term
+            for term in self.queryset.query.order_by
+        ))
+        if not ordering or not all(isinstance(term, str) for term in ordering):
+            return None
+        # Only the primary key may follow the column, as a tiebreaker
+        if any(term.lstrip('-') != 'pk' for term in ordering[1:]):
+            return None
+        if ordering[0].lstrip('-') == 'pk':
+            return ordering[0]
+        field = ordering[0].lstrip('-')
+        if field not in self.queryset.query.annotations:
+            try:
+                model_field = self.opts.get_field(field)
+            except FieldDoesNotExist:
+                return None
+            # NULLs cannot be compared, and relations sort by another model
+            if model_field.null or model_field.is_relation or not model_field.concrete:
+                return None
+        return ordering[0]
+    
+    def decode_cursor(self, cursor, ordering):
+        field = ordering.lstrip('-')
+        annotation = self.queryset.query.annotations.get(field)
+        if annotation is not None:
+            model_field = annotation.output_field
+        else:
+            model_field = self.opts.pk if field == 'pk' else self.opts.get_field(field)
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            if position['o'] != ordering:
+                raise ValueError('Cursor was issued for a different ordering')
+            return model_field.to_python(position['v']), self.opts.pk.to_python(position['i'])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, binascii.Error, ValidationError):
+            raise IncorrectLookupParameters('Invalid cursor')
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables with millions of rows: counts are
+    estimated rather than taken with COUNT(*), pages seek on the primary
+    key rather than using OFFSET, and filter facets are never counted.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    ordering = ('-pk',)
+    
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+class ShardFilter(admin.SimpleListFilter):
+    """
+    Picks the shard whose libraries the changelist shows, the default
+    database unless another is chosen. Only listed when sharding is on.
+    """
+    title = 'shard'
+    parameter_name = 'shard'
+    
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in shard_aliases()]
+    
+    def has_output(self):
+        return sharding_enabled()
+    
+    def queryset(self, request, queryset):
+        # ShardedAdmin already runs the view on the chosen shard
+        return queryset
+    
+    def choices(self, changelist):
+        current = self.value() or DEFAULT_DB_ALIAS
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == current,
+                'query_string': changelist.get_query_string({self.parameter_name: alias}),
+                'display': title,
+            }
+
+class ShardedAdmin(LargeTableAdmin):
+    """
+    Runs every view on the shard picked with ShardFilter, so listing,
+    editing, deleting and bulk actions all reach the libraries on it. The
+    choice follows the admin from the changelist to the other views in its
+    preserved filters.
+    """
+    
+    def get_shard(self, request):
+        alias = request.GET.get(ShardFilter.parameter_name)
+        if alias is None:
+            preserved = QueryDict(request.GET.get('_changelist_filters', ''))
+            alias = preserved.get(ShardFilter.parameter_name)
+        return alias if alias in shard_aliases() else DEFAULT_DB_ALIAS
+    
+    def get_add_shard(self, request):
+        """The shard new objects are added to"""
+        return self.get_shard(request)
+    
+    def changelist_view(self, request, extra_context=None):
+        with use_shard(self.get_shard(request)):
+            return super().changelist_view(request, extra_context)
+    
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        alias = self.get_add_shard(request) if object_id is None else self.get_shard(request)
+        with use_shard(alias):
+            return super().changeform_view(request, object_id, form_url, extra_context)
+    
+    def delete_view(self, request, object_id, extra_context=None):
+        with use_shard(self.get_shard(request)):
+            return super().delete_view(request, object_id, extra_context)
+    
+    def history_view(self, request, object_id, extra_context=None):
+        with use_shard(self.get_shard(request)):
+            return super().history_view(request, object_id, extra_context)
 
 class ReadingProgressInline(admin.StackedInline):
     model = ReadingProgress
     extra = 0
     fields = ('current_page', 'start_date', 'target_end_date', 'notes')
 
+class GenreFilter(admin.SimpleListFilter):
+    """Genre filter listing genres from GenreCount instead of scanning books"""
+    title = 'genre'
+    parameter_name = 'genre'
+    
+    def lookups(self, request, model_admin):
+        genres = GenreCount.objects.filter(book_count__gt=0).order_by('genre').values_list('genre', flat=True).distinct()
+        return [(genre, genre) for genre in genres]
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(genre=self.value())
+        return queryset
+
+class BookActionForm(helpers.ActionForm):
+    genre = forms.CharField(label='Genre', max_length=50, required=False)
+
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'genre', 'user', 'is_currently_reading', 'created_at')
-    list_filter = ('genre', 'is_currently_reading', 'created_at')
+class BookAdmin(ShardedAdmin):
+    list_display = ('title', 'author', 'genre', 'owner', 'is_currently_reading', 'created_at')
+    list_filter = (ShardFilter, GenreFilter, 'is_currently_reading', 'created_at')
     search_fields = ('title', 'author', 'description')
     readonly_fields = ('created_at', 'updated_at')
     fieldsets = (
@@ -28,11 +217,102 @@ class BookAdmin(admin.ModelAdmin):
         }),
     )
     inlines = [ReadingProgressInline]
+    action_form = BookActionForm
+    actions = ['mark_reading', 'mark_not_reading', 'reassign_genre', 'export_ndjson', 'export_csv']
+    # Rows updated per transaction by the bulk actions
+    action_chunk_size = 1000
+    
+    def get_add_shard(self, request):
+        # New books go to their owner's shard
+        user_id = request.POST.get('user', '')
+        return shard_for_user(int(user_id)) if user_id.isdigit() else super().get_add_shard(request)
+    
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        # Shards only hold placeholder users, so names come from the default database
+        usernames = dict(
+            User.objects.using(DEFAULT_DB_ALIAS)
+            .filter(pk__in={book.user_id for book in changelist.result_list}).values_list('pk', 'username')
+        )
+        for book in changelist.result_list:
+            book.owner_username = usernames.get(book.user_id)
+        return changelist
+    
+    @admin.display(description='User', ordering='user_id')
+    def owner(self, obj):
+        return obj.owner_username
+    
+    def export_response(self, queryset, format):
+        # The body is streamed after the view has left the shard, so pin it now
+        response = StreamingHttpResponse(
+            export_books(queryset.using(queryset.db), format, include_username=True),
+            content_type=CONTENT_TYPES[format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="books.{format}"'
+        return response
+    
+    def update_selected(self, request, queryset, **values):
+        # QuerySet.update() skips auto_now, so set updated_at explicitly
+        updated = update_in_chunks(queryset, self.action_chunk_size, updated_at=timezone.now(), **values)
+        self.message_user(request, f'{updated} books updated.', messages.SUCCESS)
+    
+    @admin.action(description='Mark selected books as currently reading')
+    def mark_reading(self, request, queryset):
+        self.update_selected(request, queryset, is_currently_reading=True)
+    
+    @admin.action(description='Mark selected books as not currently reading')
+    def mark_not_reading(self, request, queryset):
+        self.update_selected(request, queryset, is_currently_reading=False)
+    
+    @admin.action(description='Move selected books to the genre entered')
+    def reassign_genre(self, request, queryset):
+        genre = request.POST.get('genre', '').strip()
+        if not genre:
+            self.message_user(request, 'Enter the genre to move the books to.', messages.ERROR)
+            return
+        self.update_selected(request, queryset, genre=genre)
+    
+    @admin.action(description='Export selected books as NDJSON')
+    def export_ndjson(self, request, queryset):
+        return self.export_response(queryset, 'ndjson')
+    
+    @admin.action(description='Export selected books as CSV')
+    def export_csv(self, request, queryset):
+        return self.export_response(queryset, 'csv')
+
+class CompletionFilter(admin.SimpleListFilter):
+    title = 'completion'
+    parameter_name = 'completion'
+    ranges = {
+        'not_started': ('Not started', 0, 0),
+        'reading': ('In progress', 1, 89),
+        'almost_finished': ('Almost finished', 90, 99),
+        'finished': ('Finished', 100, 100),
+    }
+
+    def lookups(self, request, model_admin):
+        return [(key, label) for key, (label, _, _) in self.ranges.items()]
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.ranges:
+            return queryset
+        _, low, high = self.ranges[self.value()]
+        return queryset.filter(completion__range=(low, high))
 
 @admin.register(ReadingProgress)
-class ReadingProgressAdmin(admin.ModelAdmin):
-    list_display = ('book', 'current_page', 'percentage_complete', 'start_date', 'target_end_date')
-    list_filter = ('start_date', 'target_end_date')
+class ReadingProgressAdmin(ShardedAdmin):
+    list_display = ('book', 'current_page', 'completion', 'start_date', 'target_end_date')
+    list_filter = (ShardFilter, CompletionFilter, 'start_date', 'target_end_date')
+    list_select_related = ('book',)
     search_fields = ('book__title', 'book__author', 'notes')
     readonly_fields = ('percentage_complete', 'updated_at')
-    fields = ('book', 'current_page', 'percentage_complete', 'start_date', 'target_end_date', 'notes', 'updated_at')
\ No newline at end of file
+    fields = ('book', 'current_page', 'percentage_complete', 'start_date', 'target_end_date', 'notes', 'updated_at')
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            completion=percentage_complete_expression('current_page', 'book__pages'),
+        )
+    
+    @admin.display(description='Percentage complete', ordering='completion')
+    def completion(self, obj):
+        return obj.completion
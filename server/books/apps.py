@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class BooksConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "books"
+
+    def ready(self):
+        """
+        Connect the signals that maintain the genre index, and start the
+        book ids of each new shard in a range of its own
+        """
+        import books.signals  # noqa: F401
+        from django.db.models.signals import post_migrate
+        from books.sharding import reserve_book_ids
+        post_migrate.connect(reserve_book_ids, sender=self)
@@ -0,0 +1,73 @@
+from django.db import router, transaction
+from django.utils import timezone
+
+from .models import Book
+
+
+def update_books(user, updates):
+    """
+    Apply ``(book_id, values)`` updates to the user's books in one
+    transaction. Later updates to the same book override earlier ones, and
+    books ending up with the same values share a single UPDATE statement.
+    Returns the per-id results in request order.
+    """
+    merged = {}
+    for book_id, values in updates:
+        merged.setdefault(book_id, {}).update(values)
+
+    with transaction.atomic(using=router.db_for_write(Book)):
+        books = Book.objects.filter(user=user)
+        owned = set(books.filter(id__in=list(merged)).values_list('id', flat=True))
+        groups = {}
+        for book_id, values in merged.items():
+            if book_id in owned:
+                groups.setdefault(tuple(sorted(values.items())), []).append(book_id)
+        # QuerySet.update() skips auto_now, so set updated_at explicitly
+        now = timezone.now()
+        for values, book_ids in groups.items():
+            books.filter(id__in=book_ids).update(**dict(values), updated_at=now)
+
+    return make_results(merged, owned, 'updated')
+
+
+def delete_books(user, ids):
+    """
+    Delete the user's books among ``ids`` in one transaction and return the
+    per-id results in request order
+    """
+    ids = list(dict.fromkeys(ids))
+    with transaction.atomic(using=router.db_for_write(Book)):
+        books = Book.objects.filter(user=user, id__in=ids)
+        owned = set(books.values_list('id', flat=True))
+        if owned:
+            books.delete()
+    return make_results(ids, owned, 'deleted')
+
+
+def update_in_chunks(queryset, chunk_size=1000, **values):
+    """
+    Apply ``update(**values)`` to every row of ``queryset``, one chunk of
+    primary keys per transaction. Chunks are found by seeking past the last
+    key of the previous one, so a selection of millions of rows is never
+    loaded into memory, no read cursor stays open across writes and no
+    write lock is held for long. Returns the number of rows updated.
+    """
+    keys = queryset.order_by('pk').values_list('pk', flat=True)
+    updated = 0
+    last = None
+    while True:
+        chunk = list((keys if last is None else keys.filter(pk__gt=last))[:chunk_size])
+        if not chunk:
+            return updated
+        with transaction.atomic(using=router.db_for_write(queryset.model)):
+            updated += queryset.model._default_manager.filter(pk__in=chunk).update(**values)
+        last = chunk[-1]
+
+
+def make_results(ids, owned, done):
+    results = [{'id': book_id, 'status': done if book_id in owned else 'not_found'} for book_id in ids]
+    return {
+        done: sum(1 for result in results if result['status'] == done),
+        'not_found': sum(1 for result in results if result['status'] == 'not_found'),
+        'results': results,
+    }
@@ -0,0 +1,62 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import parse_etags, patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import LibraryVersion
+
+
+def library_version(request):
+    """
+    Return the library version of the requesting user, read once per
+    request and shared by the ETag and the response cache
+    """
+    if not hasattr(request, 'library_version'):
+        request.library_version = LibraryVersion.objects.current(request.user)
+    return request.library_version
+
+
+def library_etag(request):
+    """
+    Return a strong ETag for a read of the requesting user's library.
+
+    Responses only change when the library version does, so the tag is a
+    digest of the user, their library version, the full request path and
+    the negotiated media type.
+    """
+    version = library_version(request)
+    renderer = getattr(request, 'accepted_media_type', '')
+    key = f'{request.user.pk}:{version}:{request.get_full_path()}:{renderer}'
+    return '"%s"' % hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+def conditional_on_library(view_method):
+    """
+    Decorate a read-only view method so that it answers 304 Not Modified,
+    without calling the view, when If-None-Match holds the current ETag
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        etag = library_etag(request)
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            if etag in etags or '*' in etags:
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                set_cache_headers(response, etag)
+                return response
+
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            set_cache_headers(response, etag)
+        return response
+    return wrapper
+
+
+def set_cache_headers(response, etag):
+    response['ETag'] = etag
+    # Clients may keep the body but must revalidate before reusing it
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
@@ -0,0 +1,101 @@
+import csv
+import json
+from itertools import chain, islice
+
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+
+from .projections import iter_represented_books, project_books
+
+FORMATS = ('ndjson', 'csv')
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Book columns of a CSV export. Progress columns follow, flattened, so an
+# export can be imported again with the csv format.
+CSV_BOOK_FIELDS = (
+    'id', 'title', 'author', 'genre', 'pages', 'description',
+    'publication_date', 'is_currently_reading', 'created_at', 'updated_at',
+)
+CSV_PROGRESS_FIELDS = ('current_page', 'start_date', 'target_end_date', 'notes', 'percentage_complete')
+
+# Rows fetched from the database per round-trip, and written per chunk
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() returns what it is given, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def export_books(queryset, format='ndjson', include_username=False, chunk_size=CHUNK_SIZE, shards=None):
+    """
+    Yield an export of the books in ``queryset`` as text chunks.
+
+    Rows are read with a server-side iterator over the same projection the
+    list endpoint uses, so memory stays flat whatever the size of the
+    library. ``shards`` lists the databases to read the queryset from in
+    turn, for exports spanning every library; by default it is read from
+    its own. ``include_username`` adds the owner of each book, for exports
+    spanning several users.
+    """
+    extra_fields = ()
+    if include_username:
+        queryset = queryset.annotate(owner_id=F('user_id'))
+        extra_fields = ('username',)
+    queryset = project_books(queryset.order_by('user_id', 'id'))
+    rows = chain.from_iterable(
+        queryset.using(alias).iterator(chunk_size=chunk_size) for alias in shards or [queryset.db]
+    )
+    if include_username:
+        rows = with_usernames(rows, chunk_size)
+    books = iter_represented_books(rows, extra_fields)
+    lines = ndjson_lines(books) if format == 'ndjson' else csv_lines(books, extra_fields)
+    while True:
+        chunk = ''.join(islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def with_usernames(rows, chunk_size):
+    """
+    Add the owner's username to each row. Shards only hold placeholder
+    users, so the names are looked up on the default database, a chunk of
+    rows at a time.
+    """
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        usernames = dict(
+            User.objects.using(DEFAULT_DB_ALIAS)
+            .filter(pk__in={row['owner_id'] for row in chunk}).values_list('pk', 'username')
+        )
+        for row in chunk:
+            row['username'] = usernames.get(row['owner_id'])
+            yield row
+
+
+def ndjson_lines(books):
+    for book in books:
+        yield json.dumps(book, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def csv_lines(books, extra_fields=()):
+    writer = csv.writer(Echo())
+    fields = (*extra_fields, *CSV_BOOK_FIELDS)
+    yield writer.writerow((*fields, *CSV_PROGRESS_FIELDS))
+    empty_progress = dict.fromkeys(CSV_PROGRESS_FIELDS)
+    for book in books:
+        progress = book['reading_progress'] or empty_progress
+        yield writer.writerow((
+            *(book[field] for field in fields),
+            *(progress[field] for field in CSV_PROGRESS_FIELDS),
+        ))
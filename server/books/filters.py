@@ -0,0 +1,92 @@
+from rest_framework import filters, serializers
+from .search import search_books
+
+
+def get_search_terms(request):
+    """
+    Return the free-text query for a request. Both the legacy ``query``
+    parameter and DRF's ``search`` parameter are accepted.
+    """
+    params = request.query_params
+    terms = [params.get('query', ''), params.get(filters.SearchFilter.search_param, '')]
+    return ' '.join(term.strip() for term in terms if term and term.strip())
+
+
+class BookSearchFilter(filters.BaseFilterBackend):
+    """
+    Filter books through the configured search backend
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = get_search_terms(request)
+        if not query:
+            return queryset
+        return search_books(queryset, query, user_id=request.user.pk)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': name,
+                'required': False,
+                'in': 'query',
+                'description': 'Free-text search over title, author, genre and description',
+                'schema': {'type': 'string'},
+            }
+            for name in ('query', filters.SearchFilter.search_param)
+        ]
+
+
+class BookProgressFilter(filters.BaseFilterBackend):
+    """
+    Filter books by reading completion with ``min_progress`` and
+    ``max_progress``, both inclusive percentages
+    """
+    params = {
+        'min_progress': 'Only books at least this percent complete',
+        'max_progress': 'Only books at most this percent complete',
+    }
+    field = serializers.IntegerField(min_value=0, max_value=100)
+
+    def filter_queryset(self, request, queryset, view):
+        bounds = {}
+        for name, lookup in (('min_progress', 'gte'), ('max_progress', 'lte')):
+            value = request.query_params.get(name)
+            if value in (None, ''):
+                continue
+            try:
+                bounds[f'percentage_complete__{lookup}'] = self.field.run_validation(value)
+            except serializers.ValidationError as error:
+                raise serializers.ValidationError({name: error.detail})
+        if not bounds:
+            return queryset
+        return queryset.with_percentage_complete().filter(**bounds)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': name,
+                'required': False,
+                'in': 'query',
+                'description': description,
+                'schema': {'type': 'integer', 'minimum': 0, 'maximum': 100},
+            }
+            for name, description in self.params.items()
+        ]
+
+
+class BookOrderingFilter(filters.OrderingFilter):
+    """
+    Ordering filter that ranks search results by relevance unless the client
+    asks for an explicit ordering.
+    """
+
+    def get_default_ordering(self, view):
+        if get_search_terms(view.request):
+            return ['-search_rank'] + list(super().get_default_ordering(view) or [])
+        return super().get_default_ordering(view)
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if ordering and any(term.lstrip('-') == 'percentage_complete' for term in ordering):
+            queryset = queryset.with_percentage_complete()
+        return super().filter_queryset(request, queryset, view)
@@ -0,0 +1,198 @@
+import csv
+import io
+import json
+import os
+
+from django.db import router, transaction
+from rest_framework import serializers
+
+from .models import Book, ReadingProgress
+from .serializers import BookSerializer
+
+FORMATS = ('csv', 'ndjson', 'goodreads')
+
+# File extensions recognised when no format is given
+EXTENSION_FORMATS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+PROGRESS_FIELDS = ('current_page', 'start_date', 'target_end_date', 'notes')
+
+# Goodreads shelves that describe reading status rather than a genre
+GOODREADS_STATUS_SHELVES = {'read', 'currently-reading', 'to-read'}
+DEFAULT_GENRE = 'Uncategorized'
+
+
+class ImportFormatError(ValueError):
+    """Raised when an upload cannot be read as any supported format"""
+
+
+def detect_format(filename=None, format=None):
+    """
+    Return the import format named by ``format``, or guessed from the file
+    extension. Goodreads exports are CSV files and are recognised by their
+    header once reading starts.
+    """
+    if format:
+        if format not in FORMATS:
+            raise ImportFormatError(f'Unsupported format "{format}", expected one of {", ".join(FORMATS)}')
+        return format
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension not in EXTENSION_FORMATS:
+        raise ImportFormatError('Could not tell the file format, pass format=csv, ndjson or goodreads')
+    return EXTENSION_FORMATS[extension]
+
+
+def read_csv(text):
+    """Yield a book dict per CSV row, mapping Goodreads exports as needed"""
+    reader = csv.DictReader(text)
+    rows = reader
+    if reader.fieldnames and 'Exclusive Shelf' in reader.fieldnames:
+        rows = (goodreads_to_book(row) for row in reader)
+    for row in rows:
+        yield flat_to_book(row)
+
+
+def read_goodreads(text):
+    """Yield a book dict per row of a Goodreads library export"""
+    for row in csv.DictReader(text):
+        yield flat_to_book(goodreads_to_book(row))
+
+
+def read_ndjson(text):
+    """Yield a book dict per non-empty line of newline-delimited JSON"""
+    for line in text:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield serializers.ValidationError({'non_field_errors': ['Invalid JSON']})
+            continue
+        if not isinstance(record, dict):
+            yield serializers.ValidationError({'non_field_errors': ['Expected a JSON object']})
+            continue
+        if 'reading_progress' not in record:
+            record = flat_to_book(record)
+        yield record
+
+
+READERS = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+    'goodreads': read_goodreads,
+}
+
+
+def flat_to_book(row):
+    """
+    Turn a flat record into BookSerializer input. Empty cells are dropped so
+    optional fields fall back to their defaults, and progress columns are
+    nested under ``reading_progress``.
+    """
+    book = {}
+    progress = {}
+    for key, value in row.items():
+        if key is None or value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        if key in PROGRESS_FIELDS:
+            progress[key] = value
+        else:
+            book[key] = value
+    if progress:
+        book['reading_progress'] = progress
+    return book
+
+
+def goodreads_to_book(row):
+    """Map a row of a Goodreads library export onto book fields"""
+    shelves = [shelf.strip() for shelf in (row.get('Bookshelves') or '').split(',')]
+    genres = [shelf for shelf in shelves if shelf and shelf not in GOODREADS_STATUS_SHELVES]
+    year = (row.get('Original Publication Year') or row.get('Year Published') or '').strip()
+    return {
+        'title': row.get('Title'),
+        'author': row.get('Author'),
+        'genre': genres[0].replace('-', ' ').title() if genres else DEFAULT_GENRE,
+        'pages': row.get('Number of Pages'),
+        'publication_date': f'{int(year):04d}-01-01' if year.isdigit() and 0 < int(year) < 10000 else None,
+        'is_currently_reading': 'true' if row.get('Exclusive Shelf') == 'currently-reading' else 'false',
+        'notes': row.get('My Review'),
+    }
+
+
+class BookImporter:
+    """
+    Stream-imports books for one user.
+
+    Records are read one at a time from the upload, validated with
+    BookSerializer and written with bulk_create in batches of
+    ``batch_size``, one transaction per batch. Invalid records are skipped
+    and reported with their 1-based record number.
+    """
+    batch_size = 1000
+    max_reported_errors = 100
+
+    def __init__(self, user, batch_size=None):
+        self.user = user
+        if batch_size:
+            self.batch_size = batch_size
+        # One serializer validates every record; it holds no per-record state
+        self.validator = BookSerializer()
+
+    def run(self, stream, format='csv'):
+        """
+        Import every record of the binary ``stream`` and return a report
+        with the created and failed counts and the first errors
+        """
+        self.report = {'created': 0, 'failed': 0, 'errors': []}
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        batch = []
+        number = 0
+        try:
+            for number, record in enumerate(READERS[format](text), start=1):
+                data = self.validate(number, record)
+                if data is not None:
+                    batch.append(data)
+                if len(batch) >= self.batch_size:
+                    self.save(batch)
+                    batch = []
+        except (UnicodeDecodeError, csv.Error) as error:
+            self.add_error(number + 1, {'non_field_errors': [f'Could not read the file: {error}']})
+        finally:
+            text.detach()
+        if batch:
+            self.save(batch)
+        return self.report
+
+    def validate(self, number, record):
+        if isinstance(record, serializers.ValidationError):
+            self.add_error(number, record.detail)
+            return None
+        try:
+            return self.validator.run_validation(record)
+        except serializers.ValidationError as error:
+            self.add_error(number, error.detail)
+            return None
+
+    def add_error(self, number, detail):
+        self.report['failed'] += 1
+        if len(self.report['errors']) < self.max_reported_errors:
+            self.report['errors'].append({'record': number, 'errors': detail})
+
+    def save(self, batch):
+        """Write a batch of validated books and their reading progress"""
+        with transaction.atomic(using=router.db_for_write(Book)):
+            books = Book.objects.bulk_create(
+                Book(user=self.user, **{key: value for key, value in data.items() if key != 'reading_progress'})
+                for data in batch
+            )
+            # Every book gets a progress row, as BookSerializer.create does
+            ReadingProgress.objects.bulk_create(
+                ReadingProgress(book=book, **(data.get('reading_progress') or {}))
+                for book, data in zip(books, batch)
+            )
+        self.report['created'] += len(books)
@@ -0,0 +1,247 @@
+import http.client
+import json
+import random
+import statistics
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+
+# Relative weights of the operations in the default workload
+DEFAULT_MIX = {
+    'list': 40,
+    'search': 20,
+    'progress': 25,
+    'genres': 10,
+    'login': 5,
+}
+
+OPERATIONS = tuple(DEFAULT_MIX)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def parse_mix(value):
+    """Parse ``list=40,search=20,...`` into operation weights"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f'Unknown operation "{name}", expected one of {", ".join(OPERATIONS)}')
+        mix[name] = float(weight)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError('At least one operation needs a positive weight')
+    return mix
+
+
+class InProcessTransport:
+    """Sends requests straight through Django's request handler, without a server"""
+
+    def __init__(self):
+        hosts = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*']
+        self.client = Client(HTTP_HOST=hosts[0] if hosts else 'localhost')
+
+    def request(self, method, path, body=None, headers=None):
+        response = self.client.generic(
+            method, path, json.dumps(body) if body is not None else '',
+            content_type='application/json', headers=headers,
+        )
+        return response.status_code, response.content
+
+    def close(self):
+        pass
+
+
+class HTTPTransport:
+    """Sends requests over one keep-alive HTTP connection to a running server"""
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        self.host, self.port, self.prefix = url.hostname, url.port, url.path.rstrip('/')
+        self.connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self.connection = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = self.connection_class(self.host, self.port, timeout=30)
+            try:
+                self.connection.request(method, self.prefix + path, data, headers)
+                response = self.connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # The server may close idle keep-alive connections; retry once
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Session:
+    """A simulated reader: credentials, token and the books seen so far"""
+
+    def __init__(self, username):
+        self.username = username
+        self.token = None
+        self.books = {}
+
+
+class Worker:
+    """
+    Runs part of the workload on one transport and records the latency of
+    every request, keyed by operation
+    """
+
+    def __init__(self, transport, sessions, password, mix, words, requests, seed):
+        self.transport = transport
+        self.sessions = sessions
+        self.password = password
+        self.operations = list(mix)
+        self.weights = list(mix.values())
+        self.words = words
+        self.requests = requests
+        self.rng = random.Random(seed)
+        self.samples = {}
+        self.errors = {}
+
+    def run(self):
+        try:
+            for number in range(self.requests):
+                session = self.sessions[number % len(self.sessions)]
+                if session.token is None:
+                    self.login(session)
+                    continue
+                operation = self.rng.choices(self.operations, weights=self.weights)[0]
+                getattr(self, operation)(session)
+        finally:
+            self.transport.close()
+
+    def call(self, operation, method, path, session=None, body=None):
+        headers = {'Authorization': f'Bearer {session.token}'} if session and session.token else None
+        started = time.perf_counter()
+        status, content = self.transport.request(method, path, body, headers)
+        self.samples.setdefault(operation, []).append(time.perf_counter() - started)
+        if status >= 400:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+            return None
+        return json.loads(content) if content else None
+
+    def login(self, session):
+        data = self.call('login', 'POST', '/api/auth/login/',
+                         body={'username': session.username, 'password': self.password})
+        session.token = data['access'] if data else None
+
+    def list(self, session):
+        data = self.call('list', 'GET', '/api/books/?pagination=cursor&page_size=20', session)
+        if data:
+            session.books.update((book['id'], book['pages']) for book in data['results'])
+
+    def search(self, session):
+        query = urlencode({'search': self.rng.choice(self.words), 'pagination': 'cursor'})
+        self.call('search', 'GET', f'/api/books/?{query}', session)
+
+    def progress(self, session):
+        if not session.books:
+            self.list(session)
+            return
+        book_id = self.rng.choice(list(session.books))
+        pages = session.books[book_id] or 100
+        self.call('progress', 'PATCH', f'/api/books/{book_id}/progress/', session,
+                  body={'current_page': self.rng.randint(0, pages)})
+
+    def genres(self, session):
+        self.call('genres', 'GET', '/api/books/genres/', session)
+
+
+def summarize(samples, errors, seconds):
+    latencies = [sample * 1000 for sample in samples]
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': round(len(latencies) / seconds, 1) if seconds else None,
+        'mean_ms': round(statistics.fmean(latencies), 2),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'max_ms': round(max(latencies), 2),
+    }
+
+
+def run_in_thread(worker):
+    try:
+        worker.run()
+    finally:
+        # Threads get their own database connections, which would leak
+        connections.close_all()
+
+
+def run_load_test(usernames, password, requests, concurrency=1, base_url=None,
+                  mix=None, words=('the',), seed=0):
+    """
+    Replay a mixed workload as the given users and return a report with the
+    throughput and latency percentiles of every operation.
+
+    Requests go through Django in-process, or to ``base_url`` over HTTP when
+    given. Users are split between ``concurrency`` workers, each on its own
+    thread and connection; a single worker runs on the calling thread.
+    """
+    mix = mix or DEFAULT_MIX
+    concurrency = max(1, min(concurrency, len(usernames)))
+    workers = []
+    for index in range(concurrency):
+        transport = HTTPTransport(base_url) if base_url else InProcessTransport()
+        workers.append(Worker(
+            transport, [Session(username) for username in usernames[index::concurrency]],
+            password, mix, list(words),
+            requests // concurrency + (1 if index < requests % concurrency else 0),
+            seed + index,
+        ))
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        workers[0].run()
+    else:
+        threads = [threading.Thread(target=run_in_thread, args=(worker,)) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    seconds = time.perf_counter() - started
+
+    samples, errors = {}, {}
+    for worker in workers:
+        for operation, latencies in worker.samples.items():
+            samples.setdefault(operation, []).extend(latencies)
+        for operation, count in worker.errors.items():
+            errors[operation] = errors.get(operation, 0) + count
+    return {
+        'mode': 'http' if base_url else 'in-process',
+        'users': len(usernames),
+        'concurrency': concurrency,
+        'seconds': round(seconds, 3),
+        'endpoints': {
+            operation: summarize(samples[operation], errors.get(operation, 0), seconds)
+            for operation in OPERATIONS if operation in samples
+        },
+        'overall': summarize(
+            [sample for latencies in samples.values() for sample in latencies],
+            sum(errors.values()), seconds,
+        ),
+    }
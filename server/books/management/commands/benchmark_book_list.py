@@ -0,0 +1,78 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import router, transaction
+
+from books.models import Book, ReadingProgress
+from books.projections import project_books, represent_books
+from books.serializers import BookSerializer
+from books.sharding import shard_for_user, use_shard
+from books.synthetic import BookFactory
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure rows per second for BookSerializer and the projection path "
+        "that backs the list endpoints. Run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1000,
+                            help='Number of books rendered per run')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Timed runs per path')
+        parser.add_argument('--username', default='benchmark_book_list')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the benchmark library for later runs')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username=options['username'])
+        with use_shard(shard_for_user(user.pk)):
+            self.populate(user, BookFactory(seed=options['seed']), options['books'])
+            queryset = Book.objects.filter(user=user).select_related('reading_progress')[:options['books']]
+
+            results = {
+                'books': options['books'],
+                'serializer': self.measure(
+                    options['repeat'],
+                    lambda: BookSerializer(queryset, many=True).data,
+                ),
+                'projection': self.measure(
+                    options['repeat'],
+                    lambda: represent_books(project_books(queryset)),
+                ),
+            }
+            results['speedup'] = round(
+                results['projection']['rows_per_second'] / results['serializer']['rows_per_second'], 2
+            )
+            self.stdout.write(json.dumps(results, indent=2))
+
+        if not options['keep']:
+            user.delete()
+
+    def populate(self, user, factory, count):
+        missing = count - Book.objects.filter(user=user).count()
+        if missing <= 0:
+            return
+        with transaction.atomic(using=router.db_for_write(Book)):
+            books = Book.objects.bulk_create(factory.books(user, missing))
+            ReadingProgress.objects.bulk_create(
+                ReadingProgress(book=book, current_page=(book.pages or 0) // 3)
+                for book in books
+            )
+
+    @staticmethod
+    def measure(repeat, render):
+        rows = 0
+        started = time.perf_counter()
+        for _ in range(repeat):
+            rows += len(render())
+        elapsed = time.perf_counter() - started
+        return {
+            'runs': repeat,
+            'seconds': round(elapsed, 4),
+            'rows_per_second': round(rows / elapsed),
+        }
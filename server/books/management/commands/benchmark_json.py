@@ -0,0 +1,87 @@
+import io
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from books.management.commands.benchmark_book_list import Command as BookListBenchmark
+from books.models import Book
+from books.projections import project_books, represent_books
+from books.sharding import shard_for_user, use_shard
+from books.synthetic import BookFactory
+from readily_reads.parsers import ORJSONParser
+from readily_reads.renderers import ORJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how fast DRF's JSONRenderer and JSONParser and the orjson "
+        "classes render and parse a page of books, and check that both "
+        "render the same bytes. Run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1000,
+                            help='Number of books on the page')
+        parser.add_argument('--repeat', type=int, default=50,
+                            help='Timed runs per class')
+        parser.add_argument('--username', default='benchmark_json')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the benchmark library for later runs')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError('orjson is not installed')
+        user, _ = User.objects.get_or_create(username=options['username'])
+        with use_shard(shard_for_user(user.pk)):
+            BookListBenchmark().populate(user, BookFactory(seed=options['seed']), options['books'])
+            queryset = Book.objects.filter(user=user).order_by('-created_at')[:options['books']]
+            page = {
+                'count': options['books'],
+                'next': None,
+                'previous': None,
+                'results': represent_books(project_books(queryset)),
+            }
+
+            body = JSONRenderer().render(page)
+            if ORJSONRenderer().render(page) != body:
+                raise CommandError('ORJSONRenderer output differs from JSONRenderer')
+            if ORJSONParser().parse(io.BytesIO(body)) != JSONParser().parse(io.BytesIO(body)):
+                raise CommandError('ORJSONParser output differs from JSONParser')
+
+            repeat = options['repeat']
+            results = {
+                'books': options['books'],
+                'bytes': len(body),
+                'render': {
+                    'drf': self.measure(repeat, lambda: JSONRenderer().render(page)),
+                    'orjson': self.measure(repeat, lambda: ORJSONRenderer().render(page)),
+                },
+                'parse': {
+                    'drf': self.measure(repeat, lambda: JSONParser().parse(io.BytesIO(body))),
+                    'orjson': self.measure(repeat, lambda: ORJSONParser().parse(io.BytesIO(body))),
+                },
+            }
+            for operation in ('render', 'parse'):
+                timings = results[operation]
+                timings['speedup'] = round(timings['drf']['ms_per_page'] / timings['orjson']['ms_per_page'], 2)
+            self.stdout.write(json.dumps(results, indent=2))
+
+        if not options['keep']:
+            user.delete()
+
+    @staticmethod
+    def measure(repeat, run):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        elapsed = time.perf_counter() - started
+        return {
+            'runs': repeat,
+            'seconds': round(elapsed, 4),
+            'ms_per_page': round(elapsed * 1000 / repeat, 3),
+        }
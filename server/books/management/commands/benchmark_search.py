@@ -0,0 +1,115 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import router, transaction
+from django.db.models import Q
+
+from books.loadtest import percentile
+from books.models import Book
+from books.search import get_search_backend
+from books.sharding import shard_for_user, use_shard
+from books.synthetic import BookFactory
+
+
+def legacy_search(queryset, query):
+    """The icontains search BookViewSet used before the search backends"""
+    return queryset.filter(
+        Q(title__icontains=query) |
+        Q(author__icontains=query) |
+        Q(description__icontains=query)
+    ).order_by('-created_at')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the legacy icontains search with the configured search backend "
+        "on a synthetic library. Run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1_000_000,
+                            help='Number of books in the benchmark library')
+        parser.add_argument('--queries', type=int, default=30,
+                            help='Number of distinct queries to time')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Timed runs per query')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--username', default='benchmark_search')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the benchmark library for later runs')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        factory = BookFactory(seed=options['seed'])
+        user, _ = User.objects.get_or_create(username=options['username'])
+        with use_shard(shard_for_user(user.pk)):
+            self.populate(user, factory, options['books'], options['batch_size'])
+
+            queryset = Book.objects.filter(user=user)
+            backend = get_search_backend(queryset.db)
+            queries = self.make_queries(factory, options['queries'])
+
+            results = {
+                'books': queryset.count(),
+                'backend': type(backend).__name__,
+                'legacy': self.time_queries(
+                    queries, options['repeat'],
+                    lambda query: legacy_search(queryset, query),
+                ),
+                'backend_search': self.time_queries(
+                    queries, options['repeat'],
+                    lambda query: backend.search(queryset, query, user_id=user.pk)
+                    .order_by('-search_rank', '-created_at'),
+                ),
+            }
+            self.stdout.write(json.dumps(results, indent=2))
+
+        if not options['keep']:
+            user.delete()
+
+    def populate(self, user, factory, count, batch_size):
+        existing = Book.objects.filter(user=user).count()
+        missing = count - existing
+        if missing <= 0:
+            return
+        self.stderr.write(f'Creating {missing} books for {user.username}...')
+        while missing > 0:
+            size = min(batch_size, missing)
+            with transaction.atomic(using=router.db_for_write(Book)):
+                Book.objects.bulk_create(factory.books(user, size), batch_size=batch_size)
+            missing -= size
+
+    @staticmethod
+    def make_queries(factory, count):
+        """
+        Mix common, rare and partially typed terms, the way a search box
+        sends them while the user types.
+        """
+        vocabulary = factory.vocabulary
+        step = max(1, len(vocabulary) // count)
+        queries = []
+        for index, word in enumerate(vocabulary[::step][:count]):
+            queries.append(word[:3] if index % 3 == 0 else word)
+        return queries
+
+    @staticmethod
+    def time_queries(queries, repeat, search):
+        """Time the first page and total count, as the list endpoint does"""
+        samples = []
+        for query in queries:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                results = search(query)
+                list(results[:10])
+                results.count()
+                samples.append((time.perf_counter() - started) * 1000)
+        return {
+            'runs': len(samples),
+            'mean_ms': round(statistics.mean(samples), 3),
+            'p50_ms': round(percentile(samples, 0.50), 3),
+            'p95_ms': round(percentile(samples, 0.95), 3),
+            'max_ms': round(max(samples), 3),
+        }
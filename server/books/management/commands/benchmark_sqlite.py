@@ -0,0 +1,151 @@
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+
+from books.loadtest import summarize
+from books.models import Book, ReadingProgress
+from books.projections import project_books, represent_books
+
+
+def run_worker(path, database, persistent, write_ratio, seconds, book_ids, user_ids, seed, start, results):
+    """
+    Process body: alternate book list reads and progress writes until the
+    time is up, then report the latency of each. A non-persistent worker
+    closes its connection after every operation, like CONN_MAX_AGE=0 does
+    at the end of each request.
+    """
+    connection.settings_dict.update(database, NAME=path)
+    rng = random.Random(seed)
+    samples, errors = {'read': [], 'write': []}, {'read': 0, 'write': 0}
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        operation = 'write' if rng.random() < write_ratio else 'read'
+        started = time.perf_counter()
+        try:
+            if operation == 'write':
+                with transaction.atomic():
+                    ReadingProgress.objects.filter(book_id=rng.choice(book_ids)).update(
+                        current_page=rng.randint(0, 300),
+                    )
+            else:
+                queryset = Book.objects.filter(user_id=rng.choice(user_ids)).order_by('-pk')[:20]
+                represent_books(project_books(queryset))
+        except OperationalError:
+            errors[operation] += 1
+        samples[operation].append(time.perf_counter() - started)
+        if not persistent:
+            connection.close()
+    connection.close()
+    results.put((samples, errors))
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure read and write throughput of the SQLite database from "
+        "several worker processes, forked like gunicorn workers, with "
+        "SQLite's defaults and with the connection options in settings. "
+        "Each profile runs against its own copy of the database, so the "
+        "database itself is never written to."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=10.0,
+                            help='Duration of each profile')
+        parser.add_argument('--write-ratio', type=float, default=0.25,
+                            help='Fraction of operations that update reading progress')
+        parser.add_argument('--output', default=None, help='Write the report to this file')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        source = settings.DATABASES['default']
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            raise CommandError('benchmark_sqlite needs an SQLite database file')
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('benchmark_sqlite needs a platform that can fork worker processes')
+
+        rng = random.Random(options['seed'])
+        book_ids = list(ReadingProgress.objects.values_list('book_id', flat=True)[:50000])
+        user_ids = list(Book.objects.order_by().values_list('user_id', flat=True).distinct())
+        if not book_ids:
+            raise CommandError('No reading progress to update; run seed_library first')
+        book_ids = rng.sample(book_ids, min(len(book_ids), 5000))
+
+        profiles = {
+            'defaults': ({**source, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}}, False, 'DELETE'),
+            'configured': (source, source.get('CONN_MAX_AGE', 0) != 0, settings.SQLITE_JOURNAL_MODE or 'DELETE'),
+        }
+        report = {
+            'workers': options['workers'],
+            'seconds': options['seconds'],
+            'write_ratio': options['write_ratio'],
+            'profiles': {},
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            for name, (database, persistent, journal_mode) in profiles.items():
+                path = os.path.join(directory, f'{name}.sqlite3')
+                self.copy_database(source['NAME'], path, journal_mode)
+                report['profiles'][name] = self.run_profile(
+                    path, database, persistent, book_ids, user_ids, options,
+                )
+
+        before, after = report['profiles']['defaults'], report['profiles']['configured']
+        report['speedup'] = {
+            operation: round(after[operation]['throughput'] / before[operation]['throughput'], 2)
+            for operation in ('read', 'write')
+            if operation in before and operation in after
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        self.stdout.write(output)
+
+    @staticmethod
+    def copy_database(source, path, journal_mode):
+        """Copy the database, then switch the copy to the journal mode of the profile"""
+        with sqlite3.connect(source) as original, sqlite3.connect(path) as copy:
+            original.backup(copy)
+        copy = sqlite3.connect(path)
+        try:
+            copy.execute(f'PRAGMA journal_mode={journal_mode}')
+        finally:
+            copy.close()
+
+    def run_profile(self, path, database, persistent, book_ids, user_ids, options):
+        # Children must not inherit an open connection
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        start, results = context.Event(), context.Queue()
+        processes = [
+            context.Process(target=run_worker, args=(
+                path, database, persistent, options['write_ratio'], options['seconds'],
+                book_ids, user_ids, options['seed'] + index, start, results,
+            ))
+            for index in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        start.set()
+        samples, errors = {'read': [], 'write': []}, {'read': 0, 'write': 0}
+        for _ in processes:
+            worker_samples, worker_errors = results.get()
+            for operation in samples:
+                samples[operation].extend(worker_samples[operation])
+                errors[operation] += worker_errors[operation]
+        for process in processes:
+            process.join()
+        return {
+            operation: summarize(samples[operation], errors[operation], options['seconds'])
+            for operation in samples
+            if samples[operation]
+        }
@@ -0,0 +1,26 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from books.sharding import shard_aliases, use_shard
+from books.sync import compact_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete book tombstones older than BOOKS_TOMBSTONE_RETENTION_DAYS. "
+        "Clients with older sync cursors are told to do a full sync."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.BOOKS_TOMBSTONE_RETENTION_DAYS,
+                            help='Retention in days; keep it at or above the setting, '
+                                 'or clients may miss deletions')
+
+    def handle(self, *args, **options):
+        deleted = 0
+        for alias in shard_aliases():
+            with use_shard(alias):
+                deleted += compact_tombstones(datetime.timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones'))
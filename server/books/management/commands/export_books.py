@@ -0,0 +1,42 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from books.exporters import CHUNK_SIZE, FORMATS, export_books
+from books.models import Book
+from books.sharding import shard_aliases, shard_for_user
+
+
+class Command(BaseCommand):
+    help = (
+        "Export books as NDJSON or CSV, for every user or just one, with "
+        "constant memory use. Suitable for backups."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--username', help='Only export this user\'s books')
+        parser.add_argument('--output', help='File to write to; standard output by default')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        queryset, shards = Book.objects.all(), shard_aliases()
+        if options['username']:
+            try:
+                user = User.objects.get(username=options['username'])
+            except User.DoesNotExist:
+                raise CommandError(f'Unknown user "{options["username"]}"')
+            queryset, shards = queryset.filter(user=user), [shard_for_user(user.pk)]
+
+        chunks = export_books(
+            queryset, options['format'],
+            include_username=not options['username'],
+            chunk_size=options['chunk_size'],
+            shards=shards,
+        )
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for chunk in chunks:
+                output.write(chunk)
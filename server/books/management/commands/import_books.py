@@ -0,0 +1,41 @@
+import json
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from books.importers import BookImporter, FORMATS, ImportFormatError, detect_format
+from books.sharding import shard_for_user, use_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Import books for a user from a CSV, NDJSON or Goodreads export file "
+        "and print a JSON report of created and failed records."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - for standard input')
+        parser.add_argument('--username', required=True)
+        parser.add_argument('--format', choices=FORMATS,
+                            help='File format; guessed from the extension by default')
+        parser.add_argument('--batch-size', type=int, default=BookImporter.batch_size)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Unknown user "{options["username"]}"')
+        try:
+            format = detect_format(options['path'], options['format'])
+        except ImportFormatError as error:
+            raise CommandError(str(error))
+
+        importer = BookImporter(user, batch_size=options['batch_size'])
+        with use_shard(shard_for_user(user.pk)):
+            if options['path'] == '-':
+                report = importer.run(sys.stdin.buffer, format)
+            else:
+                with open(options['path'], 'rb') as stream:
+                    report = importer.run(stream, format)
+        self.stdout.write(json.dumps(report, indent=2))
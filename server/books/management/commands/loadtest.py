@@ -0,0 +1,56 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from books.loadtest import DEFAULT_MIX, parse_mix, run_load_test
+from books.synthetic import BookFactory
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a mixed workload of logins, book lists, searches, progress "
+        "updates and genre lookups as the users created by seed_library, and "
+        "report throughput and p50/p95/p99 latency per endpoint as JSON. "
+        "Requests run in-process unless --url points at a running server "
+        "sharing the same database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Workers, each on its own thread and connection')
+        parser.add_argument('--users', type=int, default=None,
+                            help='Number of seeded users to act as; all by default')
+        parser.add_argument('--prefix', default='loadtest')
+        parser.add_argument('--password', default='loadtest-password')
+        parser.add_argument('--url', default=None,
+                            help='Base URL of a running server, e.g. http://localhost:8000')
+        parser.add_argument('--mix', default=','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items()),
+                            help='Operation weights, e.g. list=40,search=20,progress=25,genres=10,login=5')
+        parser.add_argument('--output', default=None, help='Write the report to this file')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed for the workload; use the seed_library seed for realistic search terms')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(str(error))
+        usernames = list(
+            User.objects.filter(username__startswith=f"{options['prefix']}-")
+            .order_by('username').values_list('username', flat=True)[:options['users']]
+        )
+        if not usernames:
+            raise CommandError(f"No users named {options['prefix']}-*; run seed_library first")
+
+        words = BookFactory(seed=options['seed']).words(200)
+        report = run_load_test(
+            usernames, options['password'], options['requests'], options['concurrency'],
+            base_url=options['url'], mix=mix, words=words, seed=options['seed'],
+        )
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        self.stdout.write(output)
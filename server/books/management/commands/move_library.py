@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from books.sharding import ShardConflict, move_library, shard_aliases, sharding_enabled
+
+
+class Command(BaseCommand):
+    help = (
+        "Move a user's library to another shard while the API stays up. "
+        "Reads are served throughout; writes to the library are refused with "
+        "503 while it is copied. Sync cursors issued before the move expire."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('shard', help='Database alias listed in BOOKS_SHARDS')
+        parser.add_argument('--grace', type=float, default=5.0,
+                            help='Seconds to wait for writes already under way before copying')
+
+    def handle(self, *args, **options):
+        if not sharding_enabled():
+            raise CommandError('Books are not sharded; list more databases in BOOKS_SHARDS')
+        if options['shard'] not in shard_aliases():
+            raise CommandError(f"Unknown shard \"{options['shard']}\", expected one of {', '.join(shard_aliases())}")
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"Unknown username \"{options['username']}\"")
+
+        try:
+            copied = move_library(user.pk, options['shard'], grace=options['grace'])
+        except ShardConflict as error:
+            raise CommandError(str(error))
+        if copied is None:
+            self.stdout.write(f"The library of {user.username} is already on {options['shard']}")
+            return
+        counts = ', '.join(f'{count} {name.replace("_", " ")}' for name, count in copied.items())
+        self.stdout.write(self.style.SUCCESS(f"Moved the library of {user.username} to {options['shard']}: {counts}"))
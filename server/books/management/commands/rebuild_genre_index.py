@@ -0,0 +1,57 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from books.models import GenreCount, LibraryVersion
+from books.sharding import shard_aliases, use_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the per-user genre index from the books table, or with "
+        "--verify check that it matches the books table without changing it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', action='append', dest='usernames',
+                            help='Only this user; may be given more than once')
+        parser.add_argument('--verify', action='store_true',
+                            help='Compare stored counts with live ones and fail on mismatch')
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+            user_ids = list(users.values_list('id', flat=True))
+            if len(user_ids) != len(set(options['usernames'])):
+                raise CommandError('Unknown username given')
+
+        if not options['verify']:
+            rows = 0
+            for alias in shard_aliases():
+                with use_shard(alias):
+                    rows += GenreCount.objects.rebuild(user_ids)
+                    # Cached genres responses were built from the old counts
+                    versions = LibraryVersion.objects.all()
+                    if user_ids is not None:
+                        versions = versions.filter(user_id__in=user_ids)
+                    versions.update(version=F('version') + 1)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt genre index with {rows} rows'))
+            return
+
+        # Each library lives on a single shard, so the keys never overlap
+        stored, live = {}, {}
+        for alias in shard_aliases():
+            with use_shard(alias):
+                stored.update(GenreCount.objects.stored_counts(user_ids))
+                live.update(GenreCount.objects.live_counts(user_ids))
+        mismatches = sorted(
+            (key, stored.get(key, 0), live.get(key, 0))
+            for key in stored.keys() | live.keys()
+            if stored.get(key, 0) != live.get(key, 0)
+        )
+        for (user_id, genre), stored_count, live_count in mismatches:
+            self.stderr.write(f'user {user_id} genre {genre!r}: stored {stored_count}, live {live_count}')
+        if mismatches:
+            raise CommandError(f'Genre index has {len(mismatches)} mismatched rows')
+        self.stdout.write(self.style.SUCCESS(f'Genre index matches ({len(live)} rows)'))
@@ -0,0 +1,28 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from books.reading_log import GAP_TIMEOUT, roll_up_events
+from books.sharding import shard_aliases, use_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold new reading events into the daily and weekly rollups. Safe to "
+        "interrupt and re-run; each batch commits together with its checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--gap-timeout', type=float, default=GAP_TIMEOUT.total_seconds(),
+                            help='Seconds to keep waiting for event ids missing below the checkpoint')
+
+    def handle(self, *args, **options):
+        processed = 0
+        for alias in shard_aliases():
+            with use_shard(alias):
+                processed += roll_up_events(
+                    batch_size=options['batch_size'],
+                    gap_timeout=datetime.timedelta(seconds=options['gap_timeout']),
+                )
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {processed} reading events'))
@@ -0,0 +1,69 @@
+import json
+import random
+import time
+from collections import defaultdict
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from books.models import Book, ReadingProgress
+from books.sharding import shard_for_user, use_shard
+from books.synthetic import BookFactory, library_sizes
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed users with synthetic libraries for load tests: a skewed number "
+        "of books per user, per-user favourite genres and reading progress. "
+        "Run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--mean-books', type=int, default=200,
+                            help='Mean library size; sizes are log-normally distributed')
+        parser.add_argument('--prefix', default='loadtest',
+                            help='Usernames are <prefix>-<number>')
+        parser.add_argument('--password', default='loadtest-password',
+                            help='Password given to every seeded user')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        factory = BookFactory(seed=options['seed'])
+        sizes = library_sizes(options['users'], options['mean_books'], random.Random(options['seed']))
+        # Hashing is deliberately slow, so every user shares one hash
+        password = make_password(options['password'])
+
+        created_users = books = 0
+        # Books waiting to be written, by the shard of their owner
+        batches = defaultdict(list)
+        for number, size in enumerate(sizes):
+            username = f"{options['prefix']}-{number:05d}"
+            if User.objects.filter(username=username).exists():
+                continue
+            user = User.objects.create(username=username, password=password)
+            created_users += 1
+            alias = shard_for_user(user.pk)
+            for book in factory.library(user, size):
+                batches[alias].append(book)
+                if len(batches[alias]) >= options['batch_size']:
+                    books += self.save(factory, batches.pop(alias), alias)
+        for alias, batch in batches.items():
+            books += self.save(factory, batch, alias)
+
+        self.stdout.write(json.dumps({
+            'users': created_users,
+            'books': books,
+            'seconds': round(time.perf_counter() - started, 2),
+        }, indent=2))
+
+    @staticmethod
+    def save(factory, batch, alias):
+        with use_shard(alias), transaction.atomic(using=alias):
+            books = Book.objects.bulk_create(batch)
+            ReadingProgress.objects.bulk_create(factory.progress(book) for book in books)
+        return len(books)
@@ -0,0 +1,69 @@
+from django.db import migrations
+
+# Full-text index over books_book, kept in sync by triggers so that saves,
+# deletes and bulk operations never leave it stale. Only SQLite gets the FTS5
+# table; other databases fall back to their own search backend.
+#
+# SQLite drops triggers along with their table, so any later migration that
+# makes Django remake books_book must create these triggers again.
+CREATE_SEARCH_INDEX = [
+    """
+    CREATE VIRTUAL TABLE books_book_fts USING fts5(
+        title, author, genre, description, user_id,
+        content='books_book', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER books_book_fts_insert AFTER INSERT ON books_book BEGIN
+        INSERT INTO books_book_fts(rowid, title, author, genre, description, user_id)
+        VALUES (new.id, new.title, new.author, new.genre, new.description, new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER books_book_fts_delete AFTER DELETE ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, author, genre, description, user_id)
+        VALUES ('delete', old.id, old.title, old.author, old.genre, old.description, old.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER books_book_fts_update
+    AFTER UPDATE OF title, author, genre, description, user_id ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, author, genre, description, user_id)
+        VALUES ('delete', old.id, old.title, old.author, old.genre, old.description, old.user_id);
+        INSERT INTO books_book_fts(rowid, title, author, genre, description, user_id)
+        VALUES (new.id, new.title, new.author, new.genre, new.description, new.user_id);
+    END
+    """,
+    "INSERT INTO books_book_fts(books_book_fts) VALUES ('rebuild')",
+]
+
+DROP_SEARCH_INDEX = [
+    "DROP TRIGGER IF EXISTS books_book_fts_update",
+    "DROP TRIGGER IF EXISTS books_book_fts_delete",
+    "DROP TRIGGER IF EXISTS books_book_fts_insert",
+    "DROP TABLE IF EXISTS books_book_fts",
+]
+
+
+def run_statements(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_statements(CREATE_SEARCH_INDEX),
+            run_statements(DROP_SEARCH_INDEX),
+        ),
+    ]
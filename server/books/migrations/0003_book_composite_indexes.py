@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_book_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='book_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['user', 'genre', 'created_at'], name='book_user_genre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['user', 'is_currently_reading', 'created_at'], name='book_user_reading_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_genre_counts(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    GenreCount = apps.get_model('books', 'GenreCount')
+    db_alias = schema_editor.connection.alias
+    rows = Book.objects.using(db_alias).order_by().values('user_id', 'genre').annotate(count=Count('id'))
+    GenreCount.objects.using(db_alias).bulk_create(
+        GenreCount(user_id=row['user_id'], genre=row['genre'], book_count=row['count'])
+        for row in rows.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_book_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenreCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('genre', models.CharField(max_length=50, verbose_name='Genre')),
+                ('book_count', models.PositiveIntegerField(default=0, verbose_name='Book Count')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='genre_counts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Genre Count',
+                'verbose_name_plural': 'Genre Counts',
+                'constraints': [models.UniqueConstraint(fields=('user', 'genre'), name='genre_count_user_genre_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_genre_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_library_versions(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    LibraryVersion = apps.get_model('books', 'LibraryVersion')
+    db_alias = schema_editor.connection.alias
+    LibraryVersion.objects.using(db_alias).bulk_create(
+        LibraryVersion(user_id=user_id)
+        for user_id in User.objects.using(db_alias).values_list('pk', flat=True).iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('books', '0005_genre_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibraryVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='library_version', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('version', models.PositiveBigIntegerField(default=1, verbose_name='Version')),
+            ],
+            options={
+                'verbose_name': 'Library Version',
+                'verbose_name_plural': 'Library Versions',
+            },
+        ),
+        migrations.RunPython(create_library_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_library_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.IntegerField(verbose_name='User ID')),
+                ('book_id', models.BigIntegerField(verbose_name='Book ID')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Deleted At')),
+            ],
+            options={
+                'verbose_name': 'Book Tombstone',
+                'verbose_name_plural': 'Book Tombstones',
+                'indexes': [models.Index(fields=['user_id', 'id'], name='tombstone_user_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_book_tombstone'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Name')),
+                ('last_event_id', models.BigIntegerField(default=0, verbose_name='Last Event ID')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+            ],
+            options={
+                'verbose_name': 'Rollup Checkpoint',
+                'verbose_name_plural': 'Rollup Checkpoints',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyReadingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book_id', models.BigIntegerField(verbose_name='Book ID')),
+                ('day', models.DateField(verbose_name='Day')),
+                ('pages_read', models.PositiveIntegerField(default=0, verbose_name='Pages Read')),
+                ('events', models.PositiveIntegerField(default=0, verbose_name='Events')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_reading', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Reading Rollup',
+                'verbose_name_plural': 'Daily Reading Rollups',
+                'indexes': [models.Index(fields=['user', 'day'], name='daily_rollup_user_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'book_id', 'day'), name='daily_rollup_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReadingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book_id', models.BigIntegerField(verbose_name='Book ID')),
+                ('previous_page', models.PositiveIntegerField(blank=True, null=True, verbose_name='Previous Page')),
+                ('page', models.PositiveIntegerField(verbose_name='Page')),
+                ('occurred_at', models.DateTimeField(verbose_name='Occurred At')),
+                ('recorded_at', models.DateTimeField(auto_now_add=True, verbose_name='Recorded At')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reading_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Reading Event',
+                'verbose_name_plural': 'Reading Events',
+                'indexes': [models.Index(fields=['book_id', 'id'], name='reading_event_book_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WeeklyReadingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book_id', models.BigIntegerField(verbose_name='Book ID')),
+                ('week', models.DateField(verbose_name='Week')),
+                ('pages_read', models.PositiveIntegerField(default=0, verbose_name='Pages Read')),
+                ('events', models.PositiveIntegerField(default=0, verbose_name='Events')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_reading', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Weekly Reading Rollup',
+                'verbose_name_plural': 'Weekly Reading Rollups',
+                'indexes': [models.Index(fields=['user', 'week'], name='weekly_rollup_user_week_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'book_id', 'week'), name='weekly_rollup_uniq')],
+            },
+        ),
+    ]
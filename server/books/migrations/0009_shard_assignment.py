@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('books', '0008_reading_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardAssignment',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='shard_assignment', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('shard', models.CharField(max_length=50, verbose_name='Shard')),
+                ('moving', models.BooleanField(default=False, verbose_name='Moving')),
+                ('moved_at', models.DateTimeField(blank=True, null=True, verbose_name='Moved At')),
+            ],
+            options={
+                'verbose_name': 'Shard Assignment',
+                'verbose_name_plural': 'Shard Assignments',
+            },
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Book.change_seq orders changes for delta sync. A counter row bumped by
+# triggers inside the writing transaction hands out numbers in commit order:
+# SQLite has a single writer, and on PostgreSQL the counter's row lock is held
+# until commit, so the next writer waits and reads the committed value. Once a
+# reader sees a number, every smaller one is already visible. Timestamps and
+# plain sequences are taken before the transaction commits and give no such
+# guarantee. Existing books are numbered in (updated_at, id) order. Other
+# databases get no triggers, and sync refuses to run on them.
+#
+# SQLite drops triggers along with their table, so any later migration that
+# makes Django remake books_book must create these triggers again.
+CREATE_COUNTER = [
+    "CREATE TABLE books_book_change_counter (value BIGINT NOT NULL)",
+    "INSERT INTO books_book_change_counter (value) VALUES (0)",
+    """
+    UPDATE books_book SET change_seq = numbered.seq
+    FROM (SELECT id, row_number() OVER (ORDER BY updated_at, id) AS seq FROM books_book) AS numbered
+    WHERE books_book.id = numbered.id
+    """,
+    "UPDATE books_book_change_counter SET value = (SELECT coalesce(max(change_seq), 0) FROM books_book)",
+]
+
+CREATE_SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER books_book_change_seq_insert AFTER INSERT ON books_book BEGIN
+        UPDATE books_book_change_counter SET value = value + 1;
+        UPDATE books_book SET change_seq = (SELECT value FROM books_book_change_counter)
+        WHERE id = new.id;
+    END
+    """,
+    # Fires on every update, whatever change_seq Django writes back, except
+    # the insert trigger's own update of a new row. Its inner update does not
+    # fire it again, as recursive triggers are off.
+    """
+    CREATE TRIGGER books_book_change_seq_update AFTER UPDATE ON books_book
+    WHEN old.change_seq IS NOT NULL BEGIN
+        UPDATE books_book_change_counter SET value = value + 1;
+        UPDATE books_book SET change_seq = (SELECT value FROM books_book_change_counter)
+        WHERE id = new.id;
+    END
+    """,
+]
+
+# A BEFORE trigger numbers the row as it is written, on every update
+# whatever change_seq Django writes back
+CREATE_POSTGRES_TRIGGERS = [
+    """
+    CREATE FUNCTION books_book_next_change_seq() RETURNS trigger AS $$
+    BEGIN
+        UPDATE books_book_change_counter SET value = value + 1 RETURNING value INTO NEW.change_seq;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER books_book_change_seq BEFORE INSERT OR UPDATE ON books_book
+    FOR EACH ROW EXECUTE FUNCTION books_book_next_change_seq()
+    """,
+]
+
+CREATE_CHANGE_SEQ = {
+    'sqlite': CREATE_COUNTER + CREATE_SQLITE_TRIGGERS,
+    'postgresql': CREATE_COUNTER + CREATE_POSTGRES_TRIGGERS,
+}
+
+DROP_CHANGE_SEQ = {
+    'sqlite': [
+        "DROP TRIGGER IF EXISTS books_book_change_seq_update",
+        "DROP TRIGGER IF EXISTS books_book_change_seq_insert",
+        "DROP TABLE IF EXISTS books_book_change_counter",
+    ],
+    'postgresql': [
+        "DROP TRIGGER IF EXISTS books_book_change_seq ON books_book",
+        "DROP FUNCTION IF EXISTS books_book_next_change_seq()",
+        "DROP TABLE IF EXISTS books_book_change_counter",
+    ],
+}
+
+
+def run_statements(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_shard_assignment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='change_seq',
+            field=models.BigIntegerField(editable=False, null=True, verbose_name='Change Sequence'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['user', 'change_seq'], name='book_user_change_idx'),
+        ),
+        migrations.RunPython(
+            run_statements(CREATE_CHANGE_SEQ),
+            run_statements(DROP_CHANGE_SEQ),
+        ),
+    ]
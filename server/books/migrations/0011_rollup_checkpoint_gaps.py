@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0010_book_change_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rollupcheckpoint',
+            name='gaps',
+            field=models.JSONField(default=list, verbose_name='Gaps'),
+        ),
+    ]
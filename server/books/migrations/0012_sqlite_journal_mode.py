@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db import migrations
+
+# The journal mode is stored in the database file, so it is set here once
+# per database instead of by every connection, which would rewrite the file
+# header even of a database that is only read. SQLite refuses to switch to
+# WAL inside a transaction, hence a non-atomic migration. In-memory
+# databases, such as the test database, have no journal to switch.
+
+
+def set_journal_mode(apps, schema_editor):
+    connection = schema_editor.connection
+    mode = getattr(settings, 'SQLITE_JOURNAL_MODE', None)
+    if connection.vendor != 'sqlite' or not mode or connection.is_in_memory_db():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode={mode}')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('books', '0011_rollup_checkpoint_gaps'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_journal_mode, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,177 @@
-from django.db import models
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import Combinable
+from django.db.models.functions import Cast, Coalesce, Floor, Least
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+# Set while a bulk operation maintains GenreCount and LibraryVersion itself,
+# so the per-instance signals in books.signals and nested updates stand aside
+in_bulk_operation = ContextVar('in_bulk_operation', default=False)
+
+
+@contextmanager
+def bulk_operation():
+    token = in_bulk_operation.set(True)
+    try:
+        yield
+    finally:
+        in_bulk_operation.reset(token)
+
+
+class BookQuerySet(models.QuerySet):
+    """
+    Keeps GenreCount, LibraryVersion and BookTombstone in step with bulk
+    operations, which bypass the model signals in books.signals
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            GenreCount.objects.adjust(Counter((book.user_id, book.genre) for book in objs))
+            LibraryVersion.objects.bump({book.user_id for book in objs})
+        for book in objs:
+            book.remember_genre()
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        moves_books = bool({'genre', 'user'} & set(fields))
+        with transaction.atomic(using=self.db):
+            before = Counter()
+            if moves_books:
+                before.update(
+                    self.model._base_manager.using(self.db)
+                    .filter(pk__in=[book.pk for book in objs])
+                    .values_list('user_id', 'genre')
+                )
+            # bulk_update() runs through update(), which must not count again
+            with bulk_operation():
+                updated = super().bulk_update(objs, fields, *args, **kwargs)
+            after = Counter((book.user_id, book.genre) for book in objs)
+            users = {user_id for user_id, _ in after | before}
+            if moves_books:
+                after.subtract(before)
+                GenreCount.objects.adjust(after)
+            LibraryVersion.objects.bump(users)
+        for book in objs:
+            book.remember_genre()
+        return updated
+
+    def delete(self):
+        if self.query.is_sliced:
+            return super().delete()
+        with transaction.atomic(using=self.db):
+            before = Counter(dict(
+                ((row['user_id'], row['genre']), -row['count']) for row in
+                self.order_by().values('user_id', 'genre').annotate(count=Count('id'))
+            ))
+            LibraryVersion.objects.bump({user_id for user_id, _ in before})
+            tombstones = [
+                BookTombstone(user_id=user_id, book_id=book_id)
+                for book_id, user_id in self.order_by().values_list('id', 'user_id')
+            ]
+            with bulk_operation():
+                deleted = super().delete()
+            GenreCount.objects.adjust(before)
+            BookTombstone.objects.bulk_create(tombstones)
+        return deleted
+
+    def update(self, **kwargs):
+        if in_bulk_operation.get():
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            LibraryVersion.objects.bump(self.order_by().values('user_id'))
+            if not {'genre', 'user', 'user_id'} & set(kwargs):
+                return super().update(**kwargs)
+            before = Counter(dict(
+                ((row['user_id'], row['genre']), row['count']) for row in
+                self.order_by().values('user_id', 'genre').annotate(count=Count('id'))
+            ))
+            updated = super().update(**kwargs)
+            new_user = kwargs.get('user_id', kwargs.get('user'))
+            new_genre = kwargs.get('genre')
+            if isinstance(new_user, Combinable) or isinstance(new_genre, Combinable):
+                # The new values are only known to the database
+                GenreCount.objects.rebuild(user_ids={user_id for user_id, _ in before})
+            else:
+                new_user = getattr(new_user, 'pk', new_user)
+                deltas = Counter()
+                for (user_id, genre), count in before.items():
+                    deltas[(user_id, genre)] -= count
+                    deltas[(
+                        user_id if new_user is None else new_user,
+                        genre if new_genre is None else new_genre,
+                    )] += count
+                GenreCount.objects.adjust(deltas)
+                if new_user is not None:
+                    LibraryVersion.objects.bump([new_user])
+        return updated
+
+    def with_percentage_complete(self):
+        """
+        Annotate each book with ``percentage_complete`` computed in SQL, so
+        it can be filtered and ordered on
+        """
+        if 'percentage_complete' in self.query.annotations:
+            return self
+        return self.annotate(percentage_complete=percentage_complete_expression())
+
+
+class ReadingProgressQuerySet(models.QuerySet):
+    """
+    Keeps LibraryVersion and Book.updated_at in step with bulk operations
+    on reading progress
+    """
+
+    def book_users(self, book_ids):
+        return Book._base_manager.using(self.db).filter(pk__in=book_ids).values('user_id')
+
+    def touch_books(self, book_ids):
+        """Mark the books as changed, so delta sync picks up their progress"""
+        Book._base_manager.using(self.db).filter(pk__in=book_ids).update(updated_at=timezone.now())
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            book_ids = {progress.book_id for progress in objs}
+            LibraryVersion.objects.bump(self.book_users(book_ids))
+            self.touch_books(book_ids)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            with bulk_operation():
+                updated = super().bulk_update(objs, fields, *args, **kwargs)
+            book_ids = {progress.book_id for progress in objs}
+            LibraryVersion.objects.bump(self.book_users(book_ids))
+            self.touch_books(book_ids)
+        return updated
+
+    def delete(self):
+        if self.query.is_sliced:
+            return super().delete()
+        with transaction.atomic(using=self.db):
+            LibraryVersion.objects.bump(self.order_by().values('book__user_id'))
+            self.touch_books(self.order_by().values('book_id'))
+            with bulk_operation():
+                return super().delete()
+
+    def update(self, **kwargs):
+        if in_bulk_operation.get():
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            LibraryVersion.objects.bump(self.order_by().values('book__user_id'))
+            self.touch_books(self.order_by().values('book_id'))
+            return super().update(**kwargs)
+
+
 class Book(models.Model):
     """
     Model representing a book in a user's library
@@ -15,17 +185,184 @@ class Book(models.Model):
     is_currently_reading = models.BooleanField(_('Currently Reading'), default=False)
     created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Updated At'), auto_now=True)
+    # Set by database triggers on every insert and update (see migration
+    # 0010), in commit order, so delta sync never misses a late commit
+    change_seq = models.BigIntegerField(_('Change Sequence'), null=True, editable=False)
     
     # User relationship - each book belongs to a user
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='books')
     
+    objects = BookQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('Book')
         verbose_name_plural = _('Books')
         ordering = ['-created_at']
+        # Every list query is scoped to one user and ordered by creation date,
+        # optionally narrowed by genre or reading status. The remaining
+        # ordering fields get (user, field, id) indexes for keyset pagination.
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='book_user_created_idx'),
+            models.Index(fields=['user', 'genre', 'created_at'], name='book_user_genre_idx'),
+            models.Index(fields=['user', 'is_currently_reading', 'created_at'], name='book_user_reading_idx'),
+            models.Index(fields=['user', 'title', 'id'], name='book_user_title_idx'),
+            models.Index(fields=['user', 'author', 'id'], name='book_user_author_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='book_user_updated_idx'),
+            models.Index(fields=['user', 'change_seq'], name='book_user_change_idx'),
+        ]
         
     def __str__(self):
         return f"{self.title} by {self.author}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_genre()
+        return instance
+    
+    def remember_genre(self):
+        """
+        Record the (user, genre) pair as stored, so a later save can move the
+        book between GenreCount rows. Deferred fields are left unknown.
+        """
+        if 'user_id' in self.__dict__ and 'genre' in self.__dict__:
+            self._stored_genre = (self.user_id, self.genre)
+        else:
+            self._stored_genre = None
+
+class GenreCountManager(models.Manager):
+    """
+    Applies changes to the per-user genre index. Callers pass deltas keyed by
+    (user_id, genre); rows whose count drops to zero are removed.
+    """
+
+    def adjust(self, deltas):
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        with transaction.atomic(using=self.db):
+            for (user_id, genre), delta in deltas.items():
+                rows = self.filter(user_id=user_id, genre=genre)
+                if rows.update(book_count=F('book_count') + delta) or delta < 0:
+                    continue
+                try:
+                    with transaction.atomic(using=self.db):
+                        self.create(user_id=user_id, genre=genre, book_count=delta)
+                except IntegrityError:
+                    # Created by a concurrent writer since the update above
+                    rows.update(book_count=F('book_count') + delta)
+            emptied = {user_id for (user_id, _), delta in deltas.items() if delta < 0}
+            if emptied:
+                self.filter(user_id__in=emptied, book_count__lte=0).delete()
+
+    def live_counts(self, user_ids=None):
+        """Return {(user_id, genre): count} computed from Book itself"""
+        books = Book._base_manager.using(self.db)
+        if user_ids is not None:
+            books = books.filter(user_id__in=user_ids)
+        rows = books.order_by().values('user_id', 'genre').annotate(count=Count('id'))
+        return {(row['user_id'], row['genre']): row['count'] for row in rows}
+
+    def stored_counts(self, user_ids=None):
+        """Return {(user_id, genre): count} as currently stored"""
+        rows = self.all()
+        if user_ids is not None:
+            rows = rows.filter(user_id__in=user_ids)
+        return {
+            (user_id, genre): count
+            for user_id, genre, count in rows.values_list('user_id', 'genre', 'book_count')
+        }
+
+    def rebuild(self, user_ids=None):
+        """Replace the stored counts with ones computed from Book"""
+        with transaction.atomic(using=self.db):
+            rows = self.all()
+            if user_ids is not None:
+                rows = rows.filter(user_id__in=user_ids)
+            rows.delete()
+            counts = self.live_counts(user_ids)
+            self.bulk_create(
+                self.model(user_id=user_id, genre=genre, book_count=count)
+                for (user_id, genre), count in counts.items()
+            )
+        return len(counts)
+
+
+class GenreCount(models.Model):
+    """
+    Materialized number of books per genre in each user's library, behind
+    the genres endpoint. Maintained by books.signals and BookQuerySet.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='genre_counts')
+    genre = models.CharField(_('Genre'), max_length=50)
+    book_count = models.PositiveIntegerField(_('Book Count'), default=0)
+    
+    objects = GenreCountManager()
+    
+    class Meta:
+        verbose_name = _('Genre Count')
+        verbose_name_plural = _('Genre Counts')
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'genre'], name='genre_count_user_genre_uniq'),
+        ]
+        
+    def __str__(self):
+        return f"{self.genre} ({self.book_count})"
+
+class LibraryVersionManager(models.Manager):
+    def bump(self, user_ids):
+        """
+        Increment the library version of the given users, passed as ids or
+        as a queryset of user ids. Users without a version row are skipped;
+        rows are created with the user, or on first read for older users.
+        """
+        return self.filter(user_id__in=user_ids).update(version=F('version') + 1)
+
+    def current(self, user):
+        """Return the library version of a user, creating it if needed"""
+        versions = list(self.filter(user=user).values_list('version', flat=True)[:1])
+        if versions:
+            return versions[0]
+        return self.get_or_create(user=user)[0].version
+
+
+class LibraryVersion(models.Model):
+    """
+    Per-user counter incremented by every write to the user's books or
+    reading progress, used to answer conditional GETs without querying
+    the library itself
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='library_version')
+    version = models.PositiveBigIntegerField(_('Version'), default=1)
+    
+    objects = LibraryVersionManager()
+    
+    class Meta:
+        verbose_name = _('Library Version')
+        verbose_name_plural = _('Library Versions')
+        
+    def __str__(self):
+        return f"Library of {self.user_id} at version {self.version}"
+
+class BookTombstone(models.Model):
+    """
+    Record of a deleted book, served by the delta sync endpoint so offline
+    clients can drop it. User is a plain column rather than a foreign key,
+    so tombstones outlive the deletion of their user's rows.
+    """
+    user_id = models.IntegerField(_('User ID'))
+    book_id = models.BigIntegerField(_('Book ID'))
+    deleted_at = models.DateTimeField(_('Deleted At'), auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = _('Book Tombstone')
+        verbose_name_plural = _('Book Tombstones')
+        indexes = [
+            models.Index(fields=['user_id', 'id'], name='tombstone_user_id_idx'),
+        ]
+        
+    def __str__(self):
+        return f"Book {self.book_id} deleted at {self.deleted_at}"
 
 class ReadingProgress(models.Model):
     """
@@ -38,6 +375,8 @@ class ReadingProgress(models.Model):
     notes = models.TextField(_('Notes'), blank=True, null=True)
     updated_at = models.DateTimeField(_('Updated At'), auto_now=True)
     
+    objects = ReadingProgressQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('Reading Progress')
         verbose_name_plural = _('Reading Progress')
@@ -50,4 +389,121 @@ class ReadingProgress(models.Model):
         """Calculate percentage of book completed"""
         if not self.book.pages or self.book.pages == 0:
             return 0
-        return min(100, int((self.current_page / self.book.pages) * 100))
\ No newline at end of file
+        return min(100, int((self.current_page / self.book.pages) * 100))
+
+class ReadingEvent(models.Model):
+    """
+    Append-only log of reading progress changes, the source of the daily
+    and weekly rollups. Book is a plain column so history outlives the
+    book. previous_page is left empty when the writer did not know it.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reading_events')
+    book_id = models.BigIntegerField(_('Book ID'))
+    previous_page = models.PositiveIntegerField(_('Previous Page'), blank=True, null=True)
+    page = models.PositiveIntegerField(_('Page'))
+    occurred_at = models.DateTimeField(_('Occurred At'))
+    recorded_at = models.DateTimeField(_('Recorded At'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('Reading Event')
+        verbose_name_plural = _('Reading Events')
+        indexes = [
+            models.Index(fields=['book_id', 'id'], name='reading_event_book_idx'),
+        ]
+        
+    def __str__(self):
+        return f"Book {self.book_id} to page {self.page} at {self.occurred_at}"
+
+class DailyReadingRollup(models.Model):
+    """
+    Pages read per user, book and day, built from ReadingEvent
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_reading')
+    book_id = models.BigIntegerField(_('Book ID'))
+    day = models.DateField(_('Day'))
+    pages_read = models.PositiveIntegerField(_('Pages Read'), default=0)
+    events = models.PositiveIntegerField(_('Events'), default=0)
+    
+    class Meta:
+        verbose_name = _('Daily Reading Rollup')
+        verbose_name_plural = _('Daily Reading Rollups')
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'book_id', 'day'], name='daily_rollup_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'day'], name='daily_rollup_user_day_idx'),
+        ]
+
+class WeeklyReadingRollup(models.Model):
+    """
+    Pages read per user, book and ISO week (starting Monday), built from
+    ReadingEvent
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='weekly_reading')
+    book_id = models.BigIntegerField(_('Book ID'))
+    week = models.DateField(_('Week'))
+    pages_read = models.PositiveIntegerField(_('Pages Read'), default=0)
+    events = models.PositiveIntegerField(_('Events'), default=0)
+    
+    class Meta:
+        verbose_name = _('Weekly Reading Rollup')
+        verbose_name_plural = _('Weekly Reading Rollups')
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'book_id', 'week'], name='weekly_rollup_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'week'], name='weekly_rollup_user_week_idx'),
+        ]
+
+class RollupCheckpoint(models.Model):
+    """
+    Id of the last ReadingEvent folded into the rollups, so the rollup job
+    can stop and resume at any point. ``gaps`` holds the ``[first, last,
+    seen_at]`` ranges of lower ids that were not committed yet when later
+    events were rolled up.
+    """
+    name = models.CharField(_('Name'), max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(_('Last Event ID'), default=0)
+    gaps = models.JSONField(_('Gaps'), default=list)
+    updated_at = models.DateTimeField(_('Updated At'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Rollup Checkpoint')
+        verbose_name_plural = _('Rollup Checkpoints')
+        
+    def __str__(self):
+        return f"{self.name} at event {self.last_event_id}"
+
+class ShardAssignment(models.Model):
+    """
+    Database alias holding a user's library when books are sharded, kept on
+    the default database. ``moving`` is set while move_library copies the
+    library, and ``moved_at`` expires sync cursors issued before a move.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='shard_assignment')
+    shard = models.CharField(_('Shard'), max_length=50)
+    moving = models.BooleanField(_('Moving'), default=False)
+    moved_at = models.DateTimeField(_('Moved At'), blank=True, null=True)
+    
+    class Meta:
+        verbose_name = _('Shard Assignment')
+        verbose_name_plural = _('Shard Assignments')
+        
+    def __str__(self):
+        return f"Library of {self.user_id} on {self.shard}"
+
+def percentage_complete_expression(current_page='reading_progress__current_page', pages='pages'):
+    """
+    SQL equivalent of ReadingProgress.percentage_complete.
+
+    The division is done in floating point and floored, exactly like the
+    Python property, so both always agree. Books without reading progress
+    count as 0% complete.
+    """
+    current_page = Coalesce(F(current_page), Value(0))
+    ratio = Cast(current_page, FloatField()) / F(pages) * Value(100.0)
+    return Case(
+        When(Q(**{f'{pages}__isnull': True}) | Q(**{pages: 0}), then=Value(0)),
+        default=Least(Value(100), Cast(Floor(ratio), IntegerField())),
+        output_field=IntegerField(),
+    )
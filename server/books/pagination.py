@@ -0,0 +1,228 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class BookKeysetPagination(BasePagination):
+    """
+    Opt-in keyset pagination for the books list.
+
+    Each page seeks past the last row of the previous one using the ordering
+    field and the book id, so deep pages cost the same as the first one and
+    no COUNT(*) is run. Clients opt in with ``?pagination=cursor`` and follow
+    the ``next`` link, which carries an opaque ``cursor`` parameter.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    page_size_query_param = 'page_size'
+    default_ordering = '-created_at'
+    tiebreaker = 'id'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = api_settings.PAGE_SIZE
+        self.max_page_size = getattr(settings, 'BOOKS_MAX_PAGE_SIZE', 100)
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        return params.get(cls.mode_query_param) == 'cursor' or cls.cursor_query_param in params
+
+    def get_page_size(self, request):
+        """Return the requested page size, capped at ``BOOKS_MAX_PAGE_SIZE``"""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset, view):
+        """
+        Return the ordering picked by the ordering filter, as long as it is
+        a single field the keyset can seek on.
+        """
+        allowed = set(getattr(view, 'ordering_fields', None) or []) | set(queryset.query.annotations)
+        ordering = queryset.query.order_by
+        if ordering and isinstance(ordering[0], str) and ordering[0].lstrip('-') in allowed:
+            return ordering[0]
+        return self.default_ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset, view)
+        field = self.ordering.lstrip('-')
+        descending = self.ordering.startswith('-')
+        prefix = '-' if descending else ''
+
+        queryset = queryset.order_by(self.ordering, prefix + self.tiebreaker)
+        position = self.decode_cursor(request)
+        if position is not None:
+            value = self.to_python(queryset, field, position['v'])
+            queryset = queryset.filter(*seek_filter(field, descending, value, position['i'], self.tiebreaker))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        field = self.ordering.lstrip('-')
+        cursor = self.encode_cursor({
+            'o': self.ordering,
+            'v': self.to_json(read_field(last, field)),
+            'i': read_field(last, self.tiebreaker),
+        })
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.cursor_query_param, cursor)
+        return remove_query_param(url, 'page')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if position['o'] != self.ordering:
+                raise ValueError('Cursor was issued for a different ordering')
+            int(position['i'])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    @staticmethod
+    def encode_cursor(position):
+        raw = json.dumps(position, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    @staticmethod
+    def to_json(value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        return value
+
+    def to_python(self, queryset, field, value):
+        annotation = queryset.query.annotations.get(field)
+        model_field = annotation.output_field if annotation is not None \
+            else queryset.model._meta.get_field(field)
+        try:
+            return model_field.to_python(value)
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists over tables with millions of rows.
+
+    No query counts more than ``exact_count_limit`` rows. The unfiltered
+    table is counted from the database statistics when it has any, and
+    filtered lists are counted exactly up to the limit. When the limit is
+    reached, the limit itself is reported and ``count_is_lower_bound`` is
+    set. ``count_is_estimate`` marks counts taken from statistics.
+    """
+    exact_count_limit = 10000
+    count_is_estimate = False
+    count_is_lower_bound = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.exact_count_limit:
+                self.count_is_estimate = True
+                return estimate
+        count = queryset.order_by()[:self.exact_count_limit + 1].count()
+        if count > self.exact_count_limit:
+            self.count_is_lower_bound = True
+            return self.exact_count_limit
+        return count
+
+
+def estimate_row_count(model, using='default'):
+    """
+    Return the number of rows in the table of ``model`` according to the
+    database statistics, or None when there are none. SQLite only keeps
+    statistics once ANALYZE has run.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'sqlite':
+        # Each sqlite_stat1 row starts with the number of rows in the index
+        sql, params = 'SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s', [table]
+    elif connection.vendor == 'postgresql':
+        sql, params = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [connection.ops.quote_name(table)]
+    else:
+        return None
+    try:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    # PostgreSQL reports -1 for tables that were never analyzed
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def seek_filter(field, descending, value, pk, tiebreaker='id'):
+    """
+    Return the filter() arguments selecting the rows past ``(value, pk)`` in
+    an ordering on ``field`` then ``tiebreaker``, both in the same direction
+    """
+    past, past_or_equal = ('lt', 'lte') if descending else ('gt', 'gte')
+    if field == tiebreaker:
+        return [Q(**{f'{tiebreaker}__{past}': pk})]
+    # The first condition is a plain range an index can seek on; the second
+    # breaks ties between rows sharing the same value.
+    return [
+        Q(**{f'{field}__{past_or_equal}': value}),
+        Q(**{f'{field}__{past}': value}) | Q(**{f'{tiebreaker}__{past}': pk}),
+    ]
+
+
+def read_field(item, name):
+    """Read a value from a model instance or a values() row"""
+    if isinstance(item, dict):
+        return item[name]
+    return getattr(item, name)
@@ -6,5 +6,6 @@ class IsBookOwner(permissions.BasePermission):
     """
     
     def has_object_permission(self, request, view, obj):
-        # Permissions are only allowed to the owner of the book
-        return obj.user == request.user
\ No newline at end of file
+        # Permissions are only allowed to the owner of the book. Compare ids
+        # so the owner row is not loaded again.
+        return obj.user_id == request.user.id
\ No newline at end of file
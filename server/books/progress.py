@@ -0,0 +1,111 @@
+from django.db import router, transaction
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+
+from .models import Book, LibraryVersion, ReadingProgress, bulk_operation
+from .reading_log import record_event, record_events
+
+
+def record_progress_write(user, book_ids):
+    """Bump the library version and mark the books changed for delta sync"""
+    LibraryVersion.objects.bump([user.pk])
+    ReadingProgress.objects.touch_books(book_ids)
+
+
+def advance_progress(user, book_id, current_page):
+    """
+    Move the user's progress on a book forward to ``current_page``.
+
+    The write is a single conditional UPDATE that only matches when the new
+    page is past the stored one, so repeated or out-of-order page turns are
+    no-ops. Returns True when the progress moved, False when it was already
+    there or further, and None when the user has no such book.
+    """
+    with transaction.atomic(using=router.db_for_write(Book)):
+        with bulk_operation():
+            advanced = ReadingProgress.objects.filter(
+                book_id=book_id, book__user=user, current_page__lt=current_page,
+            ).update(current_page=current_page, updated_at=timezone.now())
+        if advanced:
+            record_progress_write(user, [book_id])
+            # The page advanced from is unknown; the rollups take it from
+            # the book's previous event
+            record_event(user.pk, book_id, None, current_page)
+            return True
+
+        book = Book.objects.filter(id=book_id, user=user).values('id', 'reading_progress__id').first()
+        if book is None:
+            return None
+        if book['reading_progress__id'] is None:
+            ReadingProgress.objects.create(book_id=book_id, current_page=current_page)
+            record_event(user.pk, book_id, None, current_page)
+            return True
+        return False
+
+
+def ingest_progress_events(user, events):
+    """
+    Apply a batch of ``{'book_id', 'current_page', 'timestamp'}`` events.
+
+    Events are coalesced to the latest one per book, and each book's
+    progress is only overwritten when that event is newer than the stored
+    progress, so replayed or late events cannot roll it back. All books are
+    written with one UPDATE. Returns the outcome for each book.
+    """
+    now = timezone.now()
+    latest = {}
+    for event in events:
+        # Events from the future are clamped so they cannot block later ones
+        timestamp = min(event.get('timestamp') or now, now)
+        current = latest.get(event['book_id'])
+        if current is None or timestamp >= current[1]:
+            latest[event['book_id']] = (event['current_page'], timestamp)
+
+    results = dict.fromkeys(latest, 'not_found')
+    with transaction.atomic(using=router.db_for_write(Book)):
+        stored = Book.objects.filter(user=user, id__in=list(latest)).values_list(
+            'id', 'reading_progress__id', 'reading_progress__updated_at', 'reading_progress__current_page',
+        )
+        newer = {}
+        missing = []
+        events = []
+        for book_id, progress_id, updated_at, previous_page in stored:
+            current_page, timestamp = latest[book_id]
+            if progress_id is None:
+                missing.append(ReadingProgress(book_id=book_id, current_page=current_page))
+                results[book_id] = 'updated'
+            elif updated_at < timestamp:
+                newer[book_id] = (current_page, timestamp)
+                results[book_id] = 'updated'
+            else:
+                results[book_id] = 'stale'
+                continue
+            if previous_page != current_page:
+                events.append((book_id, previous_page, current_page, timestamp))
+
+        if newer:
+            # The timestamp conditions are repeated in the UPDATE so that a
+            # concurrent newer write is never overwritten
+            condition = Q()
+            for book_id, (_, timestamp) in newer.items():
+                condition |= Q(book_id=book_id, updated_at__lt=timestamp)
+            with bulk_operation():
+                ReadingProgress.objects.filter(condition).update(
+                    current_page=Case(*(
+                        When(book_id=book_id, then=Value(current_page))
+                        for book_id, (current_page, _) in newer.items()
+                    )),
+                    updated_at=Case(*(
+                        When(book_id=book_id, then=Value(timestamp))
+                        for book_id, (_, timestamp) in newer.items()
+                    )),
+                )
+            record_progress_write(user, list(newer))
+        if missing:
+            ReadingProgress.objects.bulk_create(missing)
+        record_events(user.pk, events)
+
+    return {
+        'updated': sum(1 for result in results.values() if result == 'updated'),
+        'results': [{'book_id': book_id, 'status': result} for book_id, result in results.items()],
+    }
@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from health_check.metrics import timed
+
+from .models import percentage_complete_expression
+
+# Book columns in BookSerializer field order
+BOOK_FIELDS = (
+    'id', 'title', 'author', 'genre', 'pages', 'description',
+    'publication_date', 'is_currently_reading', 'created_at', 'updated_at',
+)
+
+# Reading progress columns joined onto each row, keyed by their output name
+PROGRESS_FIELDS = {
+    'progress_id': 'reading_progress__id',
+    'progress_current_page': 'reading_progress__current_page',
+    'progress_start_date': 'reading_progress__start_date',
+    'progress_target_end_date': 'reading_progress__target_end_date',
+    'progress_notes': 'reading_progress__notes',
+}
+
+
+def project_books(queryset):
+    """
+    Turn a Book queryset into a values() queryset holding everything a
+    BookSerializer response needs, with reading progress joined and
+    percentage_complete computed in SQL. Existing annotations are kept so
+    ordering and pagination can still read them.
+    """
+    expressions = {name: F(path) for name, path in PROGRESS_FIELDS.items()}
+    if 'percentage_complete' in queryset.query.annotations:
+        expressions['progress_percentage_complete'] = F('percentage_complete')
+    else:
+        expressions['progress_percentage_complete'] = percentage_complete_expression()
+    return queryset.values(*BOOK_FIELDS, *queryset.query.annotations, **expressions)
+
+
+def make_date_formatter():
+    """Return a function formatting dates exactly like serializers.DateField"""
+    field = serializers.DateField()
+    if (api_settings.DATE_FORMAT or '').lower() != ISO_8601:
+        return lambda value: None if value is None else field.to_representation(value)
+    return lambda value: None if value is None else value.isoformat()
+
+
+def make_datetime_formatter():
+    """
+    Return a function formatting datetimes exactly like
+    serializers.DateTimeField. The current time zone is looked up once
+    instead of once per value, which dominates the cost of the field.
+    """
+    field = serializers.DateTimeField()
+    if (api_settings.DATETIME_FORMAT or '').lower() != ISO_8601 or not settings.USE_TZ:
+        return lambda value: None if value is None else field.to_representation(value)
+    current_timezone = timezone.get_current_timezone()
+
+    def format_datetime(value):
+        if value is None:
+            return None
+        if timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(current_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return format_datetime
+
+
+def represent_books(rows):
+    """Build the BookSerializer representation of projected rows"""
+    with timed('serialize'):
+        return list(iter_represented_books(rows))
+
+
+def iter_represented_books(rows, extra_fields=()):
+    """
+    Yield the BookSerializer representation of each projected row, followed
+    by the ``extra_fields`` of the row, without holding them all in memory
+    """
+    format_date = make_date_formatter()
+    format_datetime = make_datetime_formatter()
+    for row in rows:
+        if row['progress_id'] is None:
+            reading_progress = None
+        else:
+            reading_progress = {
+                'current_page': row['progress_current_page'],
+                'start_date': format_date(row['progress_start_date']),
+                'target_end_date': format_date(row['progress_target_end_date']),
+                'notes': row['progress_notes'],
+                'percentage_complete': row['progress_percentage_complete'],
+            }
+        book = {
+            'id': row['id'],
+            'title': row['title'],
+            'author': row['author'],
+            'genre': row['genre'],
+            'pages': row['pages'],
+            'description': row['description'],
+            'publication_date': format_date(row['publication_date']),
+            'is_currently_reading': row['is_currently_reading'],
+            'created_at': format_datetime(row['created_at']),
+            'updated_at': format_datetime(row['updated_at']),
+            'reading_progress': reading_progress,
+        }
+        for field in extra_fields:
+            book[field] = row[field]
+        yield book
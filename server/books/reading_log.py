@@ -0,0 +1,211 @@
+import datetime
+from collections import defaultdict
+
+from django.db import router, transaction
+from django.db.models import Case, OuterRef, Q, Subquery, Sum, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import DailyReadingRollup, ReadingEvent, RollupCheckpoint, WeeklyReadingRollup
+
+CHECKPOINT_NAME = 'reading_rollups'
+
+# Event ids missing below the checkpoint are rolled up whenever they commit.
+# Gaps open for longer than this are forgotten: no transaction stays open
+# that long, so their events were rolled back or deleted.
+GAP_TIMEOUT = datetime.timedelta(hours=1)
+
+
+def record_events(user_id, events):
+    """
+    Append ``(book_id, previous_page, page, occurred_at)`` events to the
+    reading log of a user
+    """
+    ReadingEvent.objects.bulk_create(
+        ReadingEvent(user_id=user_id, book_id=book_id, previous_page=previous_page,
+                     page=page, occurred_at=occurred_at)
+        for book_id, previous_page, page, occurred_at in events
+    )
+
+
+def record_event(user_id, book_id, previous_page, page):
+    """Append a single progress change happening now"""
+    if previous_page != page:
+        record_events(user_id, [(book_id, previous_page, page, timezone.now())])
+
+
+def week_of(day):
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def roll_up_events(batch_size=5000, gap_timeout=GAP_TIMEOUT):
+    """
+    Fold reading events recorded since the checkpoint into the daily and
+    weekly rollups, one batch per transaction. The checkpoint moves in the
+    same transaction as the rollups, so the job can be stopped at any point
+    and resumed without counting an event twice. Ids skipped by a batch are
+    kept as gaps on the checkpoint, and events committed into them later are
+    rolled up by the next run. Returns the number of events processed.
+    """
+    processed = 0
+    while True:
+        with transaction.atomic(using=router.db_for_write(ReadingEvent)):
+            checkpoint, _ = RollupCheckpoint.objects.select_for_update().get_or_create(name=CHECKPOINT_NAME)
+            now = timezone.now()
+            gaps = [gap for gap in checkpoint.gaps if parse_datetime(gap[2]) > now - gap_timeout]
+            late_events = []
+            if gaps:
+                in_gaps = Q()
+                for first, last, _ in gaps:
+                    in_gaps |= Q(id__range=(first, last))
+                late_events = list(with_predecessor_pages(ReadingEvent.objects.filter(in_gaps)))
+            events = list(with_predecessor_pages(
+                ReadingEvent.objects.filter(id__gt=checkpoint.last_event_id).order_by('id')[:batch_size]
+            ))
+            if not events and not late_events:
+                if gaps != checkpoint.gaps:
+                    checkpoint.gaps = gaps
+                    checkpoint.save()
+                return processed
+
+            daily, weekly = aggregate_events(sorted(late_events + events, key=lambda event: event.id))
+            apply_rollup(DailyReadingRollup, 'day', daily)
+            apply_rollup(WeeklyReadingRollup, 'week', weekly)
+            gaps = fill_gaps(gaps, {event.id for event in late_events})
+            if events:
+                gaps += find_gaps(checkpoint.last_event_id, [event.id for event in events], now)
+                checkpoint.last_event_id = events[-1].id
+            checkpoint.gaps = gaps
+            checkpoint.save()
+        processed += len(late_events) + len(events)
+
+
+def with_predecessor_pages(events):
+    """
+    Annotate events that do not know their previous page with the page of
+    the book's previous event, in the same query
+    """
+    previous = ReadingEvent.objects.filter(book_id=OuterRef('book_id'), id__lt=OuterRef('id')).order_by('-id')
+    return events.annotate(predecessor_page=Case(
+        When(previous_page__isnull=True, then=Subquery(previous.values('page')[:1])),
+    ))
+
+
+def find_gaps(after_id, ids, seen_at):
+    """Return the ``[first, last, seen_at]`` ranges missing from sorted ``ids`` after ``after_id``"""
+    gaps = []
+    for event_id in ids:
+        if event_id > after_id + 1:
+            gaps.append([after_id + 1, event_id - 1, seen_at.isoformat()])
+        after_id = event_id
+    return gaps
+
+
+def fill_gaps(gaps, ids):
+    """Return ``gaps`` without the given ids, splitting the ranges they fall in"""
+    remaining = []
+    for first, last, seen_at in gaps:
+        for event_id in sorted(event_id for event_id in ids if first <= event_id <= last):
+            if event_id > first:
+                remaining.append([first, event_id - 1, seen_at])
+            first = event_id + 1
+        if first <= last:
+            remaining.append([first, last, seen_at])
+    return remaining
+
+
+def aggregate_events(events):
+    """
+    Return pages read and event counts keyed by (user_id, book_id, day) and
+    (user_id, book_id, week). Pages read by an event are the pages gained
+    since the previous event of the same book; an event with no known
+    predecessor only sets the baseline. Events come from
+    with_predecessor_pages(), so no predecessor is looked up one by one.
+    """
+    last_pages = {}
+    daily = defaultdict(lambda: [0, 0])
+    weekly = defaultdict(lambda: [0, 0])
+    for event in events:
+        previous_page = event.previous_page
+        if previous_page is None:
+            previous_page = last_pages.get(event.book_id, event.predecessor_page)
+        pages_read = max(0, event.page - previous_page) if previous_page is not None else 0
+        last_pages[event.book_id] = event.page
+
+        day = timezone.localtime(event.occurred_at).date()
+        for totals, key in ((daily, day), (weekly, week_of(day))):
+            totals[(event.user_id, event.book_id, key)][0] += pages_read
+            totals[(event.user_id, event.book_id, key)][1] += 1
+    return daily, weekly
+
+
+def apply_rollup(model, period, totals):
+    """Add ``totals`` onto the rollup rows, creating the missing ones"""
+    if not totals:
+        return
+    existing = {
+        (row.user_id, row.book_id, getattr(row, period)): row
+        for row in model.objects.filter(
+            user_id__in={user_id for user_id, _, _ in totals},
+            book_id__in={book_id for _, book_id, _ in totals},
+            **{f'{period}__in': {key for _, _, key in totals}},
+        )
+    }
+    changed = []
+    created = []
+    for (user_id, book_id, key), (pages_read, events) in totals.items():
+        row = existing.get((user_id, book_id, key))
+        if row is None:
+            created.append(model(user_id=user_id, book_id=book_id, pages_read=pages_read,
+                                 events=events, **{period: key}))
+        else:
+            row.pages_read += pages_read
+            row.events += events
+            changed.append(row)
+    model.objects.bulk_update(changed, ['pages_read', 'events'])
+    model.objects.bulk_create(created)
+
+
+def reading_stats(user, days=30, weeks=12):
+    """
+    Pages read per day and per week, totals and reading streaks for a user,
+    read from the rollup tables only
+    """
+    today = timezone.localdate()
+    daily = (
+        DailyReadingRollup.objects.filter(user=user, day__gt=today - datetime.timedelta(days=days))
+        .values('day').annotate(pages_read=Sum('pages_read')).order_by('day')
+    )
+    weekly = (
+        WeeklyReadingRollup.objects.filter(user=user, week__gt=week_of(today) - datetime.timedelta(weeks=weeks))
+        .values('week').annotate(pages_read=Sum('pages_read')).order_by('week')
+    )
+    active_days = list(
+        DailyReadingRollup.objects.filter(user=user, pages_read__gt=0)
+        .order_by('day').values_list('day', flat=True).distinct()
+    )
+    total = WeeklyReadingRollup.objects.filter(user=user).aggregate(total=Sum('pages_read'))['total']
+    current, longest = streaks(active_days, today)
+    return {
+        'daily': list(daily),
+        'weekly': list(weekly),
+        'total_pages_read': total or 0,
+        'current_streak': current,
+        'longest_streak': longest,
+    }
+
+
+def streaks(active_days, today):
+    """
+    Return the current and longest runs of consecutive reading days. The
+    current streak still counts until the end of the day after the last
+    reading day.
+    """
+    longest = run = 0
+    previous = None
+    for day in active_days:
+        run = run + 1 if previous is not None and day - previous == datetime.timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    current = run if previous is not None and today - previous <= datetime.timedelta(days=1) else 0
+    return current, longest
@@ -0,0 +1,40 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renderer for newline-delimited JSON. Exports stream their own body, so
+    this only renders error responses, as a single line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, ensure_ascii=False, separators=(',', ':')) + '\n').encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Renderer for CSV. Exports stream their own body, so this only renders
+    error responses, as one field,message row per error.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        output = io.StringIO()
+        writer = csv.writer(output)
+        items = data.items() if isinstance(data, dict) else [('', data)]
+        for field, message in items:
+            writer.writerow([field, message])
+        return output.getvalue().encode(self.charset)
@@ -0,0 +1,58 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+from health_check.metrics import registry
+
+from .conditional import library_version
+
+
+def response_cache():
+    """The cache holding book responses, or None when response caching is off"""
+    alias = getattr(settings, 'BOOKS_RESPONSE_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def response_key(request, endpoint, version):
+    """
+    Cache key of a read of the requesting user's library: the user, their
+    library version, the endpoint and a digest of the absolute URL with the
+    query parameters in a fixed order. Writes bump the version, so old
+    entries are never read again and age out of the cache by themselves.
+    """
+    params = sorted(request.query_params.lists())
+    # Pagination links are absolute, so the scheme and host are part of it
+    location = json.dumps([request.build_absolute_uri(request.path), params])
+    digest = hashlib.sha256(location.encode('utf-8')).hexdigest()[:32]
+    return f'books:response:{request.user.pk}:{version}:{endpoint}:{digest}'
+
+
+def cached_library_response(view_method):
+    """
+    Decorate a read-only view method so that its response data is cached
+    per user and library version, see response_key(). Only 200 responses
+    are stored. The data is cached before rendering, so every renderer is
+    served from the same entry.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        cache = response_cache()
+        if cache is None:
+            return view_method(self, request, *args, **kwargs)
+        endpoint = request.resolver_match.view_name
+        key = response_key(request, endpoint, library_version(request))
+        data = cache.get(key)
+        registry.count_cache_lookup(endpoint, hit=data is not None)
+        if data is not None:
+            return Response(data)
+
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.BOOKS_RESPONSE_CACHE_TIMEOUT)
+        return response
+    return wrapper
@@ -0,0 +1,170 @@
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, FloatField, Func, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+# Matches the word characters that make up a search term
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    """Split a free-text query into lowercase search terms"""
+    return [token.lower() for token in TOKEN_RE.findall(query or '')]
+
+
+class BaseSearchBackend:
+    """
+    Base class for book search backends.
+
+    A backend narrows a Book queryset down to the rows matching a free-text
+    query and annotates each row with a ``search_rank``, where a higher rank
+    means a better match.
+    """
+    fields = ('title', 'author', 'genre', 'description')
+
+    def search(self, queryset, query, user_id=None):
+        """
+        Return ``queryset`` restricted to books matching ``query``. When the
+        queryset only covers one user's library, ``user_id`` lets the backend
+        scope the index lookup to it.
+        """
+        raise NotImplementedError('Search backends must implement search()')
+
+
+class IcontainsSearchBackend(BaseSearchBackend):
+    """
+    Portable fallback that scans the user's books with case-insensitive LIKE.
+    Every row matches with the same rank.
+    """
+
+    def search(self, queryset, query, user_id=None):
+        for term in tokenize(query):
+            condition = Q()
+            for field in self.fields:
+                condition |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(condition)
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class FTSRank(Func):
+    """
+    bm25 score of a book against an FTS5 match. Every match is scored once
+    into a materialized table, and each row looks its score up by id; a
+    plain correlated subquery would make bm25() recompute its corpus
+    statistics for every row. The id is compiled through the query, so the
+    outer table's alias is used.
+    """
+    output_field = FloatField()
+
+    def __init__(self, table, weights, match):
+        super().__init__(F('pk'))
+        self.table = table
+        self.weights = weights
+        self.match = match
+
+    def as_sql(self, compiler, connection, **extra_context):
+        pk_sql, pk_params = compiler.compile(self.source_expressions[0])
+        weights = ', '.join(str(weight) for weight in self.weights)
+        sql = (
+            f'(WITH ranked AS MATERIALIZED ('
+            f'SELECT rowid AS id, -bm25({self.table}, {weights}) AS score '
+            f'FROM {self.table} WHERE {self.table} MATCH %s'
+            f') SELECT ranked.score FROM ranked WHERE ranked.id = {pk_sql})'
+        )
+        return sql, (self.match, *pk_params)
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """
+    Search backed by the ``books_book_fts`` FTS5 table.
+
+    The table is an external-content index over ``books_book`` that is kept in
+    sync by triggers (see migration 0002), so saves, deletes and bulk
+    operations are all reflected without any application code. The owner's
+    id is indexed too, which keeps every lookup scoped to a single library.
+    """
+    table = 'books_book_fts'
+    # bm25 column weights, in table column order; user_id never adds to rank
+    weights = (10.0, 5.0, 2.0, 1.0, 0.0)
+
+    def build_match(self, terms, user_id=None):
+        columns = ' '.join(self.fields)
+        phrases = ' '.join('"%s"*' % term.replace('"', '""') for term in terms)
+        match = '{%s} : (%s)' % (columns, phrases)
+        if user_id is not None:
+            match = 'user_id : "%s" AND %s' % (user_id, match)
+        return match
+
+    def search(self, queryset, query, user_id=None):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+        match = self.build_match(terms, user_id)
+        matching_ids = RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s',
+            (match,),
+        )
+        rank = FTSRank(self.table, self.weights, match)
+        return queryset.filter(id__in=matching_ids).annotate(search_rank=rank)
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Search using PostgreSQL full-text search.
+
+    Terms are matched as prefixes so results update while the user types.
+    A GIN index over the same weighted tsvector can be added later without
+    changing this backend.
+    """
+    config = 'simple'
+
+    def search(self, queryset, query, user_id=None):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        terms = tokenize(query)
+        if not terms:
+            return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+        vector = (
+            SearchVector('title', weight='A', config=self.config) +
+            SearchVector('author', weight='B', config=self.config) +
+            SearchVector('genre', weight='C', config=self.config) +
+            SearchVector('description', weight='D', config=self.config)
+        )
+        search_query = SearchQuery(
+            ' & '.join(f'{term}:*' for term in terms),
+            search_type='raw',
+            config=self.config,
+        )
+        return queryset.annotate(
+            search_vector=vector,
+            search_rank=SearchRank(vector, search_query),
+        ).filter(search_vector=search_query)
+
+
+# Backends picked for each database vendor when BOOKS_SEARCH_BACKEND is unset
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend(using='default'):
+    """
+    Return the search backend configured by ``BOOKS_SEARCH_BACKEND``, or the
+    best backend for the vendor of the ``using`` database.
+    """
+    backend_path = getattr(settings, 'BOOKS_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    vendor = connections[using].vendor
+    return VENDOR_BACKENDS.get(vendor, IcontainsSearchBackend)()
+
+
+def search_books(queryset, query, user_id=None):
+    """Filter a Book queryset by a free-text query and annotate ``search_rank``"""
+    return get_search_backend(queryset.db).search(queryset, query, user_id=user_id)
@@ -1,5 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Book, ReadingProgress
+from .reading_log import record_event
 
 class ReadingProgressSerializer(serializers.ModelSerializer):
     """
@@ -10,6 +12,15 @@ class ReadingProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = ReadingProgress
         fields = ['current_page', 'start_date', 'target_end_date', 'notes', 'percentage_complete']
+    
+    def update(self, instance, validated_data):
+        previous_page = instance.current_page
+        # Only write the columns that changed
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        record_event(instance.book.user_id, instance.book_id, previous_page, instance.current_page)
+        return instance
         
 class BookSerializer(serializers.ModelSerializer):
     """
@@ -35,10 +46,12 @@ class BookSerializer(serializers.ModelSerializer):
         
         # Create reading progress if provided
         if reading_progress_data:
-            ReadingProgress.objects.create(book=book, **reading_progress_data)
+            progress = ReadingProgress.objects.create(book=book, **reading_progress_data)
         else:
             # Create default reading progress
-            ReadingProgress.objects.create(book=book)
+            progress = ReadingProgress.objects.create(book=book)
+        # The first event sets the baseline for pages read later
+        record_event(book.user_id, book.id, None, progress.current_page)
             
         return book
     
@@ -54,9 +67,11 @@ class BookSerializer(serializers.ModelSerializer):
         # Update reading progress if provided
         if reading_progress_data and hasattr(instance, 'reading_progress'):
             progress = instance.reading_progress
+            previous_page = progress.current_page
             for field, value in reading_progress_data.items():
                 setattr(progress, field, value)
             progress.save()
+            record_event(instance.user_id, instance.id, previous_page, progress.current_page)
         
         return instance
         
@@ -64,4 +79,95 @@ class GenreSerializer(serializers.Serializer):
     """
     Serializer for genre list
     """
-    genres = serializers.ListField(child=serializers.CharField())
\ No newline at end of file
+    genres = serializers.ListField(child=serializers.CharField())
+    counts = serializers.DictField(child=serializers.IntegerField())
+
+class BookPatchSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the book fields a batch update may change
+    """
+    class Meta:
+        model = Book
+        fields = ['title', 'author', 'genre', 'pages', 'description', 'publication_date', 'is_currently_reading']
+
+
+def validate_patch(patch):
+    """Validate a partial book update and return its internal values"""
+    serializer = BookPatchSerializer(data=patch, partial=True)
+    serializer.is_valid(raise_exception=True)
+    unknown = set(patch) - set(serializer.fields)
+    if unknown:
+        raise serializers.ValidationError({field: ['This field cannot be batch updated.'] for field in sorted(unknown)})
+    if not serializer.validated_data:
+        raise serializers.ValidationError('The patch changes no fields.')
+    return serializer.validated_data
+
+
+class BookBatchUpdateSerializer(serializers.Serializer):
+    """
+    Serializer for batch updates, given either as ids with one shared patch
+    or as a list of per-id patches
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False,
+                                max_length=settings.BOOKS_MAX_BATCH_SIZE)
+    patch = serializers.DictField(required=False)
+    updates = serializers.ListField(child=serializers.DictField(), required=False, allow_empty=False,
+                                    max_length=settings.BOOKS_MAX_BATCH_SIZE)
+
+    def validate(self, attrs):
+        if 'updates' in attrs:
+            if 'ids' in attrs or 'patch' in attrs:
+                raise serializers.ValidationError('Send either ids with a patch, or updates.')
+            updates = []
+            errors = {}
+            for index, update in enumerate(attrs['updates']):
+                update = dict(update)
+                book_id = update.pop('id', None)
+                try:
+                    if not isinstance(book_id, int) or isinstance(book_id, bool):
+                        raise serializers.ValidationError({'id': ['A valid integer is required.']})
+                    updates.append((book_id, validate_patch(update)))
+                except serializers.ValidationError as error:
+                    errors[index] = error.detail
+            if errors:
+                raise serializers.ValidationError({'updates': errors})
+        elif 'ids' in attrs and 'patch' in attrs:
+            try:
+                patch = validate_patch(attrs['patch'])
+            except serializers.ValidationError as error:
+                raise serializers.ValidationError({'patch': error.detail})
+            updates = [(book_id, patch) for book_id in attrs['ids']]
+        else:
+            raise serializers.ValidationError('Send either ids with a patch, or updates.')
+        return {'updates': updates}
+
+
+class BookBatchDeleteSerializer(serializers.Serializer):
+    """
+    Serializer for batch deletes
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False,
+                                max_length=settings.BOOKS_MAX_BATCH_SIZE)
+
+
+class ProgressAdvanceSerializer(serializers.Serializer):
+    """
+    Serializer for moving reading progress forward to a page
+    """
+    current_page = serializers.IntegerField(min_value=0)
+
+
+class ProgressEventSerializer(serializers.Serializer):
+    """
+    Serializer for one reading progress event sent by a reader device
+    """
+    book_id = serializers.IntegerField()
+    current_page = serializers.IntegerField(min_value=0)
+    timestamp = serializers.DateTimeField(required=False)
+
+
+class ProgressBatchSerializer(serializers.Serializer):
+    """
+    Serializer for a batch of reading progress events
+    """
+    events = ProgressEventSerializer(many=True, allow_empty=False, max_length=settings.BOOKS_MAX_BATCH_SIZE)
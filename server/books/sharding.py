@@ -0,0 +1,324 @@
+import hashlib
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+
+from .models import (
+    Book, BookTombstone, DailyReadingRollup, GenreCount, LibraryVersion, ReadingEvent,
+    ReadingProgress, ShardAssignment, WeeklyReadingRollup, bulk_operation,
+)
+from .reading_log import roll_up_events
+
+# Database alias of the library being served, or None for the default one
+current_shard = ContextVar('current_shard', default=None)
+
+# Each shard starts numbering books at its index times this, so book ids
+# rarely collide across shards and a library can keep its ids when it moves.
+# SQLite numbers new rows after the highest id present, so moves still check.
+SHARD_ID_SPACING = 1 << 40
+
+# Rows copied per query when a library moves
+COPY_BATCH_SIZE = 1000
+
+
+class LibraryMoving(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('This library is being moved, try again shortly')
+    default_code = 'library_moving'
+    # Sent as Retry-After by the DRF exception handler
+    wait = 5
+
+
+class ShardConflict(Exception):
+    """A library cannot move because the target shard already uses some of its book ids"""
+
+
+def shard_aliases():
+    return list(getattr(settings, 'BOOKS_SHARDS', None) or [DEFAULT_DB_ALIAS])
+
+
+def sharding_enabled():
+    return len(shard_aliases()) > 1
+
+
+def hashed_shard(user_id, shards):
+    """Stable shard of a user id, the same in every process and release"""
+    digest = hashlib.blake2b(str(user_id).encode(), digest_size=8).digest()
+    return shards[int.from_bytes(digest, 'big') % len(shards)]
+
+
+@contextmanager
+def use_shard(alias):
+    """Run the books queries in the block on the ``alias`` shard"""
+    token = current_shard.set(alias)
+    try:
+        yield
+    finally:
+        current_shard.reset(token)
+
+
+def find_assignment(user_id):
+    """Return the ShardAssignment of a user, or None, without creating it"""
+    return ShardAssignment.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id).first()
+
+
+def assign_shard(user_id):
+    """
+    Return the ShardAssignment of a user, placing the user on a shard if
+    needed. Only called when users sign up and when libraries move, never
+    while routing queries.
+    """
+    assignment = find_assignment(user_id)
+    if assignment is not None:
+        return assignment
+    # Libraries from before sharding stay where they are
+    if Book._base_manager.using(DEFAULT_DB_ALIAS).filter(user_id=user_id).exists():
+        alias = DEFAULT_DB_ALIAS
+    else:
+        alias = hashed_shard(user_id, shard_aliases())
+    prepare_user(alias, user_id)
+    return ShardAssignment.objects.using(DEFAULT_DB_ALIAS).get_or_create(
+        user_id=user_id, defaults={'shard': alias},
+    )[0]
+
+
+def shard_for_user(user_id):
+    """
+    The shard holding a user's library. Users without an assignment signed
+    up before sharding, so their library is on the default database.
+    """
+    if not sharding_enabled():
+        return DEFAULT_DB_ALIAS
+    assignment = find_assignment(user_id)
+    return DEFAULT_DB_ALIAS if assignment is None else assignment.shard
+
+
+def prepare_user(alias, user_id):
+    """
+    Give a shard a row for the user, so the foreign keys of the library
+    hold there. Only the id matters; the real user stays on the default
+    database. The row holds nothing else and is left behind when the
+    library moves away.
+    """
+    if alias != DEFAULT_DB_ALIAS:
+        User._base_manager.using(alias).bulk_create(
+            [User(pk=user_id, username=f'user-{user_id}', password='!')], ignore_conflicts=True,
+        )
+
+
+def library_moved_at(user_id):
+    """When the user's library last changed shards, or None"""
+    if not sharding_enabled():
+        return None
+    return (
+        ShardAssignment.objects.using(DEFAULT_DB_ALIAS)
+        .filter(user_id=user_id).values_list('moved_at', flat=True).first()
+    )
+
+
+class ShardRouter:
+    """
+    Routes the models of the books app to the shard holding the library
+    being served: the shard of the instance a query starts from, or the one
+    activated by ShardedViewMixin or use_shard(). The default shard is left
+    to the next router, so its reads can still go to replicas.
+    ShardAssignment always lives on the default database.
+    """
+
+    def shard_for(self, model, hints):
+        if model._meta.app_label != 'books' or not sharding_enabled():
+            return None
+        if model is ShardAssignment:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            if instance._meta.app_label == 'books' or instance._state.db != DEFAULT_DB_ALIAS:
+                alias = instance._state.db
+            else:
+                alias = shard_for_user(instance.pk)
+        else:
+            alias = current_shard.get() or DEFAULT_DB_ALIAS
+        return None if alias == DEFAULT_DB_ALIAS else alias
+
+    def db_for_read(self, model, **hints):
+        return self.shard_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self.shard_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Libraries point at users on the default database
+        shards = shard_aliases()
+        if obj1._state.db in shards and obj2._state.db in shards:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == 'books' and model_name == 'shardassignment':
+            return db == DEFAULT_DB_ALIAS
+        return None
+
+
+class ShardedViewMixin:
+    """
+    Run the books queries of an API view on the requesting user's shard.
+    Writes are refused while the library is being moved.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not sharding_enabled() or not request.user.is_authenticated:
+            return
+        assignment = find_assignment(request.user.pk)
+        if assignment is None:
+            self.shard_token = current_shard.set(DEFAULT_DB_ALIAS)
+            return
+        if assignment.moving and request.method not in SAFE_METHODS:
+            raise LibraryMoving()
+        self.shard_token = current_shard.set(assignment.shard)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, 'shard_token', None)
+        if token is not None:
+            current_shard.reset(token)
+            self.shard_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+def reserve_book_ids(using, **kwargs):
+    """
+    post_migrate handler starting the book ids of every shard but the
+    default one at its own multiple of SHARD_ID_SPACING
+    """
+    shards = shard_aliases()
+    if using not in shards or shards.index(using) == 0:
+        return
+    start = shards.index(using) * SHARD_ID_SPACING
+    connection = connections[using]
+    table = Book._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('DELETE FROM sqlite_sequence WHERE name = %s AND seq < %s', [table, start])
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                [table, start, table],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f'SELECT setval(pg_get_serial_sequence(%s, %s), GREATEST(%s, '
+                f'(SELECT COALESCE(MAX(id), 0) FROM {connection.ops.quote_name(table)})))',
+                [table, 'id', start],
+            )
+
+
+def copy_rows(queryset, target, **changes):
+    """
+    Insert the rows of ``queryset`` into ``target`` in batches, without
+    signals, after applying ``changes`` to every row. Returns the row count.
+    """
+    rows = queryset.order_by('pk').iterator(chunk_size=COPY_BATCH_SIZE)
+    manager = queryset.model._base_manager.using(target)
+    copied = 0
+    while batch := list(islice(rows, COPY_BATCH_SIZE)):
+        for row in batch:
+            for field, value in changes.items():
+                setattr(row, field, value(row) if callable(value) else value)
+        manager.bulk_create(batch)
+        copied += len(batch)
+    return copied
+
+
+def delete_library(user_id, alias, keep_tombstones=True):
+    """
+    Remove every books row of a user from one database. The books are
+    deleted like the cascade from User does, leaving tombstones for delta
+    sync. Copies left behind by a move pass ``keep_tombstones=False``,
+    which drops the tombstones too, since the move expires sync cursors.
+    """
+    with use_shard(alias), transaction.atomic(using=alias):
+        if keep_tombstones:
+            Book.objects.using(alias).filter(user_id=user_id).delete()
+        with bulk_operation():
+            models = [DailyReadingRollup, WeeklyReadingRollup, ReadingEvent, GenreCount, LibraryVersion]
+            if not keep_tombstones:
+                models.append(BookTombstone)
+            for model in models:
+                model._base_manager.using(alias).filter(user_id=user_id).delete()
+            Book._base_manager.using(alias).filter(user_id=user_id).delete()
+
+
+def copy_library(user_id, source, target):
+    """
+    Copy a user's library from ``source`` to ``target``, which must not hold
+    any of it yet. Books keep their ids; reading progress, genre counts and
+    reading events get new ones, events in their original order. Rollups
+    are rebuilt from the events on the target, and tombstones are dropped,
+    since sync cursors from before the move expire. Returns the row counts.
+    """
+    books = Book._base_manager.using(source).filter(user_id=user_id)
+    ids = list(books.values_list('pk', flat=True))
+    taken = [
+        pk for start in range(0, len(ids), COPY_BATCH_SIZE)
+        for pk in Book._base_manager.using(target)
+        .filter(pk__in=ids[start:start + COPY_BATCH_SIZE]).values_list('pk', flat=True)
+    ]
+    if taken:
+        raise ShardConflict(f'Book ids {taken[:10]} are already used on {target}')
+
+    return {
+        'books': copy_rows(books, target),
+        'progress': copy_rows(
+            ReadingProgress._base_manager.using(source).filter(book__user_id=user_id), target, id=None,
+        ),
+        'genre_counts': copy_rows(GenreCount._base_manager.using(source).filter(user_id=user_id), target, id=None),
+        'library_version': copy_rows(LibraryVersion._base_manager.using(source).filter(user_id=user_id), target),
+        'events': copy_rows(ReadingEvent._base_manager.using(source).filter(user_id=user_id), target, id=None),
+    }
+
+
+def move_library(user_id, target, grace=5.0):
+    """
+    Move a user's library to the ``target`` shard while the API stays up.
+
+    The library is marked as moving, so new writes are refused with 503,
+    and after ``grace`` seconds for writes already under way, it is copied
+    in one transaction on each shard. The assignment then switches to the
+    target, and the source copy is deleted. Reads are served throughout.
+    Returns the row counts copied, or None when the library is already on
+    the target.
+    """
+    if target not in shard_aliases():
+        raise ValueError(f'Unknown shard "{target}", expected one of {", ".join(shard_aliases())}')
+    assignments = ShardAssignment.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id)
+    source = assign_shard(user_id).shard
+    if source == target:
+        return None
+
+    assignments.update(moving=True)
+    try:
+        time.sleep(grace)
+        prepare_user(target, user_id)
+        # Leftovers of an earlier move away from the target would collide
+        delete_library(user_id, target, keep_tombstones=False)
+        with transaction.atomic(using=source), transaction.atomic(using=target):
+            copied = copy_library(user_id, source, target)
+        assignments.update(shard=target, moving=False, moved_at=timezone.now())
+    except BaseException:
+        assignments.update(moving=False)
+        raise
+
+    delete_library(user_id, source, keep_tombstones=False)
+    with use_shard(target):
+        roll_up_events()
+    return copied
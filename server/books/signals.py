@@ -0,0 +1,84 @@
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .models import (
+    Book, BookTombstone, GenreCount, LibraryVersion, ReadingProgress, in_bulk_operation,
+)
+from .sharding import assign_shard, delete_library, shard_for_user, sharding_enabled
+
+@receiver(post_save, sender=Book)
+def count_saved_book(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Signal to move a saved book into the right GenreCount row and bump the
+    owner's library version
+    """
+    stored = None if created else getattr(instance, '_stored_genre', None)
+    users = {instance.user_id}
+    if stored is not None:
+        users.add(stored[0])
+    LibraryVersion.objects.bump(users)
+
+    if update_fields is not None and not {'genre', 'user'} & set(update_fields):
+        return
+    if not created and stored is None:
+        # Saved without being loaded first, so the old genre is unknown
+        GenreCount.objects.rebuild(user_ids=[instance.user_id])
+    else:
+        current = (instance.user_id, instance.genre)
+        if current != stored:
+            deltas = Counter({current: 1})
+            if stored is not None:
+                deltas[stored] -= 1
+            GenreCount.objects.adjust(deltas)
+    instance.remember_genre()
+
+@receiver(post_delete, sender=Book)
+def count_deleted_book(sender, instance, **kwargs):
+    """
+    Signal to remove a deleted book from its GenreCount row, bump the
+    owner's library version and leave a tombstone for delta sync
+    """
+    if in_bulk_operation.get():
+        return
+    stored = getattr(instance, '_stored_genre', None) or (instance.user_id, instance.genre)
+    GenreCount.objects.adjust({stored: -1})
+    LibraryVersion.objects.bump([stored[0]])
+    BookTombstone.objects.create(user_id=stored[0], book_id=instance.pk)
+
+@receiver([post_save, post_delete], sender=ReadingProgress)
+def bump_progress_owner(sender, instance, **kwargs):
+    """
+    Signal to bump the library version of the owner of a book whose
+    reading progress changed, and mark the book as changed for delta sync
+    """
+    if in_bulk_operation.get():
+        return
+    LibraryVersion.objects.bump(Book._base_manager.filter(pk=instance.book_id).values('user_id'))
+    ReadingProgress.objects.touch_books([instance.book_id])
+
+@receiver(post_save, sender=User)
+def create_library_version(sender, instance, created, using, **kwargs):
+    """
+    Signal to place a new user on a shard and start their library version
+    there, so that reads never have to create it
+    """
+    if not created or using != DEFAULT_DB_ALIAS:
+        return
+    alias = assign_shard(instance.pk).shard if sharding_enabled() else DEFAULT_DB_ALIAS
+    LibraryVersion.objects.using(alias).get_or_create(user_id=instance.pk)
+
+@receiver(pre_delete, sender=User)
+def delete_sharded_library(sender, instance, using, **kwargs):
+    """
+    Signal to delete the library of a user kept on another shard, which the
+    cascade from the default database cannot reach. Deleted books leave
+    tombstones there, as they do in the cascade.
+    """
+    if using != DEFAULT_DB_ALIAS or not sharding_enabled():
+        return
+    alias = shard_for_user(instance.pk)
+    if alias != DEFAULT_DB_ALIAS:
+        delete_library(instance.pk, alias)
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Least
+
+from .models import Book, LibraryVersion, percentage_complete_expression
+
+
+def library_stats(user):
+    """
+    Totals, pages read, per-genre counts and the average completion of a
+    user's library, from a single aggregate query grouped by genre
+    """
+    current_page = Coalesce('reading_progress__current_page', Value(0))
+    percentage = percentage_complete_expression()
+    rows = (
+        Book.objects.filter(user=user).order_by('genre').values('genre').annotate(
+            books=Count('id'),
+            currently_reading=Count('id', filter=Q(is_currently_reading=True)),
+            total_pages=Coalesce(Sum('pages'), Value(0)),
+            # Pages past the end of the book are not counted
+            pages_read=Coalesce(Sum(Case(
+                When(pages__isnull=True, then=current_page),
+                default=Least(current_page, 'pages'),
+                output_field=IntegerField(),
+            )), Value(0)),
+            completion=Coalesce(Sum(percentage), Value(0)),
+            finished=Count('id', filter=Q(pages__gt=0, reading_progress__current_page__gte=F('pages'))),
+        )
+    )
+    genres = []
+    totals = dict.fromkeys(['books', 'currently_reading', 'total_pages', 'pages_read', 'finished'], 0)
+    completion = 0
+    for row in rows:
+        completion += row.pop('completion')
+        for field in totals:
+            totals[field] += row[field]
+        genres.append(row)
+    totals['average_completion'] = round(completion / totals['books'], 1) if totals['books'] else 0
+    totals['genres'] = genres
+    return totals
+
+
+def cached_library_stats(user):
+    """
+    library_stats() cached per user. The key carries the library version,
+    so any write to the user's books or progress makes it miss.
+    """
+    version = LibraryVersion.objects.current(user)
+    key = f'books:stats:{user.pk}:{version}'
+    stats = cache.get(key)
+    if stats is None:
+        stats = library_stats(user)
+        cache.set(key, stats, settings.BOOKS_STATS_CACHE_TIMEOUT)
+    return stats
@@ -0,0 +1,127 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.conf import settings
+from django.db import NotSupportedError, connections
+from django.db.models import F, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+
+from .models import Book, BookTombstone
+from .projections import project_books, represent_books
+from .sharding import library_moved_at
+
+
+# Vendors whose migrations maintain Book.change_seq (see migration 0010)
+CHANGE_SEQ_VENDORS = ('sqlite', 'postgresql')
+
+
+class SyncCursorExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Sync cursor has expired, start over with a full sync'
+    default_code = 'sync_cursor_expired'
+
+
+def tombstone_retention():
+    return datetime.timedelta(days=settings.BOOKS_TOMBSTONE_RETENTION_DAYS)
+
+
+def encode_cursor(position):
+    raw = json.dumps(position, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(encoded):
+    """
+    Return the position held by a sync cursor. A cursor records the
+    change_seq of the last book seen, the last tombstone id seen and when
+    the cursor was issued. Cursors from before change_seq have expired.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        if 'c' not in position and 'u' in position:
+            raise SyncCursorExpired()
+        issued_at = parse_datetime(position['at'])
+        if issued_at is None:
+            raise ValueError('Invalid timestamp')
+        return {
+            'change_seq': int(position['c']),
+            'tombstone_id': int(position['t']),
+            'issued_at': issued_at,
+        }
+    except (TypeError, ValueError, KeyError, UnicodeEncodeError, binascii.Error):
+        raise NotFound('Invalid sync cursor')
+
+
+def get_changes(user, since=None, page_size=100):
+    """
+    Return the user's books created or updated after the ``since`` cursor,
+    with their reading progress, and the ids of books deleted after it.
+
+    Books are read in change_seq order from the user's change_seq index and
+    tombstones in id order, so a sync costs O(changes). Both are handed out
+    in commit order, so a change committed after a cursor was issued always
+    sorts after it. Without a cursor every book is returned and earlier
+    deletions are skipped. ``has_more`` tells the client to call again with
+    ``next``. Raises NotSupportedError on databases that do not number
+    changes, where every book would look unchanged.
+    """
+    now = timezone.now()
+    books = Book.objects.filter(user=user)
+    vendor = connections[books.db].vendor
+    if vendor not in CHANGE_SEQ_VENDORS:
+        raise NotSupportedError(f'Delta sync needs change_seq triggers, which {vendor} does not have')
+    tombstones = BookTombstone.objects.filter(user_id=user.pk)
+    if since is None:
+        position = {
+            'change_seq': 0,
+            'tombstone_id': tombstones.aggregate(last=Max('id'))['last'] or 0,
+        }
+    else:
+        position = decode_cursor(since)
+        if position['issued_at'] < now - tombstone_retention():
+            raise SyncCursorExpired()
+        # Tombstones and change numbers stay behind when a library moves to
+        # another shard
+        moved_at = library_moved_at(user.pk)
+        if moved_at is not None and position['issued_at'] < moved_at:
+            raise SyncCursorExpired()
+
+    books = (
+        books.filter(change_seq__gt=position['change_seq'])
+        .select_related('reading_progress')
+        .order_by('change_seq')
+    )
+    books = list(project_books(books.annotate(seq=F('change_seq')))[:page_size + 1])
+    deleted = list(
+        tombstones.filter(id__gt=position['tombstone_id'])
+        .order_by('id').values_list('id', 'book_id')[:page_size + 1]
+    )
+    has_more = len(books) > page_size or len(deleted) > page_size
+    books, deleted = books[:page_size], deleted[:page_size]
+
+    if books:
+        position['change_seq'] = books[-1]['seq']
+    if deleted:
+        position['tombstone_id'] = deleted[-1][0]
+    return {
+        'books': represent_books(books),
+        'deleted': [book_id for _, book_id in deleted],
+        'has_more': has_more,
+        'next': encode_cursor({
+            'c': position['change_seq'],
+            't': position['tombstone_id'],
+            'at': now.isoformat(),
+        }),
+    }
+
+
+def compact_tombstones(older_than=None):
+    """Delete tombstones past the retention period and return how many"""
+    cutoff = timezone.now() - (older_than or tombstone_retention())
+    deleted, _ = BookTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,116 @@
+import datetime
+import itertools
+import math
+import random
+
+from .models import Book, ReadingProgress
+
+GENRES = [
+    'Fiction', 'Non-Fiction', 'Science Fiction', 'Fantasy', 'Mystery',
+    'Thriller', 'Romance', 'Biography', 'History', 'Poetry', 'Horror',
+    'Self-Help', 'Science', 'Philosophy', 'Travel', 'Young Adult',
+]
+
+FIRST_NAMES = [
+    'Ada', 'Alan', 'Ursula', 'Frank', 'Octavia', 'Jane', 'George', 'Toni',
+    'Haruki', 'Chinua', 'Virginia', 'Isaac', 'Mary', 'Leo', 'Gabriel', 'Zadie',
+]
+
+LAST_NAMES = [
+    'Lovelace', 'Turing', 'Le Guin', 'Herbert', 'Butler', 'Austen', 'Orwell',
+    'Morrison', 'Murakami', 'Achebe', 'Woolf', 'Asimov', 'Shelley', 'Tolstoy',
+    'Marquez', 'Smith',
+]
+
+SYLLABLES = [
+    'ka', 'lo', 'ri', 'an', 'ter', 'mon', 'su', 'vel', 'dra', 'is', 'or',
+    'quen', 'ta', 'mir', 'el', 'zo', 'bra', 'un', 'pha', 'set', 'ly', 'cor',
+]
+
+
+def library_sizes(users, mean_books, rng):
+    """
+    Return a book count per user drawn from a log-normal distribution with
+    mean ``mean_books``: most libraries are small and a few are very large
+    """
+    sigma = 1.0
+    mu = math.log(max(mean_books, 1)) - sigma ** 2 / 2
+    return [round(rng.lognormvariate(mu, sigma)) for _ in range(users)]
+
+
+def make_vocabulary(size, rng):
+    """Build a sorted list of distinct pseudo-words"""
+    words = set()
+    while len(words) < size:
+        length = rng.randint(2, 4)
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(length)))
+    return sorted(words)
+
+
+class BookFactory:
+    """
+    Deterministic generator of realistic-looking books.
+
+    Words are drawn with a Zipf-like distribution, so a few terms are very
+    common and most are rare, which is what real titles and descriptions look
+    like to a search index.
+    """
+
+    def __init__(self, seed=0, vocabulary_size=5000):
+        self.rng = random.Random(seed)
+        self.vocabulary = make_vocabulary(vocabulary_size, self.rng)
+        self.cum_weights = list(itertools.accumulate(
+            1.0 / rank for rank in range(1, vocabulary_size + 1)
+        ))
+
+    def words(self, count):
+        return self.rng.choices(self.vocabulary, cum_weights=self.cum_weights, k=count)
+
+    def author(self):
+        return f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}'
+
+    def book(self, user, **overrides):
+        """Return an unsaved Book for ``user``"""
+        fields = {
+            'title': ' '.join(self.words(self.rng.randint(1, 5))).title(),
+            'author': self.author(),
+            'genre': self.rng.choice(GENRES),
+            'pages': self.rng.randint(80, 1200),
+            'description': ' '.join(self.words(self.rng.randint(20, 60))),
+            'is_currently_reading': self.rng.random() < 0.1,
+            'user': user,
+        }
+        fields.update(overrides)
+        return Book(**fields)
+
+    def books(self, user, count):
+        for _ in range(count):
+            yield self.book(user)
+
+    def library(self, user, count):
+        """
+        Yield ``count`` unsaved books for ``user``, whose genres lean towards
+        a few favourites the way real libraries do
+        """
+        genres = self.rng.sample(GENRES, len(GENRES))
+        cum_weights = list(itertools.accumulate(1.0 / rank for rank in range(1, len(genres) + 1)))
+        for _ in range(count):
+            yield self.book(user, genre=self.rng.choices(genres, cum_weights=cum_weights)[0])
+
+    def progress(self, book):
+        """
+        Return unsaved reading progress for ``book``: about a third are not
+        started, a fifth are finished and the rest are part way through
+        """
+        pages = book.pages or 0
+        roll = self.rng.random()
+        if roll < 0.35 or not pages:
+            current_page = 0
+        elif roll < 0.55:
+            current_page = pages
+        else:
+            current_page = self.rng.randint(1, max(1, pages - 1))
+        start_date = None
+        if current_page:
+            start_date = datetime.date.today() - datetime.timedelta(days=self.rng.randint(1, 365))
+        return ReadingProgress(book=book, current_page=current_page, start_date=start_date)
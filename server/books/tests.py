@@ -1,3 +1,1619 @@
-from django.test import TestCase
+import datetime
+import os
+import re
+import tempfile
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal
+import json
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from django.contrib.admin import helpers
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import NotSupportedError, connection, connections
+from django.db.models import F, Value
+from django.db.models.functions import Upper
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.test import APIClient
+from rest_framework import status
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import AccessToken
+from health_check.metrics import registry
+from readily_reads.cache import MemoryLRUCache
+from readily_reads.parsers import ORJSONParser
+from readily_reads.renderers import ORJSONRenderer, orjson
+from readily_reads.routers import PrimaryReplicaRouter, pin_cache, reads_on_primary
+from .models import (
+    Book, BookTombstone, DailyReadingRollup, GenreCount, LibraryVersion, ReadingEvent,
+    ReadingProgress, RollupCheckpoint, ShardAssignment, WeeklyReadingRollup,
+)
+from .pagination import EstimatedCountPaginator
+from .projections import project_books, represent_books
+from .importers import BookImporter
+from .reading_log import record_events, roll_up_events
+from .response_cache import response_cache
+from .search import search_books
+from .sharding import find_assignment, move_library, shard_for_user, use_shard
+from .serializers import BookSerializer
+from .sync import get_changes
 
-# Create your tests here.
+# EXPLAIN QUERY PLAN lines that read a whole table (or a whole index) instead
+# of seeking into one
+TABLE_SCAN_RE = re.compile(r'^SCAN (?P<table>\w+)(?! VIRTUAL TABLE)')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+class QueryPlanAssertionsMixin:
+    """
+    Test utility that runs EXPLAIN QUERY PLAN on every query touching the
+    books tables and fails on table scans or temporary B-tree sorts.
+    """
+    plan_table_prefix = 'books_'
+
+    def get_query_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def get_plan_problems(self, plan, allow_temp_sort=False):
+        problems = []
+        for detail in plan:
+            scan = TABLE_SCAN_RE.match(detail)
+            if scan and scan.group('table').startswith(self.plan_table_prefix):
+                problems.append(detail)
+            elif detail.startswith(TEMP_SORT) and not allow_temp_sort:
+                problems.append(detail)
+        return problems
+
+    @contextmanager
+    def assertIndexedQueries(self, allow_temp_sort=False):
+        """Fail if any books query run inside the block scans or sorts"""
+        with CaptureQueriesContext(connection) as captured:
+            yield captured
+        for query in captured.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or self.plan_table_prefix not in sql:
+                continue
+            plan = self.get_query_plan(sql)
+            problems = self.get_plan_problems(plan, allow_temp_sort)
+            if problems:
+                self.fail('Query is not served by an index: %s\nPlan: %s' % (sql, plan))
+
+class BookSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User.objects.create_user(username='user1', password='password123')
+        cls.user2 = User.objects.create_user(username='user2', password='password456')
+
+        cls.dune = Book.objects.create(
+            title='Dune', author='Frank Herbert', genre='Science Fiction',
+            description='A desert planet and its spice', user=cls.user1
+        )
+        cls.emma = Book.objects.create(
+            title='Emma', author='Jane Austen', genre='Romance',
+            description='Matchmaking in a village near the dunes', user=cls.user1
+        )
+        cls.other = Book.objects.create(
+            title='Dune Messiah', author='Frank Herbert', genre='Science Fiction',
+            user=cls.user2
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user1)
+        response_cache().clear()
+
+    def search(self, **params):
+        response = self.client.get(reverse('book-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book['id'] for book in response.data['results']]
+
+    def test_search_is_ranked_and_scoped_to_user(self):
+        """Test that title matches rank first and other users' books are excluded"""
+        self.assertEqual(self.search(query='dune'), [self.dune.id, self.emma.id])
+
+    def test_search_matches_prefixes(self):
+        """Test that partially typed terms match"""
+        self.assertEqual(self.search(search='herb'), [self.dune.id])
+
+    def test_search_requires_all_terms(self):
+        """Test that every term must match"""
+        self.assertEqual(self.search(query='jane village'), [self.emma.id])
+
+    def test_explicit_ordering_overrides_rank(self):
+        """Test that an explicit ordering is used instead of relevance"""
+        self.assertEqual(self.search(query='dune', ordering='-title'), [self.emma.id, self.dune.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test that the search index stays in sync with saves, bulk updates and deletes"""
+        self.dune.title = 'Arrakis'
+        self.dune.save()
+        self.assertEqual(self.search(query='arrakis'), [self.dune.id])
+
+        Book.objects.filter(pk=self.emma.pk).update(description='Nothing to see')
+        self.assertEqual(self.search(query='dune'), [])
+
+        self.dune.delete()
+        self.assertEqual(self.search(query='arrakis'), [])
+
+    def test_search_is_complete_under_filters(self):
+        """Test that older matches are still found behind many newer ones and filters"""
+        Book.objects.bulk_create(
+            Book(title=f'Dune {number}', author='Brian Herbert', genre='Fiction', user=self.user1)
+            for number in range(30)
+        )
+        self.assertEqual(self.search(query='dune', genre='Romance'), [self.emma.id])
+        response = self.client.get(reverse('book-list'), {'query': 'dune'})
+        self.assertEqual(response.data['count'], 32)
+
+    def test_search_rank_in_subquery(self):
+        """Test that the rank follows the book table's alias inside a subquery"""
+        ranked = search_books(Book.objects.filter(user=self.user1), 'dune', user_id=self.user1.pk)
+        books = Book.objects.filter(pk__in=ranked.order_by('-search_rank').values('pk')[:1])
+        self.assertEqual(list(books), [self.dune])
+
+    @override_settings(BOOKS_SEARCH_BACKEND='books.search.IcontainsSearchBackend')
+    def test_icontains_backend(self):
+        """Test that the portable backend finds the same books"""
+        results = search_books(Book.objects.filter(user=self.user1), 'dune')
+        self.assertEqual({book.id for book in results}, {self.dune.id, self.emma.id})
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked with SQLite EXPLAIN')
+class BookQueryPlanTests(QueryPlanAssertionsMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        cls.other = User.objects.create_user(username='other', password='password456')
+        for owner in (cls.user, cls.other):
+            for index in range(5):
+                book = Book.objects.create(
+                    title=f'Book {index}', author='Author', genre=f'Genre {index % 2}',
+                    pages=100, is_currently_reading=index % 2 == 0, user=owner
+                )
+                ReadingProgress.objects.create(book=book, current_page=index)
+        cls.book = cls.user.books.first()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def get(self, url, params=None):
+        with self.assertIndexedQueries():
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_plans(self):
+        """Test that the list endpoint and its filters use indexes"""
+        self.get(reverse('book-list'))
+        self.get(reverse('book-list'), {'genre': 'Genre 1'})
+        self.get(reverse('book-list'), {'is_currently_reading': 'true'})
+
+    def test_detail_plans(self):
+        """Test that retrieving one book uses indexes"""
+        self.get(reverse('book-detail', args=[self.book.id]))
+
+    def test_currently_reading_and_genres_plans(self):
+        """Test that the currently reading and genres endpoints use indexes"""
+        self.get(reverse('book-currently-reading'))
+        self.get(reverse('book-genres'))
+
+    def test_reading_progress_plan(self):
+        """Test that the reading progress lookup joins through an index"""
+        with self.assertIndexedQueries():
+            list(ReadingProgress.objects.filter(book__user=self.user, book_id=self.book.id))
+
+    def test_detects_table_scans(self):
+        """Test that the utility reports unindexed queries"""
+        plan = self.get_query_plan('SELECT * FROM books_book WHERE pages > 10 ORDER BY title')
+        self.assertEqual(len(self.get_plan_problems(plan)), 2)
+
+class BookCursorPaginationTests(QueryPlanAssertionsMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        Book.objects.bulk_create([
+            Book(title=f'Book {index % 4}', author=f'Author {index}', genre='Fiction', user=cls.user)
+            for index in range(25)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def collect(self, params, check_plans=False):
+        """Follow next links until the end and return the ids in order"""
+        url, ids, pages = reverse('book-list'), [], 0
+        while url:
+            if check_plans and connection.vendor == 'sqlite':
+                with self.assertIndexedQueries():
+                    response = self.client.get(url, params)
+            else:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(book['id'] for book in response.data['results'])
+            url, params, pages = response.data['next'], None, pages + 1
+        return ids, pages
+
+    def test_walks_every_book_once(self):
+        """Test that following next links returns every book in the default order"""
+        ids, pages = self.collect({'pagination': 'cursor'}, check_plans=True)
+        expected = list(Book.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_ordering_fields_with_duplicate_values(self):
+        """Test that the id tiebreaker keeps pages stable across duplicate values"""
+        for ordering in ('title', '-title', 'author', '-updated_at'):
+            ids, _ = self.collect({'pagination': 'cursor', 'ordering': ordering, 'page_size': 7}, check_plans=True)
+            field = ordering.lstrip('-')
+            tiebreaker = '-id' if ordering.startswith('-') else 'id'
+            expected = list(Book.objects.filter(user=self.user).order_by(ordering, tiebreaker).values_list('id', flat=True))
+            self.assertEqual(ids, expected, ordering)
+
+    @override_settings(BOOKS_MAX_PAGE_SIZE=20)
+    def test_page_size_is_capped(self):
+        """Test that clients can ask for bigger pages up to the server cap"""
+        response = self.client.get(reverse('book-list'), {'pagination': 'cursor', 'page_size': 500})
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        response = self.client.get(reverse('book-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_numbers_remain_default(self):
+        """Test that clients that do not opt in still get page numbers"""
+        response = self.client.get(reverse('book-list'))
+        self.assertEqual(response.data['count'], 25)
+
+class BookQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        cls.book = cls.create_books(1)[0]
+
+    @classmethod
+    def create_books(cls, count):
+        books = []
+        for index in range(count):
+            book = Book.objects.create(
+                title=f'Book {index}', author='Author', genre=f'Genre {index % 3}',
+                pages=300, is_currently_reading=True, user=cls.user
+            )
+            ReadingProgress.objects.create(book=book, current_page=30)
+            books.append(book)
+        return books
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def assertConstantQueries(self, num, url, params=None, method='get'):
+        """Check the query count before and after the library grows"""
+        for extra_books in (0, 20):
+            self.create_books(extra_books)
+            with self.assertNumQueries(num):
+                response = getattr(self.client, method)(url, params, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_list_queries(self):
+        """Test that listing books runs a version lookup, a count and a single joined select"""
+        response = self.assertConstantQueries(3, reverse('book-list'), {'page_size': 20})
+        self.assertEqual(response.data['results'][0]['reading_progress']['percentage_complete'], 10)
+
+    def test_cursor_list_queries(self):
+        """Test that a cursor page runs a version lookup and a single joined select"""
+        self.assertConstantQueries(2, reverse('book-list'), {'pagination': 'cursor', 'page_size': 20})
+
+    def test_retrieve_queries(self):
+        """Test that retrieving a book and checking ownership is one query after the version lookup"""
+        self.assertConstantQueries(2, reverse('book-detail', args=[self.book.id]))
+
+    def test_currently_reading_queries(self):
+        """Test that the currently reading endpoint is one query after the version lookup"""
+        response = self.assertConstantQueries(2, reverse('currently-reading'))
+        self.assertEqual(len(response.data), 21)
+
+    def test_genres_queries(self):
+        """Test that the genres endpoint is one query after the version lookup"""
+        self.assertConstantQueries(2, reverse('book-genres'))
+
+    def test_progress_queries(self):
+        """Test that reading and updating progress use a constant number of queries"""
+        url = reverse('reading-progress', args=[self.book.id])
+        response = self.assertConstantQueries(1, url)
+        self.assertEqual(response.data['percentage_complete'], 10)
+        # Select, update, the library version bump, touching the book and
+        # appending the reading event
+        for current_page in (120, 150):
+            self.create_books(20)
+            with self.assertNumQueries(5):
+                response = self.client.patch(url, {'current_page': current_page}, format='json')
+        self.assertEqual(response.data['percentage_complete'], 50)
+
+class BookProjectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        # (pages, current_page) pairs that exercise rounding and edge cases
+        cases = [(100, 29), (3, 1), (200, 500), (None, 10), (0, 10), (57, 0)]
+        for index, (pages, current_page) in enumerate(cases):
+            book = Book.objects.create(
+                title=f'Book {index}', author='Author', genre='Fiction', pages=pages,
+                description='Description' if index % 2 else None,
+                publication_date=datetime.date(2001, 2, index + 1) if index % 2 else None,
+                is_currently_reading=index % 2 == 0, user=cls.user
+            )
+            ReadingProgress.objects.create(
+                book=book, current_page=current_page,
+                start_date=datetime.date(2024, 1, 1) if index % 2 else None,
+                notes='Notes' if index % 3 else None
+            )
+        # A book without any reading progress row
+        Book.objects.create(title='No progress', author='Author', genre='Fiction', user=cls.user)
+
+    def test_matches_book_serializer(self):
+        """Test that projected rows are identical to BookSerializer output"""
+        queryset = Book.objects.filter(user=self.user).select_related('reading_progress')
+        expected = BookSerializer(queryset, many=True).data
+        actual = represent_books(project_books(queryset))
+        self.assertEqual(actual, expected)
+        self.assertEqual([list(row) for row in actual], [list(row) for row in expected])
+
+    def test_list_endpoint_uses_projection(self):
+        """Test that the list endpoint returns the serializer schema"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get(reverse('book-list'), {'page_size': 20, 'pagination': 'cursor'})
+        queryset = Book.objects.filter(user=self.user).order_by('-created_at', '-id')
+        self.assertEqual(response.data['results'], BookSerializer(queryset, many=True).data)
+
+class GenreIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        cls.other_user = User.objects.create_user(username='other', password='password123')
+        Book.objects.bulk_create(
+            Book(title=f'Book {index}', author='Author', genre=['Fiction', 'History'][index % 2], user=cls.user)
+            for index in range(5)
+        )
+        Book.objects.create(title='Other', author='Author', genre='Poetry', user=cls.other_user)
+
+    def assertIndexMatches(self):
+        self.assertEqual(GenreCount.objects.stored_counts(), GenreCount.objects.live_counts())
+
+    def counts(self, user=None):
+        return GenreCount.objects.stored_counts([(user or self.user).id])
+
+    def test_genres_endpoint_returns_counts(self):
+        """Test that the genres endpoint lists genres with their book counts"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get(reverse('book-genres'))
+        self.assertEqual(response.data['genres'], ['All Genres', 'Fiction', 'History'])
+        self.assertEqual(response.data['counts'], {'All Genres': 5, 'Fiction': 3, 'History': 2})
+
+    def test_api_create_update_and_delete(self):
+        """Test that books written through the API keep the index in step"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post(reverse('book-list'), {'title': 'New', 'author': 'A', 'genre': 'Poetry'}, format='json')
+        book_id = response.data['id']
+        self.assertEqual(self.counts()[(self.user.id, 'Poetry')], 1)
+        client.patch(reverse('book-detail', args=[book_id]), {'genre': 'Fiction'}, format='json')
+        self.assertNotIn((self.user.id, 'Poetry'), self.counts())
+        self.assertEqual(self.counts()[(self.user.id, 'Fiction')], 4)
+        client.delete(reverse('book-detail', args=[book_id]))
+        self.assertEqual(self.counts()[(self.user.id, 'Fiction')], 3)
+        self.assertIndexMatches()
+
+    def test_saves_that_do_not_touch_genre(self):
+        """Test that saving other fields or an unloaded instance stays correct"""
+        book = Book.objects.filter(user=self.user).first()
+        book.title = 'Renamed'
+        book.save()
+        Book(
+            id=book.id, title='Unloaded', author='Author', genre='Poetry',
+            created_at=book.created_at, user=self.user
+        ).save()
+        self.assertIndexMatches()
+
+    def test_bulk_operations(self):
+        """Test that queryset updates, bulk updates and deletes keep the index in step"""
+        books = Book.objects.filter(user=self.user)
+        books.filter(genre='History').update(genre='Essays')
+        self.assertIndexMatches()
+        books.filter(genre='Essays').update(user=self.other_user)
+        self.assertIndexMatches()
+        Book.objects.filter(genre='Essays').update(genre=Upper('genre'))
+        self.assertIndexMatches()
+        fiction = list(books.filter(genre='Fiction'))
+        for book in fiction[:2]:
+            book.genre = 'Drama'
+        Book.objects.bulk_update(fiction, ['genre'])
+        self.assertIndexMatches()
+        books.filter(genre='Drama').delete()
+        self.assertIndexMatches()
+        self.assertEqual(self.counts(), {(self.user.id, 'Fiction'): 1})
+
+    def test_deleting_user_removes_rows(self):
+        """Test that deleting a user deletes their genre index"""
+        self.other_user.delete()
+        self.assertEqual(self.counts(self.other_user), {})
+        self.assertIndexMatches()
+
+    def test_rebuild_command(self):
+        """Test that the command detects drift and rebuilds the index"""
+        GenreCount.objects.filter(user=self.user, genre='Fiction').update(book_count=F('book_count') + Value(7))
+        with self.assertRaises(CommandError):
+            call_command('rebuild_genre_index', verify=True, stdout=StringIO(), stderr=StringIO())
+        call_command('rebuild_genre_index', stdout=StringIO())
+        call_command('rebuild_genre_index', verify=True, stdout=StringIO())
+        self.assertIndexMatches()
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        cls.other_user = User.objects.create_user(username='other', password='password123')
+        cls.book = Book.objects.create(title='Dune', author='Frank Herbert', genre='Science Fiction', user=cls.user)
+        ReadingProgress.objects.create(book=cls.book)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def version(self):
+        return LibraryVersion.objects.current(self.user)
+
+    def test_not_modified_skips_the_view(self):
+        """Test that a matching If-None-Match gets a 304 after only the version lookup"""
+        for url in [reverse('book-list'), reverse('book-detail', args=[self.book.id]),
+                    reverse('currently-reading'), reverse('book-genres')]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag = response['ETag']
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response['ETag'], etag)
+            self.assertFalse(response.content)
+
+    def test_etag_depends_on_query(self):
+        """Test that different pages of the list get different ETags"""
+        first = self.client.get(reverse('book-list'))['ETag']
+        second = self.client.get(reverse('book-list'), {'ordering': 'title'})['ETag']
+        self.assertNotEqual(first, second)
+
+    def test_writes_bump_version(self):
+        """Test that book and progress writes, single or bulk, change the ETag"""
+        url = reverse('book-list')
+        etag = self.client.get(url)['ETag']
+        writes = [
+            lambda: self.client.patch(reverse('book-detail', args=[self.book.id]), {'title': 'Dune!'}, format='json'),
+            lambda: self.client.patch(reverse('toggle-reading', args=[self.book.id])),
+            lambda: self.client.patch(reverse('reading-progress', args=[self.book.id]), {'current_page': 5}, format='json'),
+            lambda: Book.objects.filter(user=self.user).update(pages=10),
+            lambda: ReadingProgress.objects.filter(book__user=self.user).update(current_page=3),
+            lambda: Book.objects.bulk_create([Book(title='Emma', author='Jane Austen', genre='Romance', user=self.user)]),
+            lambda: Book.objects.filter(user=self.user, title='Emma').delete(),
+        ]
+        for write in writes:
+            version = self.version()
+            write()
+            self.assertGreater(self.version(), version)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag = response['ETag']
+
+    def test_other_users_writes_do_not_bump(self):
+        """Test that another user's writes leave the version alone"""
+        version = self.version()
+        Book.objects.create(title='Emma', author='Jane Austen', genre='Romance', user=self.other_user)
+        self.assertEqual(self.version(), version)
+
+class BookImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, name, content, **data):
+        data['file'] = SimpleUploadedFile(name, content.encode('utf-8'))
+        return self.client.post(reverse('book-import'), data, format='multipart')
+
+    def test_csv_import(self):
+        """Test that a CSV upload creates valid rows with progress and reports invalid ones"""
+        content = (
+            'title,author,genre,pages,is_currently_reading,current_page,notes\n'
+            'Dune,Frank Herbert,Science Fiction,412,true,100,"Spice, lots of it"\n'
+            ',Nobody,Fiction,10,false,,\n'
+            'Emma,Jane Austen,Romance,not a number,false,,\n'
+            'Persuasion,Jane Austen,Romance,,false,,\n'
+        )
+        response = self.upload('library.csv', content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual([error['record'] for error in response.data['errors']], [2, 3])
+        self.assertIn('title', response.data['errors'][0]['errors'])
+        dune = Book.objects.get(user=self.user, title='Dune')
+        self.assertTrue(dune.is_currently_reading)
+        self.assertEqual(dune.reading_progress.current_page, 100)
+        self.assertEqual(dune.reading_progress.notes, 'Spice, lots of it')
+        self.assertEqual(Book.objects.get(title='Persuasion').reading_progress.current_page, 0)
+        self.assertEqual(GenreCount.objects.stored_counts(), GenreCount.objects.live_counts())
+
+    def test_ndjson_import(self):
+        """Test that NDJSON accepts flat and nested records and reports bad lines"""
+        lines = [
+            json.dumps({'title': 'Dune', 'author': 'Frank Herbert', 'genre': 'Science Fiction'}),
+            '',
+            json.dumps({'title': 'Emma', 'author': 'Jane Austen', 'genre': 'Romance',
+                        'reading_progress': {'current_page': 12}}),
+            '{not json',
+            '[1, 2]',
+        ]
+        response = self.upload('library.ndjson', '\n'.join(lines))
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['record'] for error in response.data['errors']], [3, 4])
+        self.assertEqual(Book.objects.get(title='Emma').reading_progress.current_page, 12)
+
+    def test_goodreads_import(self):
+        """Test that Goodreads exports are mapped onto books"""
+        content = (
+            'Book Id,Title,Author,Number of Pages,Year Published,Original Publication Year,'
+            'Bookshelves,Exclusive Shelf,My Review\n'
+            '1,Dune,Frank Herbert,412,2005,1965,"science-fiction, currently-reading",currently-reading,Great\n'
+            '2,Emma,Jane Austen,,,,to-read,to-read,\n'
+        )
+        response = self.upload('goodreads_library_export.csv', content)
+        self.assertEqual(response.data['created'], 2)
+        dune = Book.objects.get(title='Dune')
+        self.assertEqual(dune.genre, 'Science Fiction')
+        self.assertEqual(dune.publication_date, datetime.date(1965, 1, 1))
+        self.assertTrue(dune.is_currently_reading)
+        self.assertEqual(dune.reading_progress.notes, 'Great')
+        self.assertEqual(Book.objects.get(title='Emma').genre, 'Uncategorized')
+
+    def test_format_field_overrides_file_name(self):
+        """Test that the format form field is used for files without a known extension"""
+        line = json.dumps({'title': 'Dune', 'author': 'Frank Herbert', 'genre': 'Science Fiction'})
+        response = self.upload('library.txt', line, format='ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+
+    def test_rejects_unknown_format(self):
+        """Test that uploads of unknown formats are rejected"""
+        response = self.upload('library.xlsx', 'title')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('format', response.data)
+
+    def test_import_command(self):
+        """Test that the management command imports from standard input"""
+        stdin = BytesIO(b'title,author,genre\nDune,Frank Herbert,Science Fiction\n')
+        stdout = StringIO()
+        with mock.patch('sys.stdin', mock.Mock(buffer=stdin)):
+            call_command('import_books', '-', username='reader', format='csv', stdout=stdout)
+        self.assertEqual(json.loads(stdout.getvalue())['created'], 1)
+
+class BookBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        cls.other_user = User.objects.create_user(username='other', password='password123')
+        cls.books = Book.objects.bulk_create(
+            Book(title=f'Book {index}', author='Author', genre='Fiction', user=cls.user)
+            for index in range(4)
+        )
+        cls.other_book = Book.objects.create(title='Other', author='Author', genre='Fiction', user=cls.other_user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_shared_patch(self):
+        """Test that ids with a shared patch are updated in one statement"""
+        ids = [self.books[0].id, self.books[1].id, self.other_book.id]
+        before = Book.objects.get(id=self.books[0].id).updated_at
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(reverse('book-batch'), {
+                'ids': ids, 'patch': {'genre': 'History', 'is_currently_reading': True},
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['results'][2], {'id': self.other_book.id, 'status': 'not_found'})
+        self.assertEqual([q['sql'].startswith('UPDATE "books_book"') for q in queries].count(True), 1)
+        book = Book.objects.get(id=self.books[0].id)
+        self.assertEqual((book.genre, book.is_currently_reading), ('History', True))
+        self.assertGreater(book.updated_at, before)
+        self.assertEqual(Book.objects.get(id=self.other_book.id).genre, 'Fiction')
+        self.assertEqual(GenreCount.objects.stored_counts(), GenreCount.objects.live_counts())
+
+    def test_per_id_patches(self):
+        """Test that per-id patches are grouped and later patches win"""
+        response = self.client.patch(reverse('book-batch'), {'updates': [
+            {'id': self.books[0].id, 'title': 'First'},
+            {'id': self.books[1].id, 'is_currently_reading': True},
+            {'id': self.books[2].id, 'is_currently_reading': True},
+            {'id': self.books[0].id, 'title': 'Renamed', 'pages': 10},
+        ]}, format='json')
+        self.assertEqual(response.data['updated'], 3)
+        first = Book.objects.get(id=self.books[0].id)
+        self.assertEqual((first.title, first.pages), ('Renamed', 10))
+        self.assertEqual(Book.objects.filter(user=self.user, is_currently_reading=True).count(), 2)
+
+    def test_invalid_patches_change_nothing(self):
+        """Test that a batch with an invalid patch is rejected as a whole"""
+        response = self.client.patch(reverse('book-batch'), {'updates': [
+            {'id': self.books[0].id, 'title': 'Fine'},
+            {'id': self.books[1].id, 'pages': -1},
+            {'id': self.books[2].id, 'user': self.other_user.id},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data['updates']), {1, 2})
+        self.assertFalse(Book.objects.filter(title='Fine').exists())
+
+    def test_batch_delete(self):
+        """Test that batch deletes only remove the user's own books"""
+        ids = [self.books[0].id, self.books[1].id, self.other_book.id]
+        response = self.client.post(reverse('book-batch-delete'), {'ids': ids}, format='json')
+        self.assertEqual(response.data['deleted'], 2)
+        self.assertEqual(response.data['not_found'], 1)
+        self.assertEqual(Book.objects.filter(user=self.user).count(), 2)
+        self.assertTrue(Book.objects.filter(id=self.other_book.id).exists())
+        self.assertEqual(GenreCount.objects.stored_counts(), GenreCount.objects.live_counts())
+
+class BookExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        cls.other_user = User.objects.create_user(username='other', password='password123')
+        cls.book = Book.objects.create(
+            title='Dune', author='Frank Herbert', genre='Science Fiction', pages=400,
+            publication_date=datetime.date(1965, 8, 1), user=cls.user
+        )
+        ReadingProgress.objects.create(book=cls.book, current_page=100, notes='Spice, "melange"')
+        Book.objects.create(title='Emma', author='Jane Austen', genre='Romance', user=cls.user)
+        Book.objects.create(title='Other', author='Author', genre='Fiction', user=cls.other_user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse('book-export'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_ndjson_export_matches_serializer(self):
+        """Test that the NDJSON export streams the user's books in the API schema"""
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        books = [json.loads(line) for line in body.splitlines()]
+        queryset = Book.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(books, json.loads(json.dumps(BookSerializer(queryset, many=True).data)))
+
+    def test_csv_export_round_trips(self):
+        """Test that a CSV export can be imported again"""
+        response, body = self.export(format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertTrue(body.startswith('id,title,author,genre,'))
+        report = BookImporter(self.other_user).run(BytesIO(body.encode('utf-8')), 'csv')
+        self.assertEqual(report['created'], 2)
+        copy = Book.objects.get(user=self.other_user, title='Dune')
+        self.assertEqual(copy.publication_date, self.book.publication_date)
+        self.assertEqual(copy.reading_progress.notes, 'Spice, "melange"')
+
+    def test_export_command_covers_all_users(self):
+        """Test that the command exports every user's books with their usernames"""
+        stdout = StringIO()
+        call_command('export_books', stdout=stdout)
+        books = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([book['username'] for book in books], ['reader', 'reader', 'other'])
+
+class BookChangesTests(QueryPlanAssertionsMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        cls.books = []
+        for index in range(3):
+            book = Book.objects.create(title=f'Book {index}', author='Author', genre='Fiction', user=cls.user)
+            ReadingProgress.objects.create(book=book)
+            cls.books.append(book)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def sync(self, since=None, **params):
+        if since:
+            params['since'] = since
+        response = self.client.get(reverse('book-changes'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_initial_sync_pages_through_library(self):
+        """Test that a sync without a cursor pages through every book"""
+        BookTombstone.objects.create(user_id=self.user.id, book_id=999)
+        first = self.sync(page_size=2)
+        self.assertTrue(first['has_more'])
+        second = self.sync(first['next'], page_size=2)
+        self.assertFalse(second['has_more'])
+        ids = [book['id'] for book in first['books'] + second['books']]
+        self.assertEqual(sorted(ids), sorted(book.id for book in self.books))
+        self.assertEqual(first['deleted'] + second['deleted'], [])
+
+    def test_returns_only_changes(self):
+        """Test that book edits, progress edits and deletes since the cursor are returned"""
+        cursor = self.sync()['next']
+        self.assertEqual(self.sync(cursor)['books'], [])
+        self.client.patch(reverse('book-detail', args=[self.books[0].id]), {'title': 'Renamed'}, format='json')
+        self.client.patch(reverse('reading-progress', args=[self.books[1].id]), {'current_page': 7}, format='json')
+        self.client.delete(reverse('book-detail', args=[self.books[2].id]))
+        changes = self.sync(cursor)
+        self.assertEqual([book['id'] for book in changes['books']], [self.books[0].id, self.books[1].id])
+        self.assertEqual(changes['books'][1]['reading_progress']['current_page'], 7)
+        self.assertEqual(changes['deleted'], [self.books[2].id])
+        self.assertEqual(self.sync(changes['next'])['books'], [])
+
+    def test_late_commit_is_not_missed(self):
+        """Test that a change stamped before the cursor but committed after it is returned"""
+        cursor = self.sync()['next']
+        stamped_earlier = timezone.now() - datetime.timedelta(minutes=1)
+        Book.objects.filter(id=self.books[0].id).update(title='Late', updated_at=stamped_earlier)
+        changes = self.sync(cursor)
+        self.assertEqual([book['title'] for book in changes['books']], ['Late'])
+        self.assertEqual(self.sync(changes['next'])['books'], [])
+
+    def test_unsupported_database_fails_loudly(self):
+        """Test that sync refuses to run where nothing numbers changes"""
+        with mock.patch('books.sync.CHANGE_SEQ_VENDORS', ()):
+            with self.assertRaises(NotSupportedError):
+                get_changes(self.user)
+
+    def test_bulk_and_cascade_deletes_leave_tombstones(self):
+        """Test that queryset and user cascade deletes record tombstones"""
+        cursor = self.sync()['next']
+        Book.objects.filter(id=self.books[0].id).delete()
+        self.assertEqual(self.sync(cursor)['deleted'], [self.books[0].id])
+        user_id = self.user.id
+        self.user.delete()
+        self.assertEqual(
+            set(BookTombstone.objects.filter(user_id=user_id).values_list('book_id', flat=True)),
+            {book.id for book in self.books},
+        )
+
+    def test_sync_uses_indexes(self):
+        """Test that an incremental sync seeks the updated_at and tombstone indexes"""
+        cursor = self.sync()['next']
+        with self.assertIndexedQueries():
+            self.sync(cursor)
+
+    def test_expired_cursor(self):
+        """Test that cursors older than the tombstone retention are rejected"""
+        cursor = self.sync()['next']
+        later = timezone.now() + datetime.timedelta(days=31)
+        with mock.patch('books.sync.timezone.now', return_value=later):
+            response = self.client.get(reverse('book-changes'), {'since': cursor})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        response = self.client.get(reverse('book-changes'), {'since': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_compact_command(self):
+        """Test that compaction removes only old tombstones"""
+        BookTombstone.objects.create(user_id=self.user.id, book_id=1)
+        old = BookTombstone.objects.create(user_id=self.user.id, book_id=2)
+        BookTombstone.objects.filter(id=old.id).update(deleted_at=timezone.now() - datetime.timedelta(days=40))
+        call_command('compact_tombstones', stdout=StringIO())
+        self.assertEqual(list(BookTombstone.objects.values_list('book_id', flat=True)), [1])
+
+class ReadingProgressWriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        cls.other_user = User.objects.create_user(username='other', password='password123')
+        cls.books = []
+        for index in range(3):
+            book = Book.objects.create(title=f'Book {index}', author='Author', genre='Fiction', pages=300, user=cls.user)
+            ReadingProgress.objects.create(book=book, current_page=10)
+            cls.books.append(book)
+        cls.other_book = Book.objects.create(title='Other', author='Author', genre='Fiction', user=cls.other_user)
+        ReadingProgress.objects.create(book=cls.other_book, current_page=10)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def page(self, book):
+        return ReadingProgress.objects.get(book=book).current_page
+
+    def advance(self, book, current_page):
+        return self.client.post(reverse('reading-progress-advance', args=[book.id]), {'current_page': current_page}, format='json')
+
+    def test_advance_moves_forward_only(self):
+        """Test that advancing is one conditional UPDATE and never moves backwards"""
+        version = LibraryVersion.objects.current(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.advance(self.books[0], 50)
+        self.assertEqual(response.data, {'advanced': True, 'current_page': 50})
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "books_readingprogress"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"current_page" < ', updates[0])
+        self.assertFalse([q for q in queries if q['sql'].startswith('SELECT "books_readingprogress"')])
+        self.assertGreater(LibraryVersion.objects.current(self.user), version)
+
+        response = self.advance(self.books[0], 20)
+        self.assertEqual(response.data['advanced'], False)
+        self.assertEqual(self.page(self.books[0]), 50)
+
+    def test_advance_other_users_book(self):
+        """Test that advancing another user's progress is not found"""
+        response = self.advance(self.other_book, 50)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.page(self.other_book), 10)
+
+    def test_patch_writes_changed_columns(self):
+        """Test that a progress PATCH only writes the changed columns"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(reverse('reading-progress', args=[self.books[0].id]), {'current_page': 42}, format='json')
+        update = next(q['sql'] for q in queries if q['sql'].startswith('UPDATE "books_readingprogress"'))
+        self.assertNotIn('"notes"', update)
+        self.assertEqual(self.page(self.books[0]), 42)
+
+    def test_batch_coalesces_events(self):
+        """Test that batched events keep the latest per book in one UPDATE"""
+        now = timezone.now()
+        ReadingProgress.objects.update(updated_at=now - datetime.timedelta(hours=1))
+        events = [
+            {'book_id': self.books[0].id, 'current_page': 30, 'timestamp': now - datetime.timedelta(minutes=2)},
+            {'book_id': self.books[0].id, 'current_page': 25, 'timestamp': now - datetime.timedelta(minutes=1)},
+            {'book_id': self.books[1].id, 'current_page': 99, 'timestamp': now - datetime.timedelta(days=1)},
+            {'book_id': self.books[2].id, 'current_page': 60},
+            {'book_id': self.other_book.id, 'current_page': 60},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('reading-progress-batch'), {'events': events}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(
+            {result['book_id']: result['status'] for result in response.data['results']},
+            {self.books[0].id: 'updated', self.books[1].id: 'stale',
+             self.books[2].id: 'updated', self.other_book.id: 'not_found'},
+        )
+        updates = [q for q in queries if q['sql'].startswith('UPDATE "books_readingprogress"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual([self.page(book) for book in self.books], [25, 10, 60])
+        self.assertEqual(self.page(self.other_book), 10)
+
+        # Replaying timestamped events changes nothing
+        response = self.client.post(reverse('reading-progress-batch'), {'events': events[:3]}, format='json')
+        self.assertEqual(response.data['updated'], 0)
+
+class ReadingLogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('book-list'), {
+            'title': 'Dune', 'author': 'Frank Herbert', 'genre': 'Science Fiction', 'pages': 400,
+            'reading_progress': {'current_page': 10},
+        }, format='json')
+        self.book_id = response.data['id']
+
+    def roll_up(self):
+        call_command('roll_up_reading', stdout=StringIO())
+
+    def move_events(self, days_ago):
+        """Pretend the unprocessed events happened some days ago"""
+        ReadingEvent.objects.filter(id__gt=self.processed).update(
+            occurred_at=timezone.now() - datetime.timedelta(days=days_ago)
+        )
+        self.processed = ReadingEvent.objects.order_by('-id').values_list('id', flat=True).first()
+
+    def test_progress_endpoints_append_events(self):
+        """Test that every progress write path appends to the reading log"""
+        self.client.patch(reverse('reading-progress', args=[self.book_id]), {'current_page': 30}, format='json')
+        self.client.post(reverse('reading-progress-advance', args=[self.book_id]), {'current_page': 45}, format='json')
+        self.client.post(reverse('reading-progress-batch'), {'events': [
+            {'book_id': self.book_id, 'current_page': 50},
+        ]}, format='json')
+        self.assertEqual(
+            list(ReadingEvent.objects.order_by('id').values_list('previous_page', 'page')),
+            [(None, 10), (10, 30), (None, 45), (45, 50)],
+        )
+
+    def test_rollups_and_stats(self):
+        """Test that rollups count pages per day and the stats endpoint reads them"""
+        self.processed = 0
+        self.client.patch(reverse('reading-progress', args=[self.book_id]), {'current_page': 40}, format='json')
+        self.move_events(days_ago=2)
+        self.client.post(reverse('reading-progress-advance', args=[self.book_id]), {'current_page': 60}, format='json')
+        self.move_events(days_ago=1)
+        self.roll_up()
+        self.client.post(reverse('reading-progress-advance', args=[self.book_id]), {'current_page': 65}, format='json')
+        # Rolling up twice in a row must not count anything twice
+        self.roll_up()
+        self.roll_up()
+
+        daily = dict(DailyReadingRollup.objects.values_list('day', 'pages_read'))
+        today = timezone.localdate()
+        self.assertEqual(daily, {
+            today - datetime.timedelta(days=2): 30,
+            today - datetime.timedelta(days=1): 20,
+            today: 5,
+        })
+        self.assertEqual(sum(WeeklyReadingRollup.objects.values_list('pages_read', flat=True)), 55)
+
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('reading-stats'), {'days': 7})
+        self.assertEqual(response.data['total_pages_read'], 55)
+        self.assertEqual(response.data['current_streak'], 3)
+        self.assertEqual(response.data['longest_streak'], 3)
+        self.assertEqual([row['pages_read'] for row in response.data['daily']], [30, 20, 5])
+
+    def test_late_events_fill_gaps(self):
+        """Test that an event committed below the checkpoint is rolled up, once"""
+        self.client.patch(reverse('reading-progress', args=[self.book_id]), {'current_page': 20}, format='json')
+        self.client.patch(reverse('reading-progress', args=[self.book_id]), {'current_page': 30}, format='json')
+        late = ReadingEvent.objects.get(page=20)
+        late_id = late.id
+        late.delete()
+        self.roll_up()
+        self.assertEqual(RollupCheckpoint.objects.get().gaps[0][:2], [late_id, late_id])
+
+        # The transaction holding the missing id commits after the roll up
+        late.id = late_id
+        late.save()
+        self.roll_up()
+        self.roll_up()
+        self.assertEqual(RollupCheckpoint.objects.get().gaps, [])
+        self.assertEqual(sum(DailyReadingRollup.objects.values_list('pages_read', flat=True)), 20)
+
+    def test_roll_up_looks_up_predecessors_together(self):
+        """Test that events without a previous page do not cost a query each"""
+        books = [Book.objects.create(title=f'Book {index}', author='Author', user=self.user).id for index in range(5)]
+        now = timezone.now()
+        for page in (10, 15):
+            record_events(self.user.pk, [(book_id, None, page, now) for book_id in books])
+            with CaptureQueriesContext(connection) as queries:
+                self.roll_up()
+            reads = [query for query in queries if 'FROM "books_readingevent"' in query['sql']]
+            self.assertEqual(len(reads), 2)
+        self.assertEqual(sum(DailyReadingRollup.objects.filter(book_id__in=books).values_list('pages_read', flat=True)), 25)
+
+class LibraryStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        # (genre, pages, current_page, currently reading)
+        cases = [
+            ('Fiction', 100, 29, True), ('Fiction', 3, 1, False), ('History', 200, 500, False),
+            ('History', None, 10, True), ('Poetry', 0, 10, False), ('Poetry', 57, 57, False),
+        ]
+        for index, (genre, pages, current_page, reading) in enumerate(cases):
+            book = Book.objects.create(
+                title=f'Book {index}', author='Author', genre=genre, pages=pages,
+                is_currently_reading=reading, user=cls.user
+            )
+            ReadingProgress.objects.create(book=book, current_page=current_page)
+        Book.objects.create(title='No progress', author='Author', genre='Poetry', pages=10, user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_stats_match_python_properties(self):
+        """Test that the SQL aggregate agrees with the model properties"""
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('book-stats'))
+        books = list(Book.objects.filter(user=self.user).select_related('reading_progress'))
+        percentages = [
+            book.reading_progress.percentage_complete if hasattr(book, 'reading_progress') else 0
+            for book in books
+        ]
+        data = response.data
+        self.assertEqual(data['books'], 7)
+        self.assertEqual(data['currently_reading'], 2)
+        self.assertEqual(data['total_pages'], 370)
+        self.assertEqual(data['pages_read'], 29 + 1 + 200 + 10 + 0 + 57)
+        self.assertEqual(data['finished'], 2)
+        self.assertEqual(data['average_completion'], round(sum(percentages) / 7, 1))
+        self.assertEqual(
+            [(genre['genre'], genre['books']) for genre in data['genres']],
+            [('Fiction', 2), ('History', 2), ('Poetry', 3)],
+        )
+
+    def test_stats_cached_until_write(self):
+        """Test that stats are served from cache and refreshed after a write"""
+        self.client.get(reverse('book-stats'))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('book-stats'))
+        Book.objects.create(title='New', author='Author', genre='Fiction', pages=50, user=self.user)
+        response = self.client.get(reverse('book-stats'))
+        self.assertEqual(response.data['books'], 8)
+
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        cls.other_user = User.objects.create_user(username='other', password='password123')
+        Book.objects.create(title='Dune', author='Frank Herbert', genre='Science Fiction',
+                            is_currently_reading=True, user=cls.user)
+
+    def setUp(self):
+        response_cache().clear()
+        registry.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_reads_cached_until_write(self):
+        """Test that repeated reads only look up the version until the library changes"""
+        for url in [reverse('book-list'), reverse('currently-reading'), reverse('book-genres')]:
+            first = self.client.get(url)
+            with self.assertNumQueries(1):
+                second = self.client.get(url)
+            self.assertEqual(second.status_code, status.HTTP_200_OK)
+            self.assertEqual(second.data, first.data)
+        Book.objects.create(title='Emma', author='Jane Austen', genre='Romance', is_currently_reading=True, user=self.user)
+        self.assertEqual(self.client.get(reverse('book-list')).data['count'], 2)
+        self.assertEqual(len(self.client.get(reverse('currently-reading')).data), 2)
+        self.assertIn('Romance', self.client.get(reverse('book-genres')).data['genres'])
+
+    def test_key_normalizes_query_and_separates_users(self):
+        """Test that parameter order shares an entry but other users and filters do not"""
+        url = reverse('book-list')
+        self.client.get(url + '?ordering=title&genre=Science+Fiction')
+        with self.assertNumQueries(1):
+            self.client.get(url + '?genre=Science+Fiction&ordering=title')
+        self.assertEqual(self.client.get(url, {'genre': 'Romance'}).data['count'], 0)
+        self.client.force_authenticate(user=self.other_user)
+        self.assertEqual(self.client.get(url + '?ordering=title&genre=Science+Fiction').data['count'], 0)
+
+    def test_hit_and_miss_counters(self):
+        """Test that lookups are counted per endpoint and cache sizes are exposed"""
+        for _ in range(3):
+            self.client.get(reverse('book-genres'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('readily_reads_response_cache_lookups_total{endpoint="book-genres",result="hit"} 2', body)
+        self.assertIn('readily_reads_response_cache_lookups_total{endpoint="book-genres",result="miss"} 1', body)
+        self.assertIn('readily_reads_cache_entries{cache="responses"} 1', body)
+
+    def test_lru_eviction_by_size(self):
+        """Test that the memory cache evicts least recently used entries past its size bound"""
+        lru = MemoryLRUCache('test-lru', {'OPTIONS': {'MAX_BYTES': 2500}})
+        lru.clear()
+        for key in 'abc':
+            lru.set(key, 'x' * 500)
+        lru.get('a')
+        lru.set('d', 'x' * 500)
+        self.assertEqual([key for key in 'abcd' if lru.has_key(key)], ['a', 'c', 'd'])
+        info = lru.info()
+        self.assertLessEqual(info['bytes'], 2500)
+        self.assertEqual(info['evictions'], 1)
+        # Entries larger than the whole cache are never stored
+        lru.set('big', 'x' * 5000)
+        self.assertIsNone(lru.get('big'))
+        self.assertEqual(lru.info()['entries'], 3)
+
+class PercentageCompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        cls.admin = User.objects.create_superuser(username='admin', password='password123')
+        # (pages, current_page) pairs covering rounding, overflow and no pages
+        cases = [(100, 95), (3, 1), (200, 500), (None, 10), (0, 10), (57, 0), (10, 9), (80, 40)]
+        for index, (pages, current_page) in enumerate(cases):
+            book = Book.objects.create(title=f'Book {index}', author='Author', genre='Fiction',
+                                       pages=pages, user=cls.user)
+            ReadingProgress.objects.create(book=book, current_page=current_page)
+        Book.objects.create(title='No progress', author='Author', genre='Fiction', pages=10, user=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        books = Book.objects.filter(user=self.user).select_related('reading_progress')
+        self.percentages = {
+            book.id: book.reading_progress.percentage_complete if hasattr(book, 'reading_progress') else 0
+            for book in books
+        }
+
+    def test_annotation_matches_property(self):
+        """Test that the SQL annotation agrees with the model property"""
+        annotated = dict(Book.objects.with_percentage_complete().values_list('id', 'percentage_complete'))
+        self.assertEqual(annotated, self.percentages)
+
+    def test_progress_filters(self):
+        """Test that min_progress and max_progress are inclusive bounds"""
+        response = self.client.get(reverse('book-list'), {'min_progress': 90, 'max_progress': 99})
+        expected = {book_id for book_id, percentage in self.percentages.items() if 90 <= percentage <= 99}
+        self.assertEqual({book['id'] for book in response.data['results']}, expected)
+        self.assertEqual(len(expected), 2)
+        response = self.client.get(reverse('book-list'), {'min_progress': 'lots', 'max_progress': 101})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {'min_progress'})
+
+    def test_ordering(self):
+        """Test ordering by completion with page numbers and with cursors"""
+        expected = sorted(self.percentages, key=lambda book_id: (-self.percentages[book_id], -book_id))
+        response = self.client.get(reverse('book-list'), {'ordering': '-percentage_complete'})
+        percentages = [self.percentages[book['id']] for book in response.data['results']]
+        self.assertEqual(percentages, sorted(percentages, reverse=True))
+
+        url, params, ids = reverse('book-list'), {'pagination': 'cursor', 'ordering': '-percentage_complete', 'page_size': 4}, []
+        while url:
+            response = self.client.get(url, params)
+            ids.extend(book['id'] for book in response.data['results'])
+            url, params = response.data['next'], None
+        self.assertEqual(ids, expected)
+
+    def test_admin_changelist(self):
+        """Test that the admin lists, sorts and filters by completion in one query"""
+        self.client.force_login(self.admin)
+        url = reverse('admin:books_readingprogress_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'o': '-3', 'completion': 'almost_finished'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [progress.completion for progress in response.context['cl'].result_list], [95, 90],
+        )
+        # Books are joined in rather than fetched row by row
+        self.assertFalse([query for query in queries if 'WHERE "books_book"."id" =' in query['sql']])
+
+class LargeTableAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='password123')
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        for index in range(7):
+            book = Book.objects.create(title=f'Book {index % 3}', author='Author', genre='Fiction',
+                                       pages=100, user=cls.user)
+            ReadingProgress.objects.create(book=book, current_page=index * 10)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:books_book_changelist')
+
+    def walk(self, url, params):
+        """Follow next page links and return the ids and SQL of every page"""
+        ids, queries = [], []
+        while url:
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            cl = response.context['cl']
+            self.assertTrue(cl.keyset)
+            ids.extend(row.pk for row in cl.result_list)
+            queries.extend(query['sql'] for query in captured)
+            url, params = cl.next_page_url and self.url + cl.next_page_url, None
+        return ids, queries
+
+    @mock.patch('books.admin.BookAdmin.list_per_page', 3)
+    def test_keyset_pages(self):
+        """Test that the changelist seeks through every book without OFFSET"""
+        ids, queries = self.walk(self.url, {})
+        self.assertEqual(ids, list(Book.objects.order_by('-pk').values_list('pk', flat=True)))
+        self.assertFalse([sql for sql in queries if 'OFFSET' in sql])
+        self.assertFalse([sql for sql in queries if 'COUNT(*)' in sql and 'LIMIT' not in sql])
+
+        ids, _ = self.walk(self.url, {'o': '1'})
+        self.assertEqual(ids, list(Book.objects.order_by('title', 'pk').values_list('pk', flat=True)))
+
+        response = self.client.get(self.url, {'p': 'not-a-cursor'})
+        self.assertRedirects(response, self.url + '?e=1', fetch_redirect_response=False)
+
+    @mock.patch('books.pagination.EstimatedCountPaginator.exact_count_limit', 5)
+    def test_estimated_counts(self):
+        """Test that counts stop at the limit and use table statistics when present"""
+        paginator = EstimatedCountPaginator(Book.objects.order_by('pk'), 3)
+        self.assertEqual((paginator.count, paginator.count_is_lower_bound), (5, True))
+        paginator = EstimatedCountPaginator(Book.objects.filter(title='Book 0').order_by('pk'), 3)
+        self.assertEqual((paginator.count, paginator.count_is_lower_bound), (3, False))
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE books_book')
+            paginator = EstimatedCountPaginator(Book.objects.order_by('pk'), 3)
+            self.assertEqual((paginator.count, paginator.count_is_estimate), (7, True))
+
+    @mock.patch('books.admin.BookAdmin.action_chunk_size', 2)
+    def test_chunked_actions(self):
+        """Test that bulk actions update every selected book and the derived tables"""
+        version = LibraryVersion.objects.current(self.user)
+        response = self.client.post(self.url, {
+            'action': 'mark_reading', 'select_across': '1', helpers.ACTION_CHECKBOX_NAME: ['0'],
+        })
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(Book.objects.filter(is_currently_reading=True).count(), 7)
+        self.assertGreater(LibraryVersion.objects.current(self.user), version)
+
+        selected = list(Book.objects.order_by('pk').values_list('pk', flat=True)[:3])
+        self.client.post(self.url, {
+            'action': 'reassign_genre', 'genre': 'History', 'select_across': '0',
+            helpers.ACTION_CHECKBOX_NAME: selected,
+        })
+        self.assertEqual(set(Book.objects.filter(genre='History').values_list('pk', flat=True)), set(selected))
+        self.assertEqual(
+            dict(GenreCount.objects.filter(user=self.user).values_list('genre', 'book_count')),
+            {'Fiction': 4, 'History': 3},
+        )
+        response = self.client.post(self.url, {
+            'action': 'reassign_genre', 'genre': '', 'select_across': '0',
+            helpers.ACTION_CHECKBOX_NAME: selected,
+        }, follow=True)
+        self.assertContains(response, 'Enter the genre')
+
+class LoadTestTests(TestCase):
+    def test_seed_and_load_test(self):
+        """Test that seeded users can drive the load test and get a full report"""
+        output = StringIO()
+        call_command('seed_library', users=2, mean_books=20, prefix='load', password='secret-pass', stdout=output)
+        seeded = json.loads(output.getvalue())
+        self.assertEqual(seeded['users'], 2)
+        self.assertEqual(Book.objects.filter(user__username__startswith='load-').count(), seeded['books'])
+        self.assertEqual(ReadingProgress.objects.count(), seeded['books'])
+        self.assertEqual(
+            sum(GenreCount.objects.values_list('book_count', flat=True)), seeded['books'],
+        )
+
+        output = StringIO()
+        call_command('loadtest', requests=40, prefix='load', password='secret-pass',
+                     mix='list=2,search=1,progress=2,genres=1', stdout=output)
+        report = json.loads(output.getvalue())
+        self.assertEqual(report['overall']['requests'], 40)
+        self.assertEqual(report['overall']['errors'], 0)
+        self.assertEqual(set(report['endpoints']), {'login', 'list', 'search', 'progress', 'genres'})
+        for endpoint in report['endpoints'].values():
+            self.assertLessEqual(endpoint['p50_ms'], endpoint['p95_ms'])
+            self.assertLessEqual(endpoint['p95_ms'], endpoint['p99_ms'])
+
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        Book.objects.create(title='Dune', author='Frank Herbert', genre='Science Fiction', pages=412, user=cls.user)
+
+    def setUp(self):
+        registry.reset()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING='all')
+    def test_server_timing_header(self):
+        """Test that timed responses report SQL, authentication and serialization"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('book-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        for phase in ('total', 'auth', 'serialize', 'app'):
+            self.assertRegex(timing, rf'(^|, ){phase};dur=[0-9.]+')
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING='staff')
+    def test_server_timing_for_staff_only(self):
+        """Test that only staff users see Server-Timing, while every request is recorded"""
+        self.assertFalse(self.client.get(reverse('book-list')).has_header('Server-Timing'))
+        self.user.is_staff = True
+        self.user.save()
+        self.assertTrue(self.client.get(reverse('book-list')).has_header('Server-Timing'))
+        self.assertIn(
+            'readily_reads_request_phase_seconds_count{view="book-list",method="GET",phase="total"} 2',
+            registry.render(),
+        )
+
+    def test_metrics_endpoint(self):
+        """Test that the metrics endpoint exposes per-view histograms"""
+        self.client.get(reverse('book-list'))
+        self.client.get(reverse('book-list'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('# TYPE readily_reads_request_phase_seconds histogram', body)
+        self.assertIn(
+            'readily_reads_request_phase_seconds_count{view="book-list",method="GET",phase="total"} 2', body,
+        )
+        self.assertIn('readily_reads_request_queries_bucket{view="book-list",method="GET",le="+Inf"} 2', body)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests(self):
+        """Test that requests outside the sample are neither timed nor recorded"""
+        response = self.client.get(reverse('book-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(registry.durations, {})
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite connection tuning')
+class SQLiteTuningTests(TestCase):
+    def test_connection_pragmas(self):
+        """Test that new connections get the tuned pragmas and take the write lock up front"""
+        with connection.cursor() as cursor:
+            for pragma, expected in (('synchronous', 1), ('busy_timeout', 5000), ('temp_store', 2)):
+                cursor.execute(f'PRAGMA {pragma}')
+                self.assertEqual(cursor.fetchone()[0], expected, pragma)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+        self.assertTrue(connection.settings_dict['CONN_HEALTH_CHECKS'])
+
+
+@skipUnless(orjson is not None, 'orjson is not installed')
+class ORJSONTests(TestCase):
+    def test_renderer_matches_drf(self):
+        """Test that ORJSONRenderer renders the same bytes as JSONRenderer"""
+        moment = datetime.datetime(2024, 2, 29, 13, 4, 5, 123456, tzinfo=datetime.timezone.utc)
+        values = [
+            moment, moment.replace(microsecond=0), moment.astimezone(datetime.timezone(datetime.timedelta(hours=5))),
+            datetime.datetime(2024, 1, 2, 3, 4, 5, 678901), datetime.date(2024, 2, 29),
+            datetime.time(1, 2, 3, 456789), datetime.timedelta(days=1, seconds=5), Decimal('1.10'),
+            uuid.UUID(int=1), gettext_lazy('Genre'), ErrorDetail('Not found.', code='not_found'),
+            'caf\u00e9 \u2028\u2029 \U0001f4da "quoted" \\ \n\x00', [0.1, 33.3, -0.0, 2 ** 63 - 1, True, None],
+            (1, 2), {'nested': {'list': [{}]}}, 2 ** 70, {1: 'one'},
+        ]
+        for value in values:
+            with self.subTest(value=value):
+                data = {'value': value}
+                self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        indented = 'application/json; indent=4'
+        self.assertEqual(ORJSONRenderer().render(values[:3], indented), JSONRenderer().render(values[:3], indented))
+
+    def test_api_responses_match_drf(self):
+        """Test that book responses are rendered like JSONRenderer would"""
+        user = User.objects.create_user(username='reader', password='password123')
+        book = Book.objects.create(title='Dune \u2013 Part I', author='Frank Herbert', genre='Science Fiction',
+                                   pages=412, publication_date=datetime.date(1965, 8, 1), user=user)
+        ReadingProgress.objects.create(book=book, current_page=100)
+        client = APIClient()
+        client.force_authenticate(user=user)
+        for url in [reverse('book-list'), reverse('book-detail', args=[book.id]), reverse('book-genres')]:
+            response = client.get(url)
+            self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_parser_matches_drf(self):
+        """Test that ORJSONParser returns the same data and errors as JSONParser"""
+        bodies = [
+            b'{"title": "Dune", "pages": 412, "ratio": 1.5, "tags": ["a", null, true]}',
+            b'{"id": 18446744073709551616}', '{"title": "caf\u00e9"}'.encode(), b'"\\ud800"', b'{bad', b'NaN',
+        ]
+        for body in bodies:
+            with self.subTest(body=body):
+                results = []
+                for parser in (JSONParser(), ORJSONParser()):
+                    try:
+                        results.append(parser.parse(BytesIO(body)))
+                    except ParseError as error:
+                        results.append(str(error))
+                # repr() tells 2 ** 64 from the float it would be rounded to
+                self.assertEqual(repr(results[0]), repr(results[1]))
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_PRIMARY_PIN_SECONDS=10)
+class ReplicaRoutingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='password123')
+        cls.book = Book.objects.create(title='Dune', author='Frank Herbert', pages=412, user=cls.user)
+        ReadingProgress.objects.create(book=cls.book, current_page=10)
+
+    def setUp(self):
+        pin_cache().clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    @contextmanager
+    def replica_reads(self):
+        """Record the reads routed to the replica, running them on the test database"""
+        reads = []
+        with mock.patch.object(PrimaryReplicaRouter, 'pick_replica', autospec=True,
+                               side_effect=lambda router, replicas: reads.append(replicas) or 'default'):
+            yield reads
+
+    def test_router(self):
+        """Test that reads go to a replica only when allowed, and writes to the primary"""
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_write(Book), 'default')
+        with self.replica_reads() as reads:
+            router.db_for_read(Book)
+            self.assertEqual(reads, [])
+            with reads_on_primary(False):
+                self.assertEqual(router.db_for_read(Book), 'default')
+                self.assertEqual(reads, [['replica']])
+                with reads_on_primary():
+                    router.db_for_read(Book)
+        self.assertEqual(len(reads), 1)
+        self.assertFalse(router.allow_migrate('replica', 'books'))
+        self.assertIsNone(router.allow_migrate('default', 'books'))
+        with override_settings(DATABASE_REPLICAS=[]), reads_on_primary(False):
+            self.assertEqual(router.db_for_read(Book), 'default')
+
+    def test_read_your_writes(self):
+        """Test that reads go to replicas until the user writes, then stay on the primary"""
+        url = reverse('book-list')
+        with self.replica_reads() as reads:
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.assertTrue(reads)
+
+        with self.replica_reads() as reads:
+            response = self.client.patch(
+                reverse('reading-progress', args=[self.book.pk]), {'current_page': 50}, format='json',
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(reads, [])
+
+        # Once the pin expires, reads go back to the replicas
+        pin_cache().clear()
+        with self.replica_reads() as reads:
+            self.client.get(url)
+        self.assertTrue(reads)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Uses a second SQLite database as a shard')
+@override_settings(BOOKS_SHARDS=['default', 'shard_test'])
+class ShardingTests(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # A throwaway database added once the test databases are set up
+        cls.shard_file = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False)
+        connections.settings['shard_test'] = connections.configure_settings({
+            'default': {}, 'shard_test': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': cls.shard_file.name},
+        })['shard_test']
+        cls.databases = {*cls.databases, 'shard_test'}
+        with override_settings(BOOKS_SHARDS=['default', 'shard_test']):
+            call_command('migrate', database='shard_test', verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['shard_test'].close()
+        del connections['shard_test']
+        del connections.settings['shard_test']
+        os.unlink(cls.shard_file.name)
+        super().tearDownClass()
+
+    def setUp(self):
+        # Users and library versions are numbered again after each test
+        response_cache().clear()
+        self.user = User.objects.create_user(username='reader', password='password123')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def tearDown(self):
+        # Deleting the user clears its library on every shard
+        self.user.delete()
+        self.assertFalse(Book.objects.using('shard_test').exists())
+
+    def create_book(self, title):
+        response = self.client.post(reverse('book-list'), {
+            'title': title, 'author': 'Author', 'genre': 'Fiction', 'pages': 200,
+            'reading_progress': {'current_page': 20},
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.content)
+        return response.data['id']
+
+    def library(self, alias):
+        return set(Book.objects.using(alias).filter(user_id=self.user.pk).values_list('title', flat=True))
+
+    def test_requests_use_the_user_shard(self):
+        """Test that a user's books are written to and read from their own shard"""
+        move_library(self.user.pk, 'shard_test', grace=0)
+        book_id = self.create_book('Dune')
+        self.assertEqual(self.library('shard_test'), {'Dune'})
+        self.assertEqual(self.library('default'), set())
+        self.assertGreaterEqual(book_id, 1 << 40)
+        self.assertEqual(GenreCount.objects.using('shard_test').get(user_id=self.user.pk).book_count, 1)
+
+        response = self.client.get(reverse('book-list'))
+        self.assertEqual([book['title'] for book in response.data['results']], ['Dune'])
+        response = self.client.patch(reverse('reading-progress', args=[book_id]), {'current_page': 50}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(ReadingProgress.objects.using('shard_test').get(book_id=book_id).current_page, 50)
+
+    def test_signup_places_the_user(self):
+        """Test that new users get a shard with their library version on it, and deletion leaves tombstones there"""
+        with mock.patch('books.sharding.hashed_shard', return_value='shard_test'):
+            user = User.objects.create_user(username='newcomer', password='password123')
+        self.assertEqual(find_assignment(user.pk).shard, 'shard_test')
+        self.assertTrue(LibraryVersion.objects.using('shard_test').filter(user_id=user.pk).exists())
+        self.assertFalse(LibraryVersion.objects.using('default').filter(user_id=user.pk).exists())
+
+        self.client.force_authenticate(user=user)
+        book_id, user_id = self.create_book('Dune'), user.pk
+        user.delete()
+        self.assertEqual(list(BookTombstone.objects.using('shard_test').values_list('book_id', flat=True)), [book_id])
+        self.assertFalse(GenreCount.objects.using('shard_test').filter(user_id=user_id).exists())
+        self.assertFalse(LibraryVersion.objects.using('shard_test').filter(user_id=user_id).exists())
+
+    def test_routing_has_no_side_effects(self):
+        """Test that serving a user without an assignment does not create one"""
+        ShardAssignment.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.get(reverse('book-list')).status_code, status.HTTP_200_OK)
+        self.assertEqual(shard_for_user(self.user.pk), 'default')
+        self.assertIsNone(find_assignment(self.user.pk))
+
+    def test_import_command_uses_the_user_shard(self):
+        """Test that the import command writes to the user's shard"""
+        move_library(self.user.pk, 'shard_test', grace=0)
+        stdin = BytesIO(b'title,author,genre\nDune,Frank Herbert,Science Fiction\n')
+        with mock.patch('sys.stdin', mock.Mock(buffer=stdin)):
+            call_command('import_books', '-', username='reader', format='csv', stdout=StringIO())
+        self.assertEqual(self.library('shard_test'), {'Dune'})
+        self.assertEqual(self.library('default'), set())
+        self.assertEqual(self.client.get(reverse('book-list')).data['count'], 1)
+
+    def test_export_command_covers_every_shard(self):
+        """Test that the export command reads every shard and the real usernames"""
+        move_library(self.user.pk, 'shard_test', grace=0)
+        self.create_book('Dune')
+        stdout = StringIO()
+        call_command('export_books', stdout=stdout)
+        books = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([(book['title'], book['username']) for book in books], [('Dune', 'reader')])
+
+    def test_admin_browses_shards(self):
+        """Test that the book admin lists, opens and exports books on the chosen shard"""
+        move_library(self.user.pk, 'shard_test', grace=0)
+        book_id = self.create_book('Dune')
+        admin_user = User.objects.create_superuser(username='admin', password='password123')
+        self.client.force_login(admin_user)
+        url = reverse('admin:books_book_changelist')
+
+        self.assertEqual(list(self.client.get(url).context['cl'].result_list), [])
+        rows = self.client.get(url, {'shard': 'shard_test'}).context['cl'].result_list
+        self.assertEqual([(book.title, book.owner_username) for book in rows], [('Dune', 'reader')])
+        change_url = reverse('admin:books_book_change', args=[book_id])
+        response = self.client.get(change_url, {'_changelist_filters': 'shard=shard_test'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post(url + '?shard=shard_test', {
+            'action': 'export_ndjson', 'select_across': '1', helpers.ACTION_CHECKBOX_NAME: ['0'],
+        })
+        books = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(book['id'], book['username']) for book in books], [(book_id, 'reader')])
+
+    def test_move_library(self):
+        """Test that a library moves between shards with its ids, counts and reading history"""
+        move_library(self.user.pk, 'default', grace=0)
+        first, second = self.create_book('Dune'), self.create_book('Emma')
+        self.client.patch(reverse('reading-progress', args=[first]), {'current_page': 80}, format='json')
+        cursor = self.client.get(reverse('book-changes')).data['next']
+
+        copied = move_library(self.user.pk, 'shard_test', grace=0)
+        self.assertEqual(copied['books'], 2)
+        self.assertEqual(self.library('shard_test'), {'Dune', 'Emma'})
+        self.assertEqual(self.library('default'), set())
+        self.assertEqual(shard_for_user(self.user.pk), 'shard_test')
+
+        response = self.client.get(reverse('book-list'))
+        self.assertEqual({book['id'] for book in response.data['results']}, {first, second})
+        self.assertEqual(self.client.get(reverse('book-genres')).data['counts']['Fiction'], 2)
+        self.assertEqual(
+            self.client.get(reverse('book-changes'), {'since': cursor}).status_code, status.HTTP_410_GONE,
+        )
+        self.assertEqual(ReadingEvent.objects.using('shard_test').filter(user_id=self.user.pk).count(), 3)
+        with use_shard('shard_test'):
+            roll_up_events()
+            self.assertEqual(
+                DailyReadingRollup.objects.filter(user_id=self.user.pk, book_id=first).get().pages_read, 60,
+            )
+
+        # Writes are refused while a library is being moved
+        ShardAssignment.objects.filter(user=self.user).update(moving=True)
+        response = self.client.patch(reverse('reading-progress', args=[first]), {'current_page': 90}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(self.client.get(reverse('book-list')).status_code, status.HTTP_200_OK)
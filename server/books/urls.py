@@ -6,19 +6,45 @@ from .views import BookViewSet, ReadingProgressViewSet
 router = DefaultRouter()
 router.register(r'', BookViewSet, basename='book')
 
+# The router's detail route matches any single path segment, so the named
+# routes must come before it
 urlpatterns = [
-    # Main book CRUD routes
-    path('', include(router.urls)),
-    
     # Currently reading books
     path('currently-reading/', BookViewSet.as_view({'get': 'currently_reading'}), name='currently-reading'),
     
     # Get all genres
     path('genres/', BookViewSet.as_view({'get': 'genres'}), name='book-genres'),
     
+    # Library statistics
+    path('stats/', BookViewSet.as_view({'get': 'stats'}), name='book-stats'),
+    
+    # Reading statistics from the daily and weekly rollups
+    path('reading-stats/', BookViewSet.as_view({'get': 'reading_stats'}), name='reading-stats'),
+    
+    # Delta sync for offline clients
+    path('changes/', BookViewSet.as_view({'get': 'changes'}), name='book-changes'),
+    
+    # Batch updates and deletes
+    path('batch/', BookViewSet.as_view({'patch': 'batch_update'}), name='book-batch'),
+    path('batch/delete/', BookViewSet.as_view({'post': 'batch_delete'}), name='book-batch-delete'),
+    
+    # Streaming export as NDJSON or CSV. Routes declared here do not pick up
+    # the @action options, so the renderers are passed in explicitly.
+    path('export/', BookViewSet.as_view({'get': 'export'}, **BookViewSet.export.kwargs), name='book-export'),
+    
+    # Bulk import from CSV, NDJSON or Goodreads exports
+    path('import/', BookViewSet.as_view({'post': 'import_books'}, **BookViewSet.import_books.kwargs), name='book-import'),
+    
     # Toggle reading status
     path('<int:pk>/toggle-reading/', BookViewSet.as_view({'patch': 'toggle_reading'}), name='toggle-reading'),
     
+    # Batched reading progress events from reader devices
+    path('progress/batch/', ReadingProgressViewSet.as_view({'post': 'batch'}), name='reading-progress-batch'),
+    
     # Reading progress routes (nested under a book)
     path('<int:book_pk>/progress/', ReadingProgressViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update'}), name='reading-progress'),
+    path('<int:book_pk>/progress/advance/', ReadingProgressViewSet.as_view({'post': 'advance'}), name='reading-progress-advance'),
+    
+    # Main book CRUD routes
+    path('', include(router.urls)),
 ]
\ No newline at end of file
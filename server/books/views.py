@@ -1,30 +1,61 @@
-from rest_framework import viewsets, status, filters, generics
+from django.http import StreamingHttpResponse
+from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
-from .models import Book, ReadingProgress
-from .serializers import BookSerializer, ReadingProgressSerializer, GenreSerializer
+from .models import Book, GenreCount, ReadingProgress
+from .serializers import (
+    BookSerializer, ReadingProgressSerializer, GenreSerializer,
+    BookBatchUpdateSerializer, BookBatchDeleteSerializer,
+    ProgressAdvanceSerializer, ProgressBatchSerializer,
+)
+from .batch import update_books, delete_books
+from .progress import advance_progress, ingest_progress_events
+from .reading_log import reading_stats, record_event
 from .permissions import IsBookOwner
+from .conditional import conditional_on_library
+from .filters import BookSearchFilter, BookProgressFilter, BookOrderingFilter
+from .exporters import CONTENT_TYPES, export_books
+from .importers import BookImporter, ImportFormatError, detect_format
+from .pagination import BookKeysetPagination
+from .projections import project_books, represent_books
+from .renderers import CSVRenderer, NDJSONRenderer
+from .response_cache import cached_library_response
+from .sharding import ShardedViewMixin
+from .stats import cached_library_stats
+from .sync import get_changes
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(ShardedViewMixin, viewsets.ModelViewSet):
     """
     ViewSet for Book CRUD operations
     """
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticated, IsBookOwner]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'author', 'genre', 'description']
-    ordering_fields = ['title', 'author', 'created_at', 'updated_at']
+    filter_backends = [BookSearchFilter, BookProgressFilter, BookOrderingFilter]
+    ordering_fields = ['title', 'author', 'created_at', 'updated_at', 'percentage_complete']
     ordering = ['-created_at']
+    keyset_pagination_class = BookKeysetPagination
+    
+    @property
+    def paginator(self):
+        """
+        Use keyset pagination when the client opts in with ?pagination=cursor,
+        page numbers otherwise
+        """
+        if not hasattr(self, '_paginator') and self.keyset_pagination_class.is_requested(self.request):
+            self._paginator = self.keyset_pagination_class()
+        return super().paginator
     
     def get_queryset(self):
         """
         This view returns books belonging to the current user,
-        with optional filtering.
+        with optional filtering. Free-text search is applied by
+        BookSearchFilter.
         """
         user = self.request.user
-        queryset = Book.objects.filter(user=user)
+        # Reading progress is nested in every response, so join it in
+        queryset = Book.objects.filter(user=user).select_related('reading_progress')
         
         # Filter by genre if provided
         genre = self.request.query_params.get('genre', None)
@@ -37,17 +68,25 @@ class BookViewSet(viewsets.ModelViewSet):
             is_reading = is_reading.lower() == 'true'
             queryset = queryset.filter(is_currently_reading=is_reading)
             
-        # Filter by search query if provided
-        query = self.request.query_params.get('query', None)
-        if query:
-            queryset = queryset.filter(
-                Q(title__icontains=query) |
-                Q(author__icontains=query) |
-                Q(description__icontains=query)
-            )
-            
         return queryset
     
+    @conditional_on_library
+    @cached_library_response
+    def list(self, request, *args, **kwargs):
+        """
+        List books through the read-only projection path, which skips model
+        and serializer instantiation but returns the BookSerializer schema
+        """
+        queryset = project_books(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(represent_books(page))
+        return Response(represent_books(queryset))
+    
+    @conditional_on_library
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         """Save the book with the current user"""
         serializer.save(user=self.request.user)
@@ -57,41 +96,164 @@ class BookViewSet(viewsets.ModelViewSet):
         """Toggle the currently reading status of a book"""
         book = self.get_object()
         book.is_currently_reading = not book.is_currently_reading
-        book.save()
+        book.save(update_fields=['is_currently_reading', 'updated_at'])
         return Response({
             'message': 'Reading status updated successfully',
             'is_currently_reading': book.is_currently_reading
         })
     
+    @action(detail=False, methods=['patch'], url_path='batch')
+    def batch_update(self, request):
+        """
+        Update many books at once, given ids with a shared patch or a list
+        of per-id patches, and report the result for each id
+        """
+        serializer = BookBatchUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(update_books(request.user, serializer.validated_data['updates']))
+    
+    @action(detail=False, methods=['post'], url_path='batch/delete')
+    def batch_delete(self, request):
+        """Delete many books at once and report the result for each id"""
+        serializer = BookBatchDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(delete_books(request.user, serializer.validated_data['ids']))
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_books(self, request):
+        """
+        Import books from an uploaded CSV, NDJSON or Goodreads export file.
+        The format is guessed from the file name unless a ``format`` form
+        field names it. ?format= is not read, as DRF takes it to pick the
+        response renderer. The upload is streamed and written in batches;
+        invalid records are skipped and reported.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': ['No file was submitted.']}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            format = detect_format(upload.name, request.data.get('format'))
+        except ImportFormatError as error:
+            return Response({'format': [str(error)]}, status=status.HTTP_400_BAD_REQUEST)
+        report = BookImporter(request.user).run(upload, format)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Library totals, pages read, per-genre counts and average completion,
+        computed in one aggregate query and cached until the next write
+        """
+        return Response(cached_library_stats(request.user))
+    
     @action(detail=False, methods=['get'])
+    def reading_stats(self, request):
+        """
+        Pages read per day and week, totals and streaks, served from the
+        reading rollups; ?days= and ?weeks= set the windows
+        """
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 1), 366)
+            weeks = min(max(int(request.query_params.get('weeks', 12)), 1), 104)
+        except ValueError:
+            return Response({'detail': 'days and weeks must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(reading_stats(request.user, days=days, weeks=weeks))
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Delta sync: books created or updated since the ``since`` cursor, with
+        their reading progress, and the ids of books deleted since then
+        """
+        paginator = self.keyset_pagination_class()
+        return Response(get_changes(
+            request.user,
+            since=request.query_params.get('since') or None,
+            page_size=paginator.get_page_size(request),
+        ))
+    
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        """
+        Stream the whole library as NDJSON (the default) or CSV, picked with
+        ?format=ndjson|csv
+        """
+        format = request.accepted_renderer.format
+        # The body is streamed after the view returns, so pin the database now
+        queryset = Book.objects.filter(user=request.user)
+        queryset = queryset.using(queryset.db)
+        response = StreamingHttpResponse(export_books(queryset, format), content_type=CONTENT_TYPES[format])
+        response['Content-Disposition'] = f'attachment; filename="books.{format}"'
+        return response
+    
+    @action(detail=False, methods=['get'])
+    @conditional_on_library
+    @cached_library_response
     def currently_reading(self, request):
         """Get all books that are currently being read"""
-        books = self.get_queryset().filter(is_currently_reading=True)
-        serializer = self.get_serializer(books, many=True)
-        return Response(serializer.data)
+        books = project_books(self.get_queryset().filter(is_currently_reading=True))
+        return Response(represent_books(books))
     
     @action(detail=False, methods=['get'])
+    @conditional_on_library
+    @cached_library_response
     def genres(self, request):
-        """Get a list of all genres used by the current user"""
+        """Get a list of all genres used by the current user, with book counts"""
         user = request.user
-        genres = Book.objects.filter(user=user).values_list('genre', flat=True).distinct()
+        # Read from the maintained genre index instead of scanning the library
+        counts = dict(
+            GenreCount.objects.filter(user=user).order_by('genre').values_list('genre', 'book_count')
+        )
         # Add 'All Genres' as the first option
-        genre_list = ['All Genres'] + list(genres)
-        serializer = GenreSerializer({'genres': genre_list})
+        genre_list = ['All Genres'] + list(counts)
+        serializer = GenreSerializer({
+            'genres': genre_list,
+            'counts': {'All Genres': sum(counts.values()), **counts},
+        })
         return Response(serializer.data)
         
-class ReadingProgressViewSet(viewsets.ModelViewSet):
+class ReadingProgressViewSet(ShardedViewMixin, viewsets.ModelViewSet):
     """
     ViewSet for updating reading progress
     """
     serializer_class = ReadingProgressSerializer
     permission_classes = [IsAuthenticated]
+    # Progress is addressed by the id of the book it belongs to
+    lookup_field = 'book_id'
+    lookup_url_kwarg = 'book_pk'
     
     def get_queryset(self):
-        return ReadingProgress.objects.filter(book__user=self.request.user)
+        # percentage_complete reads book.pages, so join the book in
+        return ReadingProgress.objects.filter(book__user=self.request.user).select_related('book')
         
     def perform_create(self, serializer):
         # Get the book_id from the URL
         book_id = self.kwargs.get('book_pk')
         book = Book.objects.get(id=book_id, user=self.request.user)
-        serializer.save(book=book)
\ No newline at end of file
+        progress = serializer.save(book=book)
+        record_event(book.user_id, book.id, None, progress.current_page)
+    
+    @action(detail=True, methods=['post'])
+    def advance(self, request, book_pk=None):
+        """
+        Move progress forward to current_page with a single conditional
+        UPDATE; going backwards or staying put changes nothing
+        """
+        serializer = ProgressAdvanceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        current_page = serializer.validated_data['current_page']
+        advanced = advance_progress(request.user, book_pk, current_page)
+        if advanced is None:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'advanced': advanced, 'current_page': current_page})
+    
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Apply many (book_id, current_page, timestamp) events at once, keeping
+        the latest event per book and skipping ones older than the stored
+        progress
+        """
+        serializer = ProgressBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(ingest_progress_events(request.user, serializer.validated_data['events']))
\ No newline at end of file
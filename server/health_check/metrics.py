@@ -0,0 +1,185 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Timings of the request being handled, or None when it is not sampled
+current_timings = ContextVar('current_timings', default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestTimings:
+    """Query count, SQL time and the time of named phases for one request"""
+    __slots__ = ('queries', 'sql', 'phases')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.phases = {}
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def timed(phase):
+    """
+    Add the time spent in the block to ``phase`` of the current request.
+    SQL run inside the block is left out, since it is counted on its own.
+    """
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    started, sql = time.perf_counter(), timings.sql
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - started - (timings.sql - sql))
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting queries and SQL time"""
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.sql += time.perf_counter() - started
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus sense, with fixed buckets"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """Yield the ``(le, cumulative count)`` of every bucket, +Inf last"""
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """
+    Per-endpoint histograms of request phase durations and query counts,
+    and response cache hit and miss counters, aggregated in this process
+    and rendered in the Prometheus text format.
+    Each worker process keeps its own registry; Prometheus sums them when
+    every process is scraped, or a single-process server reports them all.
+    """
+    prefix = 'readily_reads'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.durations = {}
+        self.queries = {}
+        self.cache_lookups = {}
+
+    def count_cache_lookup(self, endpoint, hit):
+        """Count a response cache lookup, whether or not the request is sampled"""
+        key = (endpoint, 'hit' if hit else 'miss')
+        with self.lock:
+            self.cache_lookups[key] = self.cache_lookups.get(key, 0) + 1
+
+    def observe(self, view, method, timings, total):
+        phases = {'total': total, 'sql': timings.sql, **timings.phases}
+        with self.lock:
+            for phase, seconds in phases.items():
+                key = (view, method, phase)
+                if key not in self.durations:
+                    self.durations[key] = Histogram(DURATION_BUCKETS)
+                self.durations[key].observe(seconds)
+            if (view, method) not in self.queries:
+                self.queries[(view, method)] = Histogram(QUERY_BUCKETS)
+            self.queries[(view, method)].observe(timings.queries)
+
+    def render(self):
+        with self.lock:
+            durations = sorted(self.durations.items())
+            queries = sorted(self.queries.items())
+            cache_lookups = sorted(self.cache_lookups.items())
+        lines = []
+        name = f'{self.prefix}_request_phase_seconds'
+        lines.append(f'# HELP {name} Time spent per request in each phase, by view')
+        lines.append(f'# TYPE {name} histogram')
+        for (view, method, phase), histogram in durations:
+            labels = f'view="{escape_label(view)}",method="{method}",phase="{phase}"'
+            lines.extend(render_histogram(name, labels, histogram))
+        name = f'{self.prefix}_request_queries'
+        lines.append(f'# HELP {name} Database queries per request, by view')
+        lines.append(f'# TYPE {name} histogram')
+        for (view, method), histogram in queries:
+            labels = f'view="{escape_label(view)}",method="{method}"'
+            lines.extend(render_histogram(name, labels, histogram))
+        name = f'{self.prefix}_response_cache_lookups_total'
+        lines.append(f'# HELP {name} Response cache lookups, by endpoint and result')
+        lines.append(f'# TYPE {name} counter')
+        for (endpoint, result), count in cache_lookups:
+            lines.append(f'{name}{{endpoint="{escape_label(endpoint)}",result="{result}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def render_histogram(name, labels, histogram):
+    for bound, count in histogram.samples():
+        yield f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+    yield f'{name}_sum{{{labels}}} {histogram.sum:.6f}'
+    yield f'{name}_count{{{labels}}} {histogram.count}'
+
+
+registry = MetricsRegistry()
+
+
+def render_cache_info(caches):
+    """
+    Render the size and eviction count of every cache whose backend reports
+    them, such as readily_reads.cache.MemoryLRUCache, in the Prometheus
+    text format
+    """
+    infos = sorted((alias, caches[alias].info()) for alias in caches if hasattr(caches[alias], 'info'))
+    metrics = (
+        ('cache_entries', 'gauge', 'entries', 'Entries held by each cache'),
+        ('cache_bytes', 'gauge', 'bytes', 'Size of the entries held by each cache'),
+        ('cache_max_bytes', 'gauge', 'max_bytes', 'Size each cache evicts down to'),
+        ('cache_evictions_total', 'counter', 'evictions', 'Entries evicted to stay under the size bound'),
+    )
+    lines = []
+    for suffix, kind, field, description in metrics:
+        name = f'{MetricsRegistry.prefix}_{suffix}'
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(f'{name}{{cache="{escape_label(alias)}"}} {info[field]}' for alias, info in infos)
+    return '\n'.join(lines) + '\n' if infos else ''
+
+
+def format_server_timing(timings, total):
+    """Render request timings as a Server-Timing header value, in milliseconds"""
+    entries = [f'total;dur={total * 1000:.2f}', f'db;dur={timings.sql * 1000:.2f};desc="{timings.queries} queries"']
+    entries.extend(f'{phase};dur={seconds * 1000:.2f}' for phase, seconds in timings.phases.items())
+    # Whatever is not SQL or a named phase: views, middleware and framework
+    other = total - timings.sql - sum(timings.phases.values())
+    entries.append(f'app;dur={max(other, 0) * 1000:.2f}')
+    return ', '.join(entries)
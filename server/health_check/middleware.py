@@ -0,0 +1,66 @@
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import RequestTimings, current_timings, format_server_timing, record_query, registry
+
+
+class RequestMetricsMiddleware:
+    """
+    Time a sample of requests: query count, SQL time, authentication,
+    serialization and the total. Sampled requests are added to the per-view
+    histograms served by the metrics endpoint, and get a Server-Timing
+    header when REQUEST_METRICS_SERVER_TIMING allows it: never ("off"), for
+    staff users ("staff") or always ("all"). Requests outside the sample
+    only cost one random number.
+
+    Serialization covers the book projections and the rendering of DRF
+    responses. Streamed responses are timed until the first byte.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_METRICS_SAMPLE_RATE', 1.0)
+        self.server_timing = getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', 'off')
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(record_query))
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        total = time.perf_counter() - started
+
+        match = request.resolver_match
+        registry.observe(match.view_name if match else 'unresolved', request.method, timings, total)
+        if self.shows_server_timing(request):
+            response['Server-Timing'] = format_server_timing(timings, total)
+        return response
+
+    def shows_server_timing(self, request):
+        if self.server_timing == 'all':
+            return True
+        # DRF copies the user it authenticated onto the Django request
+        user = getattr(request, 'user', None)
+        return self.server_timing == 'staff' and user is not None and user.is_staff
+
+    def process_template_response(self, request, response):
+        """Time the rendering of DRF responses, which happens after the view"""
+        timings = current_timings.get()
+        if timings is not None:
+            started, sql = time.perf_counter(), timings.sql
+            response.add_post_render_callback(
+                lambda response: timings.add('serialize', time.perf_counter() - started - (timings.sql - sql))
+            )
+        return response
@@ -1,6 +1,8 @@
 from django.urls import path
-from .views import health_check
+from .views import health_check, metrics
 
 urlpatterns = [
     path('', health_check, name='health_check'),
+    # Internal only, for the Prometheus scraper; see the view
+    path('metrics/', metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -1,26 +1,41 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
-from django.db import connection
+from django.conf import settings
+from django.db import connection, connections
+from django.core.cache import caches
+from .metrics import registry, render_cache_info
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def health_check(request):
     """
     Simple health check endpoint to verify the API is running
-    and can connect to the database.
+    and can connect to the database and its replicas.
     """
-    # Check database connection
-    db_status = 'ok'
+    return JsonResponse({
+        'status': 'ok',
+        'database': database_status(connection),
+        'replicas': {alias: database_status(connections[alias]) for alias in settings.DATABASE_REPLICAS},
+        'api_version': 'v1',
+    })
+
+def database_status(connection):
+    """Check that a database connection can run a query"""
     try:
         with connection.cursor() as cursor:
             cursor.execute("SELECT 1")
             cursor.fetchone()
     except Exception:
-        db_status = 'error'
-    
-    return JsonResponse({
-        'status': 'ok',
-        'database': db_status,
-        'api_version': 'v1',
-    })
\ No newline at end of file
+        return 'error'
+    return 'ok'
+
+def metrics(request):
+    """
+    Per-view request timing and query count histograms of this process,
+    response cache counters and cache sizes, in the Prometheus text
+    exposition format. Internal only: the endpoint is unauthenticated, so
+    keep /health/metrics/ out of reach of public clients at the proxy.
+    """
+    body = registry.render() + render_cache_info(caches)
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,143 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Bookkeeping charged to every entry on top of its key and pickled value:
+# the dict slot, the entry tuple and the bytes objects themselves
+ENTRY_OVERHEAD = 200
+
+
+class MemoryStore:
+    """Entries, their total size and the counters of one named cache"""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+# Caches are instantiated per thread, so stores are shared by name like
+# Django's LocMemCache does
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def entry_size(key, pickled):
+    return len(key) + len(pickled) + ENTRY_OVERHEAD
+
+
+class MemoryLRUCache(BaseCache):
+    """
+    In-memory cache bounded by the size of its entries rather than their
+    number. Values are pickled, and the least recently used entries are
+    evicted once the pickled size of all entries exceeds MAX_BYTES (in
+    OPTIONS, 64 MiB by default). Entries larger than the whole cache are
+    not stored. Each process keeps its own copy, like LocMemCache.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        self.max_bytes = int(params.get('OPTIONS', {}).get('MAX_BYTES', 64 * 1024 * 1024))
+        with _stores_lock:
+            self._store = _stores.setdefault(name, MemoryStore())
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._store.lock:
+            if self._live_entry(key) is not None:
+                return False
+            self._set(key, pickled, timeout)
+            return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        store = self._store
+        with store.lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                store.misses += 1
+                return default
+            store.hits += 1
+            store.entries.move_to_end(key)
+        return pickle.loads(entry[1])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._store.lock:
+            self._set(key, pickled, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                return False
+            self._store.entries[key] = (self.get_backend_timeout(timeout), entry[1])
+            return True
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            return self._live_entry(key) is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.lock:
+            return self._delete(key)
+
+    def clear(self):
+        store = self._store
+        with store.lock:
+            store.entries.clear()
+            store.size = 0
+
+    def info(self):
+        """Entry count, size, bound and hit, miss and eviction counters"""
+        store = self._store
+        with store.lock:
+            return {
+                'entries': len(store.entries),
+                'bytes': store.size,
+                'max_bytes': self.max_bytes,
+                'hits': store.hits,
+                'misses': store.misses,
+                'evictions': store.evictions,
+            }
+
+    def _live_entry(self, key):
+        """Return the entry of a key, dropping it if it has expired"""
+        entry = self._store.entries.get(key)
+        if entry is not None and entry[0] is not None and entry[0] <= time.time():
+            self._delete(key)
+            return None
+        return entry
+
+    def _set(self, key, pickled, timeout):
+        store = self._store
+        self._delete(key)
+        size = entry_size(key, pickled)
+        if size > self.max_bytes:
+            return
+        store.entries[key] = (self.get_backend_timeout(timeout), pickled)
+        store.size += size
+        while store.size > self.max_bytes:
+            old_key, (_, old_pickled) = store.entries.popitem(last=False)
+            store.size -= entry_size(old_key, old_pickled)
+            store.evictions += 1
+
+    def _delete(self, key):
+        store = self._store
+        entry = store.entries.pop(key, None)
+        if entry is None:
+            return False
+        store.size -= entry_size(key, entry[1])
+        return True
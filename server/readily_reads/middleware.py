@@ -0,0 +1,32 @@
+from django.contrib.auth import SESSION_KEY
+
+from .routers import remember_write, use_primary, wrote_recently
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let safe requests read from replicas, except for users who wrote
+    recently, who stay on the primary so they read their own writes while
+    replicas catch up. Session users are recognised here; token
+    users once CachedJWTAuthentication has authenticated them.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writing = request.method not in SAFE_METHODS
+        session = getattr(request, 'session', None)
+        token = use_primary.set(writing or wrote_recently(session.get(SESSION_KEY) if session else None))
+        try:
+            response = self.get_response(request)
+        finally:
+            use_primary.reset(token)
+
+        if writing and response.status_code < 400:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                remember_write(user.pk)
+        return response
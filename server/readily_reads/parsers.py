@@ -0,0 +1,41 @@
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson reads integers past 64 bits as floats, so bodies with a run of 20
+# digits are left to JSONParser. Mapping every digit to 0 and everything
+# else to x lets a substring search find the runs, far faster than a regex.
+DIGITS_TABLE = bytes(ord('0') if byte in b'0123456789' else ord('x') for byte in range(256))
+LONG_NUMBER = b'0' * 20
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser backed by orjson, returning the same data. Bodies orjson
+    rejects are parsed again by JSONParser, so invalid JSON gets the same
+    error message and what only JSONParser accepts (lone surrogates, NaN
+    when STRICT_JSON is off) still parses. Bodies with very long numbers or
+    in an encoding other than UTF-8, and everything when orjson is not
+    installed, go straight to JSONParser.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if LONG_NUMBER in body.translate(DIGITS_TABLE):
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
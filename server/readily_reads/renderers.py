@@ -0,0 +1,46 @@
+import re
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# DRF escapes U+2028 and U+2029, which are valid in JSON strings but not in
+# JavaScript ones. One regex pass is cheaper than two replace() scans.
+LINE_SEPARATOR_RE = re.compile(b'\xe2\x80[\xa8\xa9]')
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson, with byte-for-byte the same output for
+    compact responses. Values orjson does not handle the same way, such as
+    datetimes, decimals and lazy strings, go through DRF's encoder. Requests
+    for indented output, the ASCII-only or non-strict JSON settings, and data
+    orjson cannot encode (integers past 64 bits, keys that are not strings)
+    are rendered by JSONRenderer, as is everything when orjson is not
+    installed.
+
+    Two float cases differ from JSONRenderer, neither reachable from the
+    API's fields: NaN and infinity are rendered as null rather than refused,
+    and floats past 1e16 or below 1e-4 are written without the exponent's
+    sign and padding (1e16 rather than 1e+16).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if orjson is None or self.ensure_ascii or not self.compact or not self.strict or \
+                self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        encoder = self.encoder_class()
+        try:
+            ret = orjson.dumps(data, default=encoder.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if LINE_SEPARATOR_RE.search(ret):
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
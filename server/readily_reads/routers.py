@@ -0,0 +1,87 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+# Whether reads in the current context must see the primary. Only safe
+# requests from users who have not written within DATABASE_PRIMARY_PIN_SECONDS
+# read from replicas; commands, shells and write requests stay on the primary.
+use_primary = ContextVar('use_primary', default=True)
+
+
+@contextmanager
+def reads_on_primary(enabled=True):
+    """Send the reads in the block to the primary database, or to replicas"""
+    token = use_primary.set(enabled)
+    try:
+        yield
+    finally:
+        use_primary.reset(token)
+
+
+def pin_cache():
+    """
+    The cache holding read-your-writes pins. It must be shared by every
+    worker, or a user's next request may land on one that missed the pin.
+    """
+    return caches[getattr(settings, 'DATABASE_PRIMARY_PIN_CACHE', 'default')]
+
+
+def pin_key(user_id):
+    return f'primary-pin:{user_id}'
+
+
+def remember_write(user_id):
+    """Keep the user's reads on the primary until replicas have caught up"""
+    seconds = getattr(settings, 'DATABASE_PRIMARY_PIN_SECONDS', 10)
+    if user_id is not None and seconds > 0 and replica_aliases():
+        pin_cache().set(pin_key(user_id), True, seconds)
+
+
+def wrote_recently(user_id):
+    return user_id is not None and bool(replica_aliases()) and pin_cache().get(pin_key(user_id), False)
+
+
+def pin_recent_writer(user_id):
+    """Pin the rest of the current request to the primary if the user wrote recently"""
+    if wrote_recently(user_id):
+        use_primary.set(True)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes go to the default database. Reads go to a random replica from
+    settings.DATABASE_REPLICAS when the context allows it, see use_primary.
+    Without replicas everything stays on the default database.
+    """
+
+    def pick_replica(self, replicas):
+        return random.choice(replicas)
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if not replicas or use_primary.get():
+            return DEFAULT_DB_ALIAS
+        return self.pick_replica(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in replica_aliases():
+            return False
+        return None
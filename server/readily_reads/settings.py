@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 # Load environment variables
 load_dotenv()
@@ -29,6 +30,7 @@ INSTALLED_APPS = [
     # Third-party apps
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'drf_yasg',
     
@@ -38,6 +40,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'health_check.middleware.RequestMetricsMiddleware',  # First, so it times everything
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # For static files in production
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -45,6 +48,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'readily_reads.middleware.ReplicaRoutingMiddleware',  # After sessions and auth
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -77,11 +81,141 @@ DATABASES = {
     }
 }
 
+# SQLite tuned for many concurrent readers and a steady stream of small
+# writes. WAL lets reads carry on while a write commits; it is stored in the
+# database file, so the books migrations switch each database to
+# SQLITE_JOURNAL_MODE once rather than every connection rewriting the file
+# header. The pragmas below only last for a connection and are applied to
+# every new one: synchronous=NORMAL only risks the last commits on power
+# loss, not corruption. IMMEDIATE transactions take the write lock when they
+# begin, so concurrent writers queue for up to busy_timeout instead of
+# failing with "database is locked" halfway through. Connections are kept
+# for CONN_MAX_AGE seconds and checked before reuse.
+# Set SQLITE_TUNING=off to fall back to SQLite's own defaults.
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'on').lower() not in ('off', 'false', '0')
+SQLITE_JOURNAL_MODE = 'WAL' if SQLITE_TUNING else None
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32 * 1024,  # KiB
+    'temp_store': 'MEMORY',
+}
+
+if SQLITE_TUNING:
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            'transaction_mode': 'IMMEDIATE',
+        },
+    })
+
+# Read replicas, as a comma-separated list of SQLite files kept in sync with
+# the primary, e.g. a copy made with `sqlite3 db.sqlite3 ".backup replica.sqlite3"`.
+# Reads go to a replica and writes to the primary (readily_reads.routers);
+# a user who wrote in the last DATABASE_PRIMARY_PIN_SECONDS reads from the
+# primary too. Pins live in the DATABASE_PRIMARY_PIN_CACHE cache, so replicas
+# are refused unless that cache is shared between workers (see CACHES).
+DATABASE_REPLICAS = []
+for index, name in enumerate(filter(None, os.environ.get('SQLITE_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{index}'] = {**DATABASES['default'], 'NAME': name, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{index}')
+
+DATABASE_PRIMARY_PIN_SECONDS = int(os.environ.get('DATABASE_PRIMARY_PIN_SECONDS', '10'))
+DATABASE_PRIMARY_PIN_CACHE = 'shared'
+
+# Book shards, as a comma-separated list of SQLite files that hold whole user
+# libraries next to the default database (books.sharding). Every user's
+# books live on one shard, picked by a stable hash of the user id and kept
+# in ShardAssignment. Migrate each shard with `migrate --database shard1`
+# and move libraries between shards with the move_library command.
+BOOKS_SHARDS = ['default']
+for index, name in enumerate(filter(None, os.environ.get('BOOKS_SHARD_FILES', '').split(',')), start=1):
+    DATABASES[f'shard{index}'] = {**DATABASES['default'], 'NAME': name}
+    BOOKS_SHARDS.append(f'shard{index}')
+
+DATABASE_ROUTERS = [
+    'books.sharding.ShardRouter',
+    'readily_reads.routers.PrimaryReplicaRouter',
+]
+
 # Production database configuration (uncomment when deploying)
 # if os.environ.get('DATABASE_URL'):
 #     import dj_database_url
 #     DATABASES['default'] = dj_database_url.config(conn_max_age=600, ssl_require=True)
 
+# Caches. Book list, currently reading and genres responses are cached in
+# the "responses" cache (books.response_cache), picked with
+# BOOKS_RESPONSE_CACHE_BACKEND: "memory" keeps them in each process, evicting
+# the least recently used ones past RESPONSE_CACHE_MAX_BYTES; "file" shares
+# them between the processes of one machine; "redis" shares them between
+# machines (needs the redis package); "off" disables response caching.
+RESPONSE_CACHE_BACKENDS = {
+    'memory': {
+        'BACKEND': 'readily_reads.cache.MemoryLRUCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {'MAX_BYTES': int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('RESPONSE_CACHE_DIR', str(BASE_DIR / 'cache' / 'responses')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    },
+}
+RESPONSE_CACHE_BACKEND = os.environ.get('BOOKS_RESPONSE_CACHE_BACKEND', 'memory')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+if RESPONSE_CACHE_BACKEND != 'off':
+    CACHES['responses'] = RESPONSE_CACHE_BACKENDS[RESPONSE_CACHE_BACKEND]
+BOOKS_RESPONSE_CACHE = 'responses' if 'responses' in CACHES else None
+
+# Cache shared by every worker, for state that each of them must see: user
+# versions that invalidate the authentication cache, and read-your-writes
+# pins. Picked with SHARED_CACHE_BACKEND: "file" shares it between the
+# processes of one machine, "redis" between machines (needs the redis
+# package), and "memory" keeps it in each process, which only suits running
+# a single worker.
+SHARED_CACHE_BACKENDS = {
+    'memory': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SHARED_CACHE_DIR', str(BASE_DIR / 'cache' / 'shared')),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        'KEY_PREFIX': 'shared',
+    },
+}
+SHARED_CACHE_BACKEND = os.environ.get('SHARED_CACHE_BACKEND', 'file')
+CACHES['shared'] = SHARED_CACHE_BACKENDS[SHARED_CACHE_BACKEND]
+if DATABASE_REPLICAS and SHARED_CACHE_BACKEND == 'memory':
+    raise ImproperlyConfigured(
+        'SQLITE_REPLICAS needs a shared cache for read-your-writes pins; '
+        'set SHARED_CACHE_BACKEND to "file" or "redis"'
+    )
+
+# Tests keep the shared cache in memory instead
+TEST_RUNNER = 'readily_reads.test_runner.TestRunner'
+
+# Seconds a cached response is kept. Writes make it miss sooner, since the
+# cache key includes the library version.
+BOOKS_RESPONSE_CACHE_TIMEOUT = 10 * 60
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -118,20 +252,70 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson-backed JSON, rendering the same bytes as DRF's own classes and
+    # falling back to them when orjson is not installed
+    'DEFAULT_RENDERER_CLASSES': (
+        'readily_reads.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'readily_reads.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
 
+# Largest page a client can request with ?page_size= in cursor pagination mode
+BOOKS_MAX_PAGE_SIZE = 100
+
+# Seconds a user's library statistics stay cached. Writes invalidate them
+# sooner, since the cache key includes the library version.
+BOOKS_STATS_CACHE_TIMEOUT = 60 * 60
+
+# Tombstones of deleted books are kept this long for delta sync. Clients
+# whose sync cursor is older must start over with a full sync.
+BOOKS_TOMBSTONE_RETENTION_DAYS = 30
+
+# Most books a single batch update or delete request may touch
+BOOKS_MAX_BATCH_SIZE = 1000
+
+# Book search backend (dotted path). When unset, the backend is picked from
+# the database vendor: FTS5 on SQLite, full-text search on PostgreSQL.
+BOOKS_SEARCH_BACKEND = os.environ.get('BOOKS_SEARCH_BACKEND') or None
+
+# Fraction of requests timed by RequestMetricsMiddleware. Lower the rate on
+# busy servers. Timed requests always feed the histograms at /health/metrics/,
+# which is unauthenticated and must only be reachable from inside the
+# network. REQUEST_METRICS_SERVER_TIMING picks which timed responses carry a
+# Server-Timing header with their SQL time and query count: "off", "staff"
+# (requests from staff users) or "all", which exposes them to every client.
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get('REQUEST_METRICS_SAMPLE_RATE', '1.0'))
+REQUEST_METRICS_SERVER_TIMING = os.environ.get('REQUEST_METRICS_SERVER_TIMING', 'off')
+
+# Users kept in each process's authentication cache, and seconds before a
+# cached user is read again. Saves and deletes bump the user's version in
+# the AUTH_USER_CACHE_VERSIONS cache, which invalidates the entry in every
+# worker on its next request; QuerySet.update() waits for the timeout.
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_USER_CACHE_TIMEOUT = 5 * 60
+AUTH_USER_CACHE_VERSIONS = 'shared'
+
+# Seconds between reloads of the revoked access tokens in each process.
+# Revocations made in the process apply immediately, others within this.
+AUTH_REVOCATION_REFRESH_SECONDS = 30
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
-    'ROTATE_REFRESH_TOKENS': False,
+    'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
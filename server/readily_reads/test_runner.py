@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Test runner that keeps the shared cache in memory. The configured one
+    may be a directory in the source tree or a Redis server, and tests must
+    not leave user versions or read-your-writes pins there: user ids start
+    over in every test database.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.shared_cache = override_settings(
+            CACHES={**settings.CACHES, 'shared': settings.SHARED_CACHE_BACKENDS['memory']},
+        )
+        self.shared_cache.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.shared_cache.disable()
+        super().teardown_test_environment(**kwargs)